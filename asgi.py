@@ -0,0 +1,223 @@
+"""ASGI entry point for the simple backend.
+
+    python serve.py asgi            (or: uvicorn asgi:app --port 5000)
+
+The read routes that many clients hit at once (the events list, the
+leaderboard, both dashboards and the live update stream) are served here by
+asyncio handlers reading through a small pool of aiosqlite connections, so a
+thousand waiting clients cost a thousand coroutines rather than a thousand
+threads. They run the same SQL, build the same JSON and share the response
+cache with their Flask routes. Every other route is the Flask app, run on
+a2wsgi's thread pool.
+
+Run a single process: the live update stream, the dashboard and response
+caches and the write batcher are all per process, and SQLite takes one
+writer at a time anyway. ``serve.py wsgi`` is the multi-worker alternative
+without the async routes.
+"""
+import asyncio
+import contextlib
+import functools
+import os
+
+import aiosqlite
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import reports
+import simple_backend_no_qr as simple
+from backend import json_provider
+from backend.live_updates import STREAM_HEADERS
+from backend.pagination import NEXT_CURSOR_HEADER, PaginationError
+from backend.response_cache import validator_headers
+
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '4'))
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '16'))
+
+
+class AsyncConnectionPool:
+    """aiosqlite connections configured like ``pool``'s, lent one query at a time."""
+
+    def __init__(self, pool, size=ASYNC_DB_POOL_SIZE):
+        self.database = pool.database
+        self.busy_timeout = pool.busy_timeout_ms / 1000
+        self.pragmas = pool.pragmas()
+        self.size = size
+        self._connections = []
+        self._idle = None
+
+    async def open(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.database, timeout=self.busy_timeout)
+            for pragma in self.pragmas:
+                await conn.execute(pragma)
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def fetchall(self, sql, params=()):
+        async with self.connection() as conn:
+            return list(await conn.execute_fetchall(sql, params))
+
+
+db = AsyncConnectionPool(simple.db_pool)
+
+
+class FlaskJSONResponse(JSONResponse):
+    """JSON rendered byte for byte like Flask's, so the async and Flask routes
+    can share cached bodies under one ETag."""
+
+    def render(self, content):
+        return json_provider.dumps(content) + b'\n'
+
+
+def cached(handler):
+    """``cached_response`` for an async route, in the Flask routes' cache."""
+    cache = simple.response_cache
+
+    @functools.wraps(handler)
+    async def wrapper(request):
+        if not cache.enabled:
+            return await handler(request)
+        college_id, *identity = simple.demo_college()
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())), college_id, *identity)
+        etag = cache.etag(key, college_id)
+        if cache.matches(request.headers.get('If-None-Match'), etag):
+            return Response(status_code=304, headers=validator_headers(etag))
+
+        entry = cache.get(key, etag)
+        if entry is None:
+            response = await handler(request)
+            if response.status_code != 200:
+                return response
+            entry = (response.body, [(name, value) for name, value in response.headers.items()
+                                     if name != 'content-length'])
+            cache.set(key, etag, *entry)
+        body, headers = entry
+        return Response(body, headers={**dict(headers), **validator_headers(etag)})
+    return wrapper
+
+
+def compressed(handler):
+    """Compress an async route's responses like the Flask app's."""
+
+    @functools.wraps(handler)
+    async def wrapper(request):
+        response = await handler(request)
+        if response.status_code != 200:
+            return response
+        response.headers.add_vary_header('Accept-Encoding')
+        body, encoding, etag = simple.compressor.encode(
+            response.body, response.headers.get('content-type', '').split(';')[0],
+            request.headers.get('Accept-Encoding'), response.headers.get('etag'))
+        if encoding is not None:
+            response.body = body
+            response.headers['content-length'] = str(len(body))
+            response.headers['content-encoding'] = encoding
+            if etag:
+                response.headers['etag'] = etag
+        return response
+    return wrapper
+
+
+@compressed
+@cached
+async def get_events(request):
+    query, params, shape = simple.events_query(request.query_params)
+    result, next_cursor = simple.events_page(await db.fetchall(query, params), shape)
+    return FlaskJSONResponse(result, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+
+@compressed
+@cached
+async def get_leaderboard(request):
+    college_id = 1  # For demo
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), 100)
+    except ValueError:
+        limit = 10
+    return FlaskJSONResponse(simple.leaderboard_payload(await db.fetchall(simple.LEADERBOARD_SQL, (college_id, limit))))
+
+
+@compressed
+@cached
+async def admin_dashboard(request):
+    college_id = 1  # For demo
+    payload = simple.dashboard_cache.get(college_id)
+    if payload is None:
+        stats, recent_events, top_events = await asyncio.gather(
+            db.fetchall(reports.DASHBOARD_STATS_SQL, {'college_id': college_id}),
+            db.fetchall(reports.RECENT_EVENTS_SQL, (college_id,)),
+            db.fetchall(reports.TOP_EVENTS_SQL, (college_id,)))
+        payload = reports.dashboard_payload(stats[0], recent_events, top_events)
+        if simple.dashboard_cache.ttl > 0:
+            simple.dashboard_cache.set(college_id, payload)
+    return FlaskJSONResponse(payload)
+
+
+@compressed
+@cached
+async def student_dashboard(request):
+    student_id = 1  # For demo
+    registrations, attendance, feedback = await asyncio.gather(
+        db.fetchall(simple.STUDENT_REGISTRATIONS_SQL, (student_id,)),
+        db.fetchall(simple.STUDENT_ATTENDANCE_SQL, (student_id,)),
+        db.fetchall(simple.STUDENT_FEEDBACK_SQL, (student_id,)))
+    return FlaskJSONResponse(simple.student_dashboard_payload(registrations, attendance, feedback))
+
+
+async def stream_updates(request):
+    if simple.live_updates.full():
+        return JSONResponse({'error': 'Too many live update streams open, try again later'}, status_code=503)
+    return StreamingResponse(simple.live_updates.stream_async(1, request.headers.get('Last-Event-ID')),
+                             media_type='text/event-stream', headers=STREAM_HEADERS)
+
+
+async def bad_query_parameter(request, error):
+    return JSONResponse({'error': str(error)}, status_code=400)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    simple.init_db()
+    await db.open()
+    try:
+        yield
+    finally:
+        await db.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/events', get_events, methods=['GET']),
+        Route('/api/leaderboard', get_leaderboard, methods=['GET']),
+        Route('/api/admin/dashboard', admin_dashboard, methods=['GET']),
+        Route('/api/student/dashboard', student_dashboard, methods=['GET']),
+        Route('/api/stream', stream_updates, methods=['GET']),
+        # Everything else, including POST /api/events, is the Flask app
+        Mount('/', app=WSGIMiddleware(simple.app, workers=ASGI_WSGI_THREADS)),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=simple.CORS_ORIGINS, allow_methods=['*'], allow_headers=['*'],
+                   expose_headers=[NEXT_CURSOR_HEADER, 'ETag'])
+    ],
+    exception_handlers={PaginationError: bad_query_parameter},
+    lifespan=lifespan,
+)
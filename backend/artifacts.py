@@ -0,0 +1,64 @@
+"""Content-addressed on-disk store for rendered certificates and QR codes.
+
+An artifact's key is a SHA-256 over everything that decides its content:
+the kind, the template version and the inputs (student name, event title,
+date, ...). Rendering the same inputs twice therefore lands on the same file,
+so a certificate is drawn once and then served straight from disk. The key
+doubles as the ETag, which lets browsers revalidate with If-None-Match and get
+a 304 instead of the file.
+
+Bumping a template version changes every key for that kind, so old files are
+simply never looked up again.
+"""
+import hashlib
+import json
+import os
+
+from flask import send_file
+
+
+class ArtifactStore:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    @staticmethod
+    def key_for(kind, version, **inputs):
+        raw = json.dumps([kind, version, inputs], sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @staticmethod
+    def is_key(value):
+        return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+    def relative_path(self, key, ext):
+        # Fan out over 256 directories so no single one grows huge
+        return os.path.join(key[:2], f'{key}.{ext}')
+
+    def path(self, key, ext):
+        return os.path.join(self.root, self.relative_path(key, ext))
+
+    def exists(self, key, ext):
+        return os.path.exists(self.path(key, ext))
+
+    def put(self, key, ext, data):
+        """Write ``data`` under ``key`` and return its path relative to the root."""
+        path = self.path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a half-written file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return self.relative_path(key, ext)
+
+    def put_content(self, data, ext):
+        """Store bytes whose inputs are unknown, keyed by their own hash."""
+        key = hashlib.sha256(data).hexdigest()
+        self.put(key, ext, data)
+        return key
+
+    def send(self, key, ext, mimetype, download_name=None):
+        # send_file streams the file (sendfile where the server supports it)
+        # and answers If-None-Match with a 304
+        return send_file(self.path(key, ext), mimetype=mimetype, etag=key, conditional=True,
+                         as_attachment=download_name is not None, download_name=download_name)
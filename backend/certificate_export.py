@@ -0,0 +1,193 @@
+"""Render every certificate for an event in parallel and stream them as a ZIP.
+
+Attendees are split into chunks that worker processes render with the shared
+``CertificateTemplate`` straight into the artifact store; certificates that
+are already there are not drawn again. The response is a ZIP written as the
+chunks finish, so only a few chunks' worth of PDFs are ever pending, and
+nothing is held in memory beyond the current entry.
+
+Progress (done/total and certificates per second) is kept per export id for
+``progress()``; it lives in this process only.
+
+If a worker dies the pool is broken for good, so it is dropped (the next
+export starts a fresh one) and the export fails with ``ExportUnavailable``,
+which the app answers with a 503 when it happens before the first bytes.
+"""
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import renderers
+
+logger = logging.getLogger(__name__)
+
+EXPORT_WORKERS = int(os.getenv('CERTIFICATE_EXPORT_WORKERS', str(min(4, os.cpu_count() or 1))))
+EXPORT_CHUNK_SIZE = int(os.getenv('CERTIFICATE_EXPORT_CHUNK', '50'))
+EXPORT_ID_HEADER = 'X-Export-Id'
+EXPORT_RETRY_AFTER = int(os.getenv('CERTIFICATE_EXPORT_RETRY_AFTER', '5'))
+# Finished exports kept around for progress lookups
+KEEP_FINISHED = 100
+
+
+class ExportUnavailable(Exception):
+    """Raised when the render pool broke; reported to the client as a 503."""
+
+    def __init__(self, retry_after=EXPORT_RETRY_AFTER):
+        super().__init__('Certificate workers are restarting, please retry shortly')
+        self.retry_after = retry_after
+
+
+def render_certificate_chunk(items, output_dir):
+    """Worker side: render the items whose PDF is not stored yet."""
+    rendered = 0
+    for item in items:
+        if os.path.exists(os.path.join(output_dir, item['artifact_path'])):
+            continue
+        renderers.render_certificate(None, item, output_dir)
+        rendered += 1
+    return rendered
+
+
+class _ZipSink:
+    """Write-only buffer that ZipFile streams into; has no tell/seek, so
+    ZipFile uses data descriptors instead of seeking back."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class CertificateExporter:
+    def __init__(self, output_dir, workers=EXPORT_WORKERS, chunk_size=EXPORT_CHUNK_SIZE):
+        self.output_dir = os.path.abspath(output_dir)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._executor = None
+        self._lock = threading.Lock()
+        self._progress = collections.OrderedDict()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Each worker builds the page template once, up front
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=renderers.certificate_template)
+            return self._executor
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def start(self, items):
+        """Register an export of ``items`` and return its id."""
+        export_id = uuid.uuid4().hex
+        with self._lock:
+            self._progress[export_id] = {
+                'export_id': export_id,
+                'status': 'pending',
+                'total': len(items),
+                'done': 0,
+                'rendered': 0,
+                'elapsed_seconds': 0.0,
+                'per_second': 0.0
+            }
+            finished = [key for key, value in self._progress.items() if value['status'] in ('done', 'failed')]
+            for key in finished[:-KEEP_FINISHED]:
+                del self._progress[key]
+        return export_id
+
+    def progress(self, export_id):
+        with self._lock:
+            progress = self._progress.get(export_id)
+            return dict(progress) if progress else None
+
+    def _update(self, export_id, started, **changes):
+        with self._lock:
+            progress = self._progress[export_id]
+            progress.update(changes)
+            elapsed = time.perf_counter() - started
+            progress['elapsed_seconds'] = round(elapsed, 3)
+            progress['per_second'] = round(progress['done'] / elapsed, 1) if elapsed else 0.0
+
+    def stream_zip(self, export_id, items):
+        """Yield the ZIP of ``items`` chunk by chunk.
+
+        Each item is a ``render_certificate`` payload plus ``filename``, the
+        name of its entry in the archive.
+        """
+        started = time.perf_counter()
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        pending = collections.deque()
+        sink = _ZipSink()
+        self._update(export_id, started, status='running')
+
+        pool = self._pool()
+        try:
+            chunks = iter(chunks)
+            with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+                # Keep every worker busy, but only a couple of chunks ahead
+                for chunk in chunks:
+                    pending.append((chunk, pool.submit(render_certificate_chunk, chunk, self.output_dir)))
+                    if len(pending) >= self.workers * 2:
+                        break
+
+                while pending:
+                    chunk, future = pending.popleft()
+                    rendered = future.result()
+                    next_chunk = next(chunks, None)
+                    if next_chunk is not None:
+                        pending.append((next_chunk, pool.submit(render_certificate_chunk, next_chunk, self.output_dir)))
+
+                    for item in chunk:
+                        archive.write(os.path.join(self.output_dir, item['artifact_path']), item['filename'])
+                        yield sink.drain()
+                    with self._lock:
+                        progress = self._progress[export_id]
+                        done = progress['done'] + len(chunk)
+                        rendered += progress['rendered']
+                    self._update(export_id, started, done=done, rendered=rendered)
+            yield sink.drain()
+        except BrokenProcessPool as error:
+            self._discard(pool)
+            self._update(export_id, started, status='failed')
+            logger.error('Certificate export %s: render pool broke: %s', export_id, error)
+            raise ExportUnavailable() from error
+        except BaseException:
+            # Includes GeneratorExit when the client goes away mid-download
+            for _, future in pending:
+                future.cancel()
+            self._update(export_id, started, status='failed')
+            raise
+
+        self._update(export_id, started, status='done')
+        progress = self.progress(export_id)
+        logger.info('Certificate export %s: %d certificates (%d rendered) in %.2fs, %.1f/s',
+                    export_id, progress['done'], progress['rendered'], progress['elapsed_seconds'],
+                    progress['per_second'])
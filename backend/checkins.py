@@ -0,0 +1,114 @@
+"""Batched check-ins from door scanners.
+
+Scanning devices queue check-ins locally, since connectivity at a venue
+door comes and goes, and flush them as a list of ``{student_id, timestamp,
+device_id}`` items. An item may carry the scanned ``token`` (see
+``checkin_tokens.py``) instead of a ``student_id``; it is checked before
+anything is looked up, and only stands in for the student id: its student
+must still be eligible, as a registration can be cancelled after the code
+was issued. A batch is applied in one transaction. It can safely be sent
+again after a lost response: a student already checked in for the event is
+reported as a duplicate, not recorded twice.
+
+This module parses a batch and decides what happens to each item; the
+routes supply the lookups and write the new attendance rows.
+"""
+import os
+from datetime import datetime, timezone
+
+MAX_CHECKIN_BATCH = int(os.getenv('CHECKIN_BATCH_LIMIT', '500'))
+MAX_DEVICE_ID_LENGTH = 64
+
+CHECKED_IN = 'checked_in'
+DUPLICATE = 'duplicate'
+REJECTED = 'rejected'
+
+
+class CheckinBatchError(ValueError):
+    """The request body is not a usable batch; reported to the client as a 400."""
+
+
+def _parse_timestamp(value):
+    timestamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if timestamp.tzinfo is not None:
+        # Stored like the rest of the app's times: naive UTC
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.replace(microsecond=0)
+
+
+def parse_checkins(data, verify_token=None):
+    """Validate a batch body; return one dict per item, in order.
+
+    Items that cannot be applied carry an ``error`` instead of failing the
+    whole batch. ``verify_token`` maps a token to its claims or raises
+    ``ValueError``; without it, token items are rejected.
+    """
+    items = data.get('checkins') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise CheckinBatchError('Send {"checkins": [{"student_id", "timestamp", "device_id"}, ...]}')
+    if len(items) > MAX_CHECKIN_BATCH:
+        raise CheckinBatchError(f'At most {MAX_CHECKIN_BATCH} check-ins per batch')
+
+    checkins = []
+    for index, item in enumerate(items):
+        checkin = {'index': index, 'student_id': item.get('student_id') if isinstance(item, dict) else None}
+        checkins.append(checkin)
+        if isinstance(item, dict) and 'token' in item:
+            try:
+                checkin['student_id'] = verify_token(item['token']).student_id
+            except (TypeError, ValueError) as error:
+                checkin['error'] = str(error) if verify_token else 'Check-in codes are not accepted here'
+                continue
+        if not isinstance(item, dict):
+            checkin['error'] = 'Item must be an object'
+        elif not isinstance(checkin['student_id'], int) or isinstance(checkin['student_id'], bool):
+            checkin['error'] = 'student_id must be an integer'
+        elif not isinstance(item.get('device_id'), str) or not 0 < len(item['device_id']) <= MAX_DEVICE_ID_LENGTH:
+            checkin['error'] = f'device_id must be a string of 1-{MAX_DEVICE_ID_LENGTH} characters'
+        else:
+            checkin['device_id'] = item['device_id']
+            try:
+                # Devices without a clock fall back to the time of the sync
+                checkin['checked_in_at'] = (_parse_timestamp(item['timestamp']) if item.get('timestamp')
+                                            else datetime.utcnow().replace(microsecond=0))
+            except ValueError:
+                checkin['error'] = 'timestamp must be ISO 8601'
+    return checkins
+
+
+def student_ids(checkins):
+    """The distinct student ids of the items that parsed."""
+    return sorted({checkin['student_id'] for checkin in checkins if 'error' not in checkin})
+
+
+def resolve_checkins(checkins, eligible, present, ineligible_error='Unknown student'):
+    """Decide each item's outcome.
+
+    ``eligible`` holds the students who may check in and ``present`` those
+    already checked in for the event, whether an item came with a token or
+    a student id. Returns the items to insert and the per-item results. Only
+    the first scan of a student in the batch counts.
+    """
+    present = set(present)
+    new, results = [], []
+    for checkin in checkins:
+        result = {'index': checkin['index'], 'student_id': checkin['student_id']}
+        if 'error' in checkin:
+            result.update(status=REJECTED, error=checkin['error'])
+        elif checkin['student_id'] not in eligible:
+            result.update(status=REJECTED, error=ineligible_error)
+        elif checkin['student_id'] in present:
+            result['status'] = DUPLICATE
+        else:
+            present.add(checkin['student_id'])
+            new.append(checkin)
+            result.update(status=CHECKED_IN, checked_in_at=checkin['checked_in_at'])
+        results.append(result)
+    return new, results
+
+
+def summarize(results):
+    counts = {CHECKED_IN: 0, DUPLICATE: 0, REJECTED: 0}
+    for result in results:
+        counts[result['status']] += 1
+    return {'counts': counts, 'results': results}
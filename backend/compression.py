@@ -0,0 +1,157 @@
+"""gzip and brotli compression of responses, negotiated on Accept-Encoding.
+
+``init_app`` compresses every JSON, text and SVG response of at least
+``COMPRESS_MIN_SIZE`` bytes in the encoding the client prefers: brotli when
+the ``brotli`` package is installed and the client takes it, otherwise gzip.
+Smaller bodies would gain a few bytes at best. Streamed responses (exports,
+the live update stream) and files sent as they are (QR images,
+certificates) are left alone.
+
+A compressed body's strong ETag gets the encoding appended
+(``"<tag>-gzip"``), since the bytes differ from the uncompressed ones. Those
+bytes are remembered per tag, so a cached response sent again is not
+compressed again.
+
+This module only depends on the standard library and Flask so that both the
+SQLAlchemy backend and the sqlite3 simple backends can use it.
+"""
+import collections
+import gzip
+import importlib
+import importlib.util
+import os
+import threading
+
+from flask import request
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+# Quality 4 compresses better than gzip -6 in about the same time; the
+# default, 11, is meant for static files
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+COMPRESSED_BODIES = int(os.getenv('COMPRESSED_BODIES', '256'))
+
+brotli = importlib.import_module('brotli') if importlib.util.find_spec('brotli') else None
+
+# Most preferred first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'image/svg+xml')
+
+
+def compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+def choose_encoding(accept_encoding):
+    """The encoding to send for an Accept-Encoding header, or None."""
+    weights = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 so equal bodies compress to equal bytes
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encoded_etag(etag, encoding):
+    if etag.startswith('"') and etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    # A weak tag already allows a different encoding of the same content
+    return etag
+
+
+class Compressor:
+    def __init__(self, min_size=COMPRESS_MIN_SIZE, remembered=COMPRESSED_BODIES):
+        self.min_size = min_size
+        self.remembered = remembered
+        self._lock = threading.Lock()
+        self._bodies = collections.OrderedDict()  # (etag, encoding) -> compressed body
+
+        # Stats
+        self.compressed = 0
+        self.reused = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def encode(self, body, mimetype, accept_encoding, etag=None):
+        """``(body, encoding, etag)`` to send for ``body``; encoding is None
+        when it goes uncompressed."""
+        if len(body) < self.min_size or not compressible(mimetype):
+            return body, None, etag
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            return body, None, etag
+        strong = etag is not None and not etag.startswith('W/')
+        key = (etag, encoding)
+        with self._lock:
+            compressed = self._bodies.get(key) if strong else None
+            if compressed is not None:
+                self._bodies.move_to_end(key)
+                self.reused += 1
+        if compressed is None:
+            compressed = compress(body, encoding)
+            with self._lock:
+                self.compressed += 1
+                if strong:
+                    self._bodies[key] = compressed
+                    if len(self._bodies) > self.remembered:
+                        self._bodies.popitem(last=False)
+        with self._lock:
+            self.bytes_in += len(body)
+            self.bytes_out += len(compressed)
+        return compressed, encoding, encoded_etag(etag, encoding) if etag else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'encodings': list(ENCODINGS),
+                'min_size': self.min_size,
+                'compressed': self.compressed,
+                'reused': self.reused,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'ratio': round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None
+            }
+
+
+def init_app(app, compressor):
+    """Compress ``app``'s responses with ``compressor``."""
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code in (204, 206, 304)
+                or response.status_code < 200 or 'Content-Encoding' in response.headers
+                or not compressible(response.mimetype)):
+            return response
+        # Whether or not this one is compressed, the same URL may be
+        response.vary.add('Accept-Encoding')
+        body, encoding, etag = compressor.encode(response.get_data(), response.mimetype,
+                                                 request.headers.get('Accept-Encoding'),
+                                                 response.headers.get('ETag'))
+        if encoding is not None:
+            response.set_data(body)
+            response.headers['Content-Encoding'] = encoding
+            if etag:
+                response.headers['ETag'] = etag
+        return response
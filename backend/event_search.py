@@ -0,0 +1,95 @@
+"""Ranked full-text event search on SQLite FTS5.
+
+An external-content FTS5 table indexes each event's title, description,
+location and event type under the event's id, so the text is stored once, in
+the events table. Triggers keep the index in step with every insert, delete
+and text edit; updates to other columns, such as the seat counter, leave it
+alone.
+
+Search terms are matched as prefixes ("hack" finds "hackathon"), every term
+must match, and results are ordered by bm25 with title hits weighted
+highest. Pages follow on from the last row's (score, id), like the other
+list endpoints' cursors.
+
+This module only depends on the standard library so that both the SQLAlchemy
+backend and the sqlite3 simple backends can use it.
+"""
+import re
+
+MAX_TERMS = 8
+
+# Columns in index order, with their bm25 weights
+COLUMNS = ('title', 'description', 'location', 'event_type')
+WEIGHTS = (10.0, 1.0, 3.0, 5.0)
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchError(ValueError):
+    """An unusable search query; reported to the client as a 400."""
+
+
+def fts_schema(events_table, fts_table):
+    """Statements that create ``fts_table`` over ``events_table``, its sync
+    triggers, and index the rows already there."""
+    columns = ', '.join(COLUMNS)
+    new = ', '.join(f'new.{column}' for column in COLUMNS)
+    old = ', '.join(f'old.{column}' for column in COLUMNS)
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {columns},
+            content='{events_table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {events_table}
+        BEGIN
+            INSERT INTO {fts_table} (rowid, {columns}) VALUES (new.id, {new});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {events_table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF {columns} ON {events_table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old});
+            INSERT INTO {fts_table} (rowid, {columns}) VALUES (new.id, {new});
+        END""",
+        f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def match_expression(query):
+    """Turn what a user typed into an FTS5 query: every word, as a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation in the input are
+    searched for as text rather than parsed.
+    """
+    terms = _TERM.findall(query or '')
+    if not terms:
+        raise SearchError('q must contain at least one word')
+    if len(terms) > MAX_TERMS:
+        raise SearchError(f'At most {MAX_TERMS} search terms')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_sql(events_table, fts_table, columns, conditions=(), after=False):
+    """A page of matching events, best first, as ``columns`` plus ``score``.
+
+    Parameters, in order: the match expression, one per condition, then the
+    cursor's score and id if ``after``, then the limit.
+    """
+    where = list(conditions)
+    if after:
+        where.append('(s.score, e.id) > (?, ?)')
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    return f"""
+        SELECT {', '.join(f'e.{column}' for column in columns)}, s.score
+        FROM (
+            SELECT rowid, bm25({fts_table}, {weights}) AS score
+            FROM {fts_table} WHERE {fts_table} MATCH ?
+        ) s
+        JOIN {events_table} e ON e.id = s.rowid
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY s.score, e.id
+        LIMIT ?
+    """
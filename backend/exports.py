@@ -0,0 +1,92 @@
+"""Streaming CSV and XLSX downloads for report routes.
+
+Rows come from an iterator, normally a database cursor, which SQLite steps
+through one row at a time. The response body is produced as they arrive, so
+memory stays flat however many rows an export has. CSV goes straight out in
+batches. XLSX goes through an openpyxl write-only workbook, which spools
+rows to a temporary file as they are appended; the finished file is then
+streamed from disk.
+
+openpyxl is optional: without it only CSV is offered.
+"""
+import csv
+import importlib.util
+import io
+import tempfile
+
+from flask import Response, stream_with_context
+
+CSV_BATCH_ROWS = 500
+FILE_CHUNK_SIZE = 64 * 1024
+
+MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class ExportError(ValueError):
+    """Unknown or unavailable export format; reported to the client as a 400."""
+
+
+def parse_format(value, default='csv'):
+    fmt = (value or default).lower()
+    if fmt == 'excel':
+        fmt = 'xlsx'
+    if fmt not in MIMETYPES:
+        raise ExportError('format must be csv or xlsx')
+    if fmt == 'xlsx' and importlib.util.find_spec('openpyxl') is None:
+        raise ExportError('XLSX export needs openpyxl installed')
+    return fmt
+
+
+def csv_stream(header, rows, batch_rows=CSV_BATCH_ROWS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the file as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(header)
+
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % batch_rows == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def xlsx_stream(header, rows, title='Report'):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append(list(header))
+    for row in rows:
+        sheet.append(list(row))
+
+    with tempfile.TemporaryFile() as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_response(fmt, filename, header, rows, title='Report'):
+    """A chunked download of ``rows`` as ``filename.<fmt>``.
+
+    ``rows`` is consumed while the response is sent, inside the request
+    context, so it may read from the request's database connection.
+    """
+    if fmt == 'xlsx':
+        body = xlsx_stream(header, rows, title)
+    else:
+        body = csv_stream(header, rows)
+    return Response(stream_with_context(body), mimetype=MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename={filename}.{fmt}'
+    })
@@ -0,0 +1,101 @@
+"""Extensions and services shared by the blueprints in ``routes``.
+
+Everything here is created unbound, so importing the blueprints doesn't
+need an app; ``init_app`` binds them to the one ``create_app`` builds. The
+services that take paths or secrets from the app's config (the artifact
+store, the job queue, the certificate exporter and the check-in token
+signer) are only created by ``init_app``, so use them as
+``extensions.job_queue`` rather than importing the name.
+"""
+import os
+
+import click
+from flask_jwt_extended import JWTManager
+from flask_sqlalchemy import SQLAlchemy
+
+from artifacts import ArtifactStore
+from certificate_export import CertificateExporter
+from checkin_tokens import CheckinTokenSigner
+from compression import Compressor
+from jobs import JobQueue
+from live_updates import LiveUpdates
+from password_hasher import PasswordHasher
+from response_cache import ResponseCache
+from student_import import StudentImporter
+from ttl_cache import TTLCache
+
+db = SQLAlchemy()
+jwt = JWTManager()
+
+# Responses are compressed when the client accepts it
+compressor = Compressor()
+
+# Admin dashboard payloads per college; write routes invalidate their college
+dashboard_cache = TTLCache(float(os.getenv('DASHBOARD_CACHE_TTL', '10')))
+
+# Rendered JSON of the busiest GET routes, revalidated by ETag; see
+# invalidate_caches()
+response_cache = ResponseCache()
+
+# Login and register hash on worker threads; a full queue turns into a 503
+password_hasher = PasswordHasher()
+
+# Seat, waitlist, check-in and feedback deltas pushed to /api/stream
+live_updates = LiveUpdates()
+
+# Bulk student imports hash passwords on a pool of worker processes
+student_importer = StudentImporter()
+
+# Set by init_app
+artifact_store = None
+job_queue = None
+certificate_exporter = None
+checkin_tokens = None
+
+
+class MigrateCommands(click.Group):
+    """``flask db``, with Flask-Migrate (and Alembic) only imported once one
+    of its commands runs rather than every time the app starts."""
+
+    def __init__(self, app):
+        super().__init__('db', help='Perform database migrations.')
+        self.app = app
+
+    def _group(self):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_commands
+
+        if 'migrate' not in self.app.extensions:
+            Migrate(self.app, db)
+        return db_commands
+
+    def list_commands(self, ctx):
+        return self._group().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._group().get_command(ctx, name)
+
+
+def invalidate_caches(college_id):
+    dashboard_cache.invalidate(college_id)
+    response_cache.bump(college_id)
+
+
+def init_app(app):
+    global artifact_store, job_queue, certificate_exporter, checkin_tokens
+
+    db.init_app(app)
+    jwt.init_app(app)
+    app.cli.add_command(MigrateCommands(app))
+
+    dashboard_cache.ttl = app.config['DASHBOARD_CACHE_TTL']
+    response_cache.ttl = app.config['RESPONSE_CACHE_TTL']
+
+    # QR codes and certificates are rendered by worker processes straight into
+    # the content-addressed artifact store; see routes.certificates.register_jobs()
+    artifact_store = ArtifactStore(app.config['ARTIFACT_DIR'])
+    job_queue = JobQueue(app.config['JOBS_DATABASE'], artifact_store.root)
+    certificate_exporter = CertificateExporter(artifact_store.root)
+
+    # Registration QR codes carry signed check-in tokens, verified without a lookup
+    checkin_tokens = CheckinTokenSigner(app.config['CHECKIN_TOKEN_SECRET'])
@@ -0,0 +1,314 @@
+"""A local background job queue backed by a SQLite table and a process pool.
+
+Rendering QR codes and certificate PDFs is CPU-bound, so routes ``enqueue`` a
+job and return its id instead of rendering inline. A dispatcher thread claims
+queued rows and hands them to a ``ProcessPoolExecutor``; handlers write their
+artifact under ``output_dir`` and return a small JSON-able result.
+
+Jobs live in their own SQLite file, so they survive a restart: a row left
+``running`` by a process that died is requeued once its lease runs out, and
+failed attempts are retried up to ``max_attempts`` times. A worker that
+dies mid-job (out of memory, a crash in a renderer) breaks the pool; the
+jobs it had are counted as failed attempts and a new pool is started. Claims are a
+conditional UPDATE, so several app processes can share one job table.
+
+Handlers are module-level functions ``handler(job_id, payload, output_dir)``
+so that they can be pickled into the worker processes. ``on_complete`` hooks
+run in the app process after a job succeeds. The dispatcher starts with
+``start()`` or on first use of ``enqueue``/``get``.
+
+This module only depends on the standard library so that both the SQLAlchemy
+backend and the sqlite3 simple backends can use it.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', str(min(4, os.cpu_count() or 1))))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '300'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        dedupe_key TEXT UNIQUE,
+        payload TEXT NOT NULL,
+        owner TEXT,
+        college_id INTEGER,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        result TEXT,
+        error TEXT,
+        locked_until REAL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+"""
+
+
+class UnknownJobKind(ValueError):
+    """Raised when enqueueing a kind that has no registered handler."""
+
+
+class JobQueue:
+    def __init__(self, database, output_dir, workers=JOB_WORKERS, max_attempts=JOB_MAX_ATTEMPTS,
+                 lease_seconds=JOB_LEASE_SECONDS, poll_interval=0.5):
+        self.database = database
+        self.output_dir = os.path.abspath(output_dir)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+        self._handlers = {}
+        self._on_complete = {}
+        self._executor = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._local = threading.local()
+
+    def register(self, kind, handler, on_complete=None):
+        self._handlers[kind] = handler
+        if on_complete:
+            self._on_complete[kind] = on_complete
+
+    # Storage
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.database))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.database, timeout=5, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _row(self, job_id):
+        return self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def enqueue(self, kind, payload, dedupe_key=None, owner=None, college_id=None, requeue_done=False):
+        """Queue a job and return it as a dict.
+
+        With ``dedupe_key``, an existing job for the same key is returned
+        instead, unless it failed (or finished, with ``requeue_done``), in
+        which case it is queued again.
+        """
+        if kind not in self._handlers:
+            raise UnknownJobKind(kind)
+        self.start()
+        conn = self._conn()
+        now = time.time()
+
+        with conn:
+            if dedupe_key is not None:
+                existing = conn.execute("SELECT * FROM jobs WHERE dedupe_key = ?", (dedupe_key,)).fetchone()
+                rerun = (FAILED, DONE) if requeue_done else (FAILED,)
+                if existing and existing['status'] not in rerun:
+                    return self._as_dict(existing)
+                if existing:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = 0, error = NULL, payload = ?, updated_at = ? WHERE id = ?",
+                        (QUEUED, json.dumps(payload), now, existing['id'])
+                    )
+                    self._wake.set()
+                    return self._as_dict(self._row(existing['id']))
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, dedupe_key, payload, owner, college_id, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, dedupe_key, json.dumps(payload), owner, college_id, QUEUED, now, now)
+            )
+        self._wake.set()
+        return self._as_dict(self._row(job_id))
+
+    def get(self, job_id):
+        self.start()
+        row = self._row(job_id)
+        return self._as_dict(row) if row else None
+
+    def result_path(self, job):
+        """Absolute path of a finished job's artifact, or None."""
+        result = job.get('result') or {}
+        if job['status'] != DONE or 'path' not in result:
+            return None
+        return os.path.join(self.output_dir, result['path'])
+
+    @staticmethod
+    def _as_dict(row):
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'owner': row['owner'],
+            'college_id': row['college_id'],
+            'payload': json.loads(row['payload']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at']
+        }
+
+    # Dispatching
+    def start(self):
+        """Start the worker pool and dispatcher thread if not already running."""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._executor = self._new_executor()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+            self._thread.start()
+
+    def _new_executor(self):
+        # spawn rather than fork: the app process has request and pool
+        # threads whose locks must not be copied into the workers
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _replace_broken(self, executor):
+        # Every job still on the broken pool fails with BrokenProcessPool too;
+        # only the first of them replaces it
+        if executor is self._executor:
+            logger.warning('Job worker process died; starting a new pool')
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+
+    def stop(self):
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join()
+            self._executor.shutdown(wait=True)
+            self._thread = None
+            self._executor = None
+
+    def _requeue_expired(self, conn):
+        # Jobs whose process died mid-run (server restart, crash); the claim
+        # counted the attempt, so a job that keeps killing its process stops
+        now = time.time()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, locked_until = NULL, updated_at = ? "
+                "WHERE status = ? AND locked_until < ? AND attempts >= ?",
+                (FAILED, 'Job lease expired', now, RUNNING, now, self.max_attempts)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND locked_until < ?",
+                (QUEUED, now, RUNNING, now)
+            )
+
+    def _claim(self, conn, limit):
+        claimed = []
+        candidates = conn.execute(
+            "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?", (QUEUED, limit)
+        ).fetchall()
+        for (job_id,) in candidates:
+            now = time.time()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, locked_until = ?, updated_at = ? "
+                    "WHERE id = ? AND status = ?",
+                    (RUNNING, now + self.lease_seconds, now, job_id, QUEUED)
+                )
+            # Another process may have claimed it first
+            if cursor.rowcount:
+                claimed.append(self._row(job_id))
+        return claimed
+
+    def _dispatch(self):
+        conn = self._conn()
+        in_flight = {}
+        last_recovery = 0.0
+
+        while not self._stopping.is_set():
+            if time.monotonic() - last_recovery > min(self.lease_seconds, 30):
+                self._requeue_expired(conn)
+                last_recovery = time.monotonic()
+
+            free = self.workers - len(in_flight)
+            if free > 0:
+                for row in self._claim(conn, free):
+                    handler = self._handlers.get(row['kind'])
+                    if handler is None:
+                        self._finish(conn, row, error=f"No handler for job kind {row['kind']}")
+                        continue
+                    executor = self._executor
+                    try:
+                        future = executor.submit(handler, row['id'], json.loads(row['payload']), self.output_dir)
+                    except BrokenProcessPool as error:
+                        self._replace_broken(executor)
+                        self._finish(conn, row, error=f'{type(error).__name__}: {error}')
+                        continue
+                    future.add_done_callback(lambda _: self._wake.set())
+                    in_flight[future] = (row, executor)
+
+            for future in [future for future in in_flight if future.done()]:
+                row, executor = in_flight.pop(future)
+                error = future.exception()
+                if error is None:
+                    self._finish(conn, row, result=future.result())
+                else:
+                    if isinstance(error, BrokenProcessPool):
+                        self._replace_broken(executor)
+                    self._finish(conn, row, error=f'{type(error).__name__}: {error}')
+
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _finish(self, conn, row, result=None, error=None):
+        now = time.time()
+        if error is None:
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = NULL, locked_until = NULL, updated_at = ? WHERE id = ?",
+                    (DONE, json.dumps(result), now, row['id'])
+                )
+            hook = self._on_complete.get(row['kind'])
+            if hook:
+                try:
+                    hook(self._as_dict(self._row(row['id'])))
+                except Exception:
+                    logger.exception('Completion hook for job %s failed', row['id'])
+            return
+
+        status = QUEUED if row['attempts'] < self.max_attempts else FAILED
+        logger.warning('Job %s (%s) attempt %d failed: %s', row['id'], row['kind'], row['attempts'], error)
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, locked_until = NULL, updated_at = ? WHERE id = ?",
+                (status, error, now, row['id'])
+            )
+
+    def stats(self):
+        counts = dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            'workers': self.workers,
+            'running': self._thread is not None,
+            'jobs': {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)}
+        }
@@ -0,0 +1,243 @@
+"""Server-Sent Events stream of live registration and attendance counts.
+
+Dashboards used to poll, and every poll re-ran the dashboard's COUNT
+queries. Instead, the write routes publish what they just changed (a seat
+taken, a student waitlisted, a check-in, a new feedback rating) to
+``LiveUpdates`` as a delta for their college, and every open ``/api/stream``
+of that college receives it. Publishing renders the message once and hands
+it to each listener's queue, so no database is read however many dashboards
+are open.
+
+Deltas only ever say what changed, e.g. ``{"event_id": 3, "seats_taken": 1,
+"waitlisted": -1}`` for a promotion off the waitlist; clients load the
+totals once and add the deltas to them. Each message has an increasing id,
+and a browser reconnecting with ``Last-Event-ID`` gets the messages it
+missed replayed from a short history. When the gap is too old to replay, or
+a listener falls so far behind that its queue fills up, it gets a
+``resync`` message instead and should reload the totals.
+
+Listeners only exist in this process; with several worker processes each
+one publishes to its own listeners. Streams served on an asyncio event loop
+(see asgi.py) wait on an asyncio queue instead of holding a thread each;
+publishing threads hand them messages through the loop.
+
+This module only depends on the standard library and Flask so that both the
+SQLAlchemy backend and the sqlite3 simple backends can use it.
+"""
+import asyncio
+import collections
+import json
+import os
+import queue
+import threading
+import time
+
+from flask import Response, jsonify, request
+
+LIVE_QUEUE_SIZE = int(os.getenv('LIVE_QUEUE_SIZE', '256'))
+LIVE_HISTORY = int(os.getenv('LIVE_HISTORY', '512'))
+LIVE_MAX_LISTENERS = int(os.getenv('LIVE_MAX_LISTENERS', '100'))
+LIVE_KEEPALIVE = float(os.getenv('LIVE_KEEPALIVE', '15'))
+
+RESYNC = 'event: resync\ndata: {}\n\n'
+
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    # Tell nginx not to buffer the stream
+    'X-Accel-Buffering': 'no'
+}
+
+
+class _Listener:
+    def __init__(self, college_id, size, position):
+        self.college_id = college_id
+        self.queue = queue.Queue(size)
+        # Id of the last message the client has before what is queued
+        self.position = position
+
+    def offer(self, message):
+        """Queue ``message``; False if the listener is too far behind."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def resync(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(RESYNC)
+
+
+class _AsyncListener(_Listener):
+    """A listener whose stream runs on ``loop``; only the loop touches its queue."""
+
+    def __init__(self, college_id, size, position, loop, on_overflow):
+        self.college_id = college_id
+        self.queue = asyncio.Queue(size)
+        self.position = position
+        self.loop = loop
+        self._on_overflow = on_overflow
+
+    def offer(self, message):
+        self.loop.call_soon_threadsafe(self._offer, message)
+        return True
+
+    def _offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._on_overflow(self)
+
+
+class LiveUpdates:
+    def __init__(self, queue_size=LIVE_QUEUE_SIZE, history=LIVE_HISTORY, max_listeners=LIVE_MAX_LISTENERS,
+                 keepalive=LIVE_KEEPALIVE):
+        self.queue_size = queue_size
+        self.max_listeners = max_listeners
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._listeners = collections.defaultdict(set)
+        self.history = history
+        self._history = collections.defaultdict(collections.deque)
+        # Per college, the number of the last message that left the history
+        self._forgotten = collections.defaultdict(int)
+        # Ids are "<run>:<n>", so an id from before a restart is never replayed from
+        self._run = f'{int(time.time() * 1000):x}'
+        self._last = 0
+
+        # Stats
+        self._published = 0
+        self._delivered = 0
+        self._resyncs = 0
+
+    def _id(self, number):
+        return f'{self._run}:{number}'
+
+    def publish(self, college_id, kind, **delta):
+        """Send ``delta`` as a ``kind`` message to every listener of ``college_id``."""
+        with self._lock:
+            self._last += 1
+            message = f'id: {self._id(self._last)}\nevent: {kind}\ndata: {json.dumps(delta)}\n\n'
+            history = self._history[college_id]
+            if len(history) >= self.history:
+                self._forgotten[college_id] = history.popleft()[0]
+            history.append((self._last, message))
+            self._published += 1
+            for listener in self._listeners.get(college_id, ()):
+                if listener.offer(message):
+                    self._delivered += 1
+                else:
+                    # Too far behind to catch up; start it over from the totals
+                    listener.resync()
+                    self._resyncs += 1
+
+    def _overflowed(self, listener):
+        # An async listener's queue was full; runs on its loop
+        with self._lock:
+            self._delivered -= 1
+            self._resyncs += 1
+        listener.resync()
+
+    def _count(self):
+        return sum(len(listeners) for listeners in self._listeners.values())
+
+    def _missed(self, college_id, last_id):
+        """Messages after ``last_id``, or None if they can't all be replayed."""
+        run, _, number = (last_id or '').partition(':')
+        if run != self._run or not number.isdigit():
+            return None
+        number = int(number)
+        if number > self._last or number < self._forgotten.get(college_id, 0):
+            return None
+        missed = [message for message_number, message in self._history.get(college_id, ())
+                  if message_number > number]
+        return missed if len(missed) < self.queue_size else None
+
+    def full(self):
+        with self._lock:
+            return self._count() >= self.max_listeners
+
+    def subscribe(self, college_id, last_id=None, loop=None):
+        """Register a listener, for a stream running on ``loop`` if given. With
+        the ``last_id`` of a reconnecting client, the messages it missed are
+        queued for it, or a resync if that's not possible."""
+        with self._lock:
+            if loop is None:
+                listener = _Listener(college_id, self.queue_size, self._id(self._last))
+            else:
+                listener = _AsyncListener(college_id, self.queue_size, self._id(self._last), loop, self._overflowed)
+            if last_id is not None:
+                missed = self._missed(college_id, last_id)
+                if missed is None:
+                    listener.resync()
+                    self._resyncs += 1
+                else:
+                    listener.position = last_id
+                    for message in missed:
+                        listener.queue.put_nowait(message)
+            self._listeners[college_id].add(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            listeners = self._listeners.get(listener.college_id)
+            if listeners is not None:
+                listeners.discard(listener)
+                if not listeners:
+                    del self._listeners[listener.college_id]
+
+    def stream(self, college_id, last_id=None):
+        """SSE text for a new listener of ``college_id`` until the client goes
+        away. The listener is only registered once the response starts, so a
+        response that is never sent leaves nothing behind."""
+        listener = self.subscribe(college_id, last_id)
+        try:
+            # Reconnect quickly, from the position the stream started at
+            yield f'retry: 3000\nid: {listener.position}\n\n'
+            while True:
+                try:
+                    message = listener.queue.get(timeout=self.keepalive)
+                except queue.Empty:
+                    # Comments keep proxies from timing the connection out
+                    # and find disconnected clients
+                    yield ': keepalive\n\n'
+                    continue
+                yield message
+        finally:
+            self.unsubscribe(listener)
+
+    async def stream_async(self, college_id, last_id=None):
+        """``stream`` for an asyncio server; waiting costs no thread."""
+        listener = self.subscribe(college_id, last_id, asyncio.get_running_loop())
+        try:
+            yield f'retry: 3000\nid: {listener.position}\n\n'
+            while True:
+                try:
+                    message = await asyncio.wait_for(listener.queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield message
+        finally:
+            self.unsubscribe(listener)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'listeners': self._count(),
+                'colleges': len(self._listeners),
+                'max_listeners': self.max_listeners,
+                'published': self._published,
+                'delivered': self._delivered,
+                'resyncs': self._resyncs
+            }
+
+
+def event_stream(updates, college_id):
+    """The streaming response for one listener of ``college_id``."""
+    if updates.full():
+        return jsonify({'error': 'Too many live update streams open, try again later'}), 503
+    # Last-Event-ID is sent by a reconnecting EventSource
+    return Response(updates.stream(college_id, request.headers.get('Last-Event-ID')), mimetype='text/event-stream',
+                    headers=STREAM_HEADERS)
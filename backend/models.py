@@ -0,0 +1,177 @@
+"""SQLAlchemy models of the backend, and the attendance writes that keep
+StudentStats in step with them."""
+from datetime import datetime
+
+from sqlalchemy import text, update
+
+from extensions import db
+from checkins import CHECKED_IN, DUPLICATE, REJECTED
+
+# Database Models
+class College(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    code = db.Column(db.String(10), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    admins = db.relationship('Admin', backref='college', lazy=True)
+    students = db.relationship('Student', backref='college', lazy=True)
+    events = db.relationship('Event', backref='college', lazy=True)
+
+class Admin(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    password_hash = db.Column(db.String(128), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    college_id = db.Column(db.Integer, db.ForeignKey('college.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_active = db.Column(db.Boolean, default=True)
+
+class Student(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.String(20), unique=True, nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    password_hash = db.Column(db.String(128), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    phone = db.Column(db.String(15))
+    college_id = db.Column(db.Integer, db.ForeignKey('college.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_active = db.Column(db.Boolean, default=True)
+    
+    # Per-college counts and leaderboard joins
+    __table_args__ = (db.Index('ix_student_college_active', 'college_id', 'is_active'),)
+    
+    # Relationships
+    registrations = db.relationship('Registration', backref='student', lazy=True)
+    attendance = db.relationship('Attendance', backref='student', lazy=True)
+    feedback = db.relationship('Feedback', backref='student', lazy=True)
+
+class Event(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    event_type = db.Column(db.String(50), nullable=False)  # hackathon, workshop, fest, seminar
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
+    location = db.Column(db.String(200))
+    max_participants = db.Column(db.Integer, default=100)
+    seats_taken = db.Column(db.Integer, default=0, nullable=False)  # denormalized count of 'registered' rows
+    registration_deadline = db.Column(db.DateTime)
+    college_id = db.Column(db.Integer, db.ForeignKey('college.id'), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('admin.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_active = db.Column(db.Boolean, default=True)
+    qr_code = db.Column(db.Text)  # Artifact store key of the QR PNG
+    
+    # Event lists are always scoped to a college and ordered by date
+    __table_args__ = (
+        db.Index('ix_event_college_active_start', 'college_id', 'is_active', 'start_date'),
+        db.Index('ix_event_college_active_created', 'college_id', 'is_active', 'created_at'),
+        # Venue conflict listings
+        db.Index('ix_event_college_location', 'college_id', 'location'),
+    )
+    
+    # Relationships
+    registrations = db.relationship('Registration', backref='event', lazy=True)
+    attendance = db.relationship('Attendance', backref='event', lazy=True)
+    feedback = db.relationship('Feedback', backref='event', lazy=True)
+
+class Registration(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    registered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), default='registered')  # registered, waitlisted, cancelled
+    
+    # Unique constraint; (student_id, ...) lookups use it, per-event lists and
+    # the FIFO waitlist use the event index
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'event_id', name='unique_registration'),
+        db.Index('ix_registration_event_status', 'event_id', 'status', 'registered_at'),
+    )
+
+class Attendance(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    checked_in_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Scanner that recorded a batched check-in
+    device_id = db.Column(db.String(64))
+    
+    # Unique constraint
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'event_id', name='unique_attendance'),
+        db.Index('ix_attendance_event', 'event_id'),
+    )
+
+class Feedback(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
+    comment = db.Column(db.Text)
+    submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Unique constraint
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'event_id', name='unique_feedback'),
+        db.Index('ix_feedback_event', 'event_id'),
+    )
+
+class StudentStats(db.Model):
+    # Per-student tallies updated in the same transaction as each Attendance
+    # write, so the leaderboard reads an index instead of grouping attendance
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+    college_id = db.Column(db.Integer, db.ForeignKey('college.id'), nullable=False)
+    attendance_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (db.Index('ix_student_stats_college_attendance', 'college_id', 'attendance_count'),)
+
+def record_attendance_change(student_id, college_id, delta):
+    result = db.session.execute(
+        update(StudentStats)
+        .where(StudentStats.student_id == student_id)
+        .values(attendance_count=StudentStats.attendance_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.add(StudentStats(student_id=student_id, college_id=college_id, attendance_count=max(delta, 0)))
+
+# One statement that both checks and records: the event must belong to the
+# college and the student must hold a seat at it, and the (student_id,
+# event_id) constraint turns a repeat into a no-op
+RECORD_CHECKIN_SQL = text("""
+    INSERT INTO attendance (student_id, event_id, checked_in_at, device_id)
+    SELECT :student_id, id, :checked_in_at, :device_id FROM event
+    WHERE id = :event_id AND college_id = :college_id AND EXISTS (
+        SELECT 1 FROM registration
+        WHERE student_id = :student_id AND event_id = :event_id AND status = 'registered'
+    )
+    ON CONFLICT DO NOTHING
+""")
+
+def record_checkin(student_id, event_id, college_id, device_id=None):
+    """Record a check-in. Returns CHECKED_IN, DUPLICATE if the student was
+    already checked in, or REJECTED if the event isn't the college's or the
+    student holds no seat at it."""
+    result = db.session.execute(RECORD_CHECKIN_SQL, {
+        'student_id': student_id,
+        'event_id': event_id,
+        'college_id': college_id,
+        'checked_in_at': datetime.utcnow(),
+        'device_id': device_id
+    })
+    if result.rowcount:
+        record_attendance_change(student_id, college_id, 1)
+        db.session.commit()
+        return CHECKED_IN
+    db.session.commit()
+    
+    present = db.session.query(Attendance.id).join(Event, Event.id == Attendance.event_id).filter(
+        Attendance.student_id == student_id,
+        Attendance.event_id == event_id,
+        Event.college_id == college_id
+    ).first()
+    return DUPLICATE if present else REJECTED
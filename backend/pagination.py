@@ -0,0 +1,62 @@
+"""Keyset pagination and sparse field helpers for list endpoints.
+
+A cursor is the sort key of the last row on a page, so the next page is a
+plain index range seek instead of an OFFSET that re-reads every earlier row.
+Cursors are opaque to clients: base64url-encoded JSON.
+"""
+import base64
+import json
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class PaginationError(ValueError):
+    """Bad limit, cursor or fields parameter; reported to the client as a 400."""
+
+
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise PaginationError('Invalid cursor')
+    return values
+
+
+def parse_limit(value, default=None, maximum=200):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, maximum)
+
+
+def parse_fields(value, allowed, default):
+    """Return the requested field names, always including ``id``."""
+    if not value:
+        return list(default)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+
+def parse_order(value, default='asc'):
+    order = (value or default).lower()
+    if order not in ('asc', 'desc'):
+        raise PaginationError('order must be asc or desc')
+    return order
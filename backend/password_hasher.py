@@ -0,0 +1,201 @@
+"""Password hashing off the request thread.
+
+Werkzeug's password hashes are slow on purpose (600k PBKDF2 rounds), so a
+burst of logins when an event opens would otherwise tie up every request
+thread. ``PasswordHasher`` runs them on a fixed set of worker threads
+(``hashlib.pbkdf2_hmac`` releases the GIL) with a bounded queue in front:
+once ``workers + queue_limit`` hashes are outstanding, new requests fail
+fast with ``HashQueueFull`` and the app answers 503 with ``Retry-After``.
+
+Hashes from the simple backend's old unsalted SHA-256 scheme are still
+accepted by ``verify`` and reported as needing a rehash, so callers can
+upgrade them on the user's next successful login. So are PBKDF2 hashes with
+fewer rounds than Werkzeug's default, such as those written by the bulk
+student import (see ``student_import.py``).
+
+Imported accounts that never sign in would keep that cheaper hash, so
+``wrap_weak_hash`` strengthens it without the password: the stored digest is
+run through PBKDF2 again with the default rounds, giving a
+``pbkdf2:sha256:<rounds>+<rounds>$salt$hash`` that ``verify`` checks by
+repeating both steps. ``upgrade_weak_hashes`` applies it to a whole table.
+"""
+import bisect
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE', '32'))
+HASH_RETRY_AFTER = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', '1'))
+
+_LEGACY_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+# 'pbkdf2:sha256:<inner rounds>+<outer rounds>$salt$hash'
+_WRAPPED = re.compile(r'^pbkdf2:(\w+):(\d+)\+(\d+)\$([^$]*)\$([0-9a-f]+)$')
+
+
+class HashQueueFull(Exception):
+    """Raised when the hashing queue is full; reported to the client as a 503."""
+
+    def __init__(self, retry_after):
+        super().__init__('Too many sign-in requests, please retry shortly')
+        self.retry_after = retry_after
+
+
+class LatencyHistogram:
+    """Per-bucket latency counts in milliseconds (not cumulative)."""
+
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self, buckets_ms=BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self._count = 0
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+            self._count += 1
+            self._sum_ms += ms
+            self._max_ms = max(self._max_ms, ms)
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f'le_{bound}' for bound in self.buckets_ms] + ['le_inf']
+            return {
+                'count': self._count,
+                'avg_ms': round(self._sum_ms / self._count, 3) if self._count else 0,
+                'max_ms': round(self._max_ms, 3),
+                'buckets': dict(zip(labels, self._counts))
+            }
+
+
+def is_legacy_hash(pwhash):
+    return bool(_LEGACY_SHA256.match(pwhash or ''))
+
+
+def is_weak_hash(pwhash):
+    # 'pbkdf2:sha256:<rounds>$salt$hash'
+    method = (pwhash or '').split('$', 1)[0].split(':')
+    return (method[0] == 'pbkdf2' and len(method) == 3 and method[2].isdigit()
+            and int(method[2]) < DEFAULT_PBKDF2_ITERATIONS)
+
+
+def is_wrapped_hash(pwhash):
+    return bool(_WRAPPED.match(pwhash or ''))
+
+
+def wrap_weak_hash(pwhash):
+    """Strengthen a weak PBKDF2 hash by hashing its digest again."""
+    method, salt, digest = pwhash.split('$', 2)
+    _, algorithm, rounds = method.split(':')
+    outer = hashlib.pbkdf2_hmac(algorithm, digest.encode(), salt.encode(), DEFAULT_PBKDF2_ITERATIONS).hex()
+    return f'pbkdf2:{algorithm}:{rounds}+{DEFAULT_PBKDF2_ITERATIONS}${salt}${outer}'
+
+
+def check_wrapped_hash(pwhash, password):
+    algorithm, inner_rounds, outer_rounds, salt, digest = _WRAPPED.match(pwhash).groups()
+    inner = hashlib.pbkdf2_hmac(algorithm, password.encode(), salt.encode(), int(inner_rounds)).hex()
+    outer = hashlib.pbkdf2_hmac(algorithm, inner.encode(), salt.encode(), int(outer_rounds)).hex()
+    return hmac.compare_digest(outer, digest)
+
+
+def upgrade_weak_hashes(store, workers=HASH_WORKERS, batch_size=500, dry_run=False):
+    """Wrap every weak hash ``store`` holds; return how many were found (and,
+    unless ``dry_run``, upgraded).
+
+    ``store`` pages through ``pbkdf2_hashes(after_id, limit)`` and writes
+    ``replace_hashes([(new_hash, id, old_hash)])``. Runs on its own threads,
+    so sign-ins keep the ``PasswordHasher`` workers.
+    """
+    after_id, found = 0, 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hash-upgrade') as executor:
+        while True:
+            rows = store.pbkdf2_hashes(after_id, batch_size)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            weak = [(user_id, pwhash) for user_id, pwhash in rows if is_weak_hash(pwhash)]
+            found += len(weak)
+            if weak and not dry_run:
+                wrapped = executor.map(wrap_weak_hash, [pwhash for _, pwhash in weak])
+                store.replace_hashes([(new, user_id, old) for (user_id, old), new in zip(weak, wrapped)])
+    return found
+
+
+class PasswordHasher:
+    def __init__(self, workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT, retry_after=HASH_RETRY_AFTER):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+        # Stats
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._outstanding = 0
+        self.queue_wait = LatencyHistogram()
+        self.latency = {'hash': LatencyHistogram(), 'verify': LatencyHistogram()}
+
+    def _run(self, kind, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashQueueFull(self.retry_after)
+        with self._lock:
+            self._outstanding += 1
+        submitted = time.perf_counter()
+
+        def work():
+            started = time.perf_counter()
+            self.queue_wait.observe((started - submitted) * 1000)
+            try:
+                return fn(*args)
+            finally:
+                self.latency[kind].observe((time.perf_counter() - started) * 1000)
+
+        def done(_):
+            with self._lock:
+                self._outstanding -= 1
+            self._slots.release()
+
+        future = self._executor.submit(work)
+        future.add_done_callback(done)
+        return future.result()
+
+    def hash(self, password):
+        return self._run('hash', generate_password_hash, password)
+
+    def verify(self, pwhash, password):
+        """Return ``(matches, needs_rehash)`` for a stored hash."""
+        if is_legacy_hash(pwhash):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, pwhash), True
+        if is_wrapped_hash(pwhash):
+            return self._run('verify', check_wrapped_hash, pwhash, password), True
+        return self._run('verify', check_password_hash, pwhash, password), is_weak_hash(pwhash)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            outstanding = self._outstanding
+            rejected = self._rejected
+        return {
+            'workers': self.workers,
+            'queue_limit': self.queue_limit,
+            'outstanding': outstanding,
+            'rejected': rejected,
+            'queue_wait': self.queue_wait.snapshot(),
+            'latency': {kind: histogram.snapshot() for kind, histogram in self.latency.items()}
+        }
@@ -0,0 +1,105 @@
+"""Startup check that every registered query is served by an index.
+
+Each backend registers the SQL its routes issue. ``audit_query_plans`` runs
+``EXPLAIN QUERY PLAN`` on them and logs a warning for every full table scan
+that is left, so a new route that forgets its index shows up in the log the
+first time the server starts.
+
+Plans are taken against an empty copy of the schema. Once ``PRAGMA optimize``
+has gathered statistics on a small database, SQLite rightly prefers scanning
+a table of a few rows over its index, which would make every audit of a
+fresh install noisy; without statistics the planner assumes large tables and
+the plan shows whether an index can serve the query at all.
+
+This module only depends on the standard library so that both the SQLAlchemy
+backend and the sqlite3 simple backends can use it.
+"""
+import logging
+import re
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# "SCAN e" on SQLite >= 3.36, "SCAN TABLE events AS e" on older versions
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?(.*)$')
+_NOT_TABLES = {'SUBQUERY', 'CONSTANT'}
+
+
+class QueryRegistry:
+    def __init__(self):
+        self._queries = {}
+
+    def register(self, name, sql, allow_scan=()):
+        """Record a query for the audit and hand the SQL back unchanged.
+
+        ``allow_scan`` lists tables (or aliases) the query is meant to read in
+        full, such as aggregates over every event.
+        """
+        self._queries[name] = (sql, tuple(allow_scan))
+        return sql
+
+    def __iter__(self):
+        for name, (sql, allow_scan) in self._queries.items():
+            yield name, sql, allow_scan
+
+    def __len__(self):
+        return len(self._queries)
+
+
+def find_scans(conn, sql, params=None, allow_scan=()):
+    """Return the plan lines that read a whole table without an index."""
+    if params is None:
+        params = (None,) * sql.count('?')
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        match = _SCAN.match(detail)
+        if not match:
+            continue
+        table, alias, rest = match.groups()
+        if table in _NOT_TABLES or 'USING' in rest:
+            # Walking an index in order (e.g. ORDER BY ... LIMIT) is fine
+            continue
+        if table in allow_scan or alias in allow_scan:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def schema_copy(conn):
+    """An in-memory database with ``conn``'s tables, indexes and triggers but no rows or statistics."""
+    copy = sqlite3.connect(':memory:')
+    for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+    ).fetchall():
+        try:
+            copy.execute(sql)
+        except sqlite3.OperationalError:
+            # Shadow tables a virtual table already created in the copy
+            continue
+    return copy
+
+
+def audit_query_plans(conn, queries, log=logger):
+    """Warn about every registered query whose plan still contains a scan.
+
+    ``queries`` yields ``(name, sql, allow_scan)``. Returns a dict of
+    offending query names to their scan lines.
+    """
+    problems = {}
+    copy = schema_copy(conn)
+    try:
+        for name, sql, allow_scan in queries:
+            try:
+                scans = find_scans(copy, sql, allow_scan=allow_scan)
+            except Exception as error:
+                log.warning('Index audit could not explain %s: %s', name, error)
+                continue
+            if scans:
+                problems[name] = scans
+                log.warning('Index audit: %s does a full scan (%s)', name, '; '.join(scans))
+    finally:
+        copy.close()
+    return problems
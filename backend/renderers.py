@@ -0,0 +1,202 @@
+"""Job handlers that render event QR codes and participation certificates.
+
+These run in the job queue's worker processes (see ``jobs.py``), so they take
+plain JSON payloads and write their output to ``artifact_path`` under
+``output_dir``, the artifact store's root (see ``artifacts.py``). qrcode and
+ReportLab are imported lazily so that the app process never has to load them.
+
+Bump a ``*_TEMPLATE_VERSION`` whenever the drawing code changes; it is part
+of every artifact key, so files drawn from the old template stop being used.
+"""
+import hashlib
+import io
+import os
+import re
+from datetime import datetime
+
+CERTIFICATE_TEMPLATE_VERSION = 3
+QR_TEMPLATE_VERSION = 1
+
+
+def _write(output_dir, relative_path, data):
+    path = os.path.join(output_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so readers never see a half-written file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return relative_path
+
+
+def qr_png(data):
+    import qrcode
+
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(data)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = io.BytesIO()
+    qr_img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class CertificateTemplate:
+    """A certificate page drawn once by ReportLab, filled in per student.
+
+    Serializing a document is most of ReportLab's cost, so the fixed text,
+    fonts and page objects are rendered a single time with placeholders left
+    out. ``render`` only appends the per-student text operators to the page's
+    content stream, rewrites the cross-reference table from offsets worked
+    out here, and gives the document its own ``/ID`` (a digest of its bytes);
+    this is several times faster than drawing each certificate from scratch.
+
+    ``_split`` relies on the layout ReportLab writes with ``pageCompression=0``
+    and checks it against ReportLab's own cross-reference table, so a
+    ReportLab upgrade that changes it fails loudly instead of producing
+    broken PDFs.
+    """
+
+    # (font, size, distance from the top of the page, text)
+    STATIC_LINES = (
+        ("Helvetica-Bold", 24, 100, "CERTIFICATE OF PARTICIPATION"),
+        ("Helvetica", 16, 150, "This is to certify that"),
+        ("Helvetica", 16, 250, "has successfully participated in"),
+    )
+    FIELD_LINES = (
+        ("Helvetica-Bold", 20, 200, "{student_name}"),
+        ("Helvetica-Bold", 18, 300, "{event_title}"),
+        ("Helvetica", 14, 350, "held on {event_date}"),
+        ("Helvetica", 12, 400, "Generated on {generated_on}"),
+    )
+
+    def __init__(self):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+
+        self.width, self.height = letter
+        buffer = io.BytesIO()
+        # invariant: no timestamps or random ids, so the bytes are stable
+        p = canvas.Canvas(buffer, pagesize=letter, pageCompression=0, invariant=1)
+        for font, size, top, text in self.STATIC_LINES:
+            p.setFont(font, size)
+            p.drawCentredString(self.width/2, self.height - top, text)
+        p.save()
+        self._split(buffer.getvalue())
+
+    @staticmethod
+    def _search(pattern, data, what):
+        match = re.search(pattern, data)
+        if not match:
+            raise ValueError(f'Unexpected ReportLab output: no {what} in the certificate template')
+        return match
+
+    def _split(self, pdf):
+        contents = int(self._search(rb'/Contents (\d+) 0 R', pdf, 'page contents').group(1))
+        xref = pdf.rindex(b'\nxref\n') + 1
+        offsets = {int(m.group(1)): m.start() for m in re.finditer(rb'(?m)^(\d+) 0 obj', pdf[:xref])}
+        # Our object offsets must be the ones ReportLab wrote in its xref
+        entries = [int(offset) for offset in re.findall(rb'(?m)^(\d{10}) 00000 n ', pdf[xref:])]
+        if contents not in offsets or entries != [offsets.get(number) for number in range(1, len(offsets) + 1)]:
+            raise ValueError('Unexpected ReportLab output: objects of the certificate template not where '
+                             'its cross-reference table says')
+
+        start = offsets[contents]
+        stream_start = pdf.index(b'stream\n', start) + len(b'stream\n')
+        stream_end = pdf.index(b'endstream', stream_start)
+        end = pdf.index(b'endobj\n', stream_end) + len(b'endobj\n')
+        trailer = pdf[self._search(rb'trailer\s', pdf[xref:], 'trailer').start() + xref:pdf.rindex(b'startxref')]
+        doc_id = self._search(rb'/ID\s*\[<[0-9a-fA-F]+>\s*<[0-9a-fA-F]+>\]', trailer, 'document /ID')
+
+        self._before = pdf[:start]
+        self._contents_id = contents
+        self._static_ops = pdf[stream_start:stream_end].rstrip()
+        self._after = pdf[end:xref]
+        self._object_count = len(offsets)
+        self._offsets_before = {number: offset for number, offset in offsets.items() if offset < start}
+        self._offsets_after = {number: offset - end for number, offset in offsets.items() if offset >= end}
+        self._trailer_head, self._trailer_tail = trailer[:doc_id.start()], trailer[doc_id.end():]
+        self._fonts = {name.decode(): ref.decode() for name, ref in
+                       re.findall(rb'/BaseFont /([\w-]+) /Encoding /\w+ /Name /(F\d+)', pdf)}
+        missing = {font for font, *_ in self.FIELD_LINES} - self._fonts.keys()
+        if missing:
+            raise ValueError(f"Unexpected ReportLab output: font(s) {', '.join(sorted(missing))} not in the "
+                             "certificate template")
+
+    def _text_op(self, font, size, top, text):
+        from reportlab.lib.rl_accel import escapePDF, fp_str
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        x = self.width/2 - stringWidth(text, font, size)/2
+        # The standard fonts use WinAnsi; anything outside it prints as '?'
+        encoded = escapePDF(text.encode('cp1252', 'replace').decode('latin-1'))
+        return (f"BT /{self._fonts[font]} {fp_str(size)} Tf 1 0 0 1 {fp_str(x)} {fp_str(self.height - top)} Tm "
+                f"({encoded}) Tj ET").encode('latin-1')
+
+    def render(self, **fields):
+        ops = [self._static_ops] + [self._text_op(font, size, top, text.format(**fields))
+                                    for font, size, top, text in self.FIELD_LINES]
+        stream = b'\n'.join(ops) + b'\n'
+        contents = b''.join([
+            b'%d 0 obj\n<<\n/Length %d\n>>\nstream\n' % (self._contents_id, len(stream)),
+            stream,
+            b'endstream\nendobj\n'
+        ])
+        body = self._before + contents + self._after
+
+        offsets = dict(self._offsets_before)
+        offsets[self._contents_id] = len(self._before)
+        after = len(self._before) + len(contents)
+        offsets.update((number, after + offset) for number, offset in self._offsets_after.items())
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % (self._object_count + 1)]
+        xref += [b'%010d 00000 n \n' % offsets[number] for number in range(1, self._object_count + 1)]
+
+        # Readers tell documents apart by /ID; invariant mode gives every
+        # certificate the template's, so derive one from the content
+        doc_id = hashlib.md5(body).hexdigest().encode()
+        trailer = self._trailer_head + b'/ID \n[<%s><%s>]' % (doc_id, doc_id) + self._trailer_tail
+        return body + b''.join(xref) + trailer + b'startxref\n%d\n%%%%EOF\n' % len(body)
+
+
+_certificate_template = None
+
+
+def certificate_template():
+    """The per-process template; also used as the worker pool initializer."""
+    global _certificate_template
+    if _certificate_template is None:
+        _certificate_template = CertificateTemplate()
+    return _certificate_template
+
+
+def certificate_pdf(student_name, event_title, event_date, generated_on=None):
+    start_date = datetime.fromisoformat(event_date)
+    generated_on = generated_on or datetime.now()
+    return certificate_template().render(
+        student_name=student_name,
+        event_title=event_title,
+        event_date=start_date.strftime('%B %d, %Y'),
+        generated_on=generated_on.strftime('%B %d, %Y')
+    )
+
+
+def render_event_qr(job_id, payload, output_dir):
+    path = _write(output_dir, payload['artifact_path'], qr_png(payload['data']))
+    return {
+        'path': path,
+        'key': payload['artifact_key'],
+        'content_type': 'image/png',
+        'filename': f"event-{payload['event_id']}-qr.png"
+    }
+
+
+def render_certificate(job_id, payload, output_dir):
+    pdf = certificate_pdf(payload['student_name'], payload['event_title'], payload['event_date'])
+    path = _write(output_dir, payload['artifact_path'], pdf)
+    return {
+        'path': path,
+        'key': payload['artifact_key'],
+        'content_type': 'application/pdf',
+        'filename': f"certificate-{payload['event_id']}-{payload['student_id']}.pdf"
+    }
@@ -0,0 +1,316 @@
+"""Per-request timing, SQL statement counts and a Prometheus ``/metrics`` page.
+
+``init_app`` times every request from the first hook to the end of its
+response body, streamed exports included, and tallies the SQL statements
+issued while it ran. The SQLAlchemy backend feeds statements in through engine
+events (``instrument_engine``); the sqlite3 backends open their connections
+with ``TimedConnection``. Each response carries a ``Server-Timing`` header
+with the request's time so far and its query count and time. Statements
+slower than ``SLOW_QUERY_MS`` are logged with their bound parameters.
+
+With ``PROFILE_REQUESTS=1`` a request sent with an ``X-Debug-Profile`` header
+is run under cProfile, or pyinstrument if the header says so and it is
+installed. The profile is written to ``PROFILE_DIR``, and the response's
+``X-Profile`` header names the file. Only one request is profiled at a time.
+
+Counters are aggregated per route rule, not per URL, so event ids do not
+multiply the series. ``/metrics`` serves them in the Prometheus text format.
+It is open unless ``METRICS_TOKEN`` is set, in which case scrapers must send
+it as a bearer token.
+
+Statements run outside a request, at startup or on the write batcher's
+thread, are not counted. A statement's time is until its first row; rows
+fetched later are part of the request's time but not the query's.
+
+This module only depends on Flask and the standard library so that both the
+SQLAlchemy backend and the sqlite3 simple backends can use it.
+"""
+import collections
+import cProfile
+import hmac
+import importlib.util
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import Response, current_app, g, has_app_context, has_request_context, jsonify, request
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', '0') == '1'
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'campus-profiles'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+PROFILE_HEADER = 'X-Debug-Profile'
+PROFILE_FILE_HEADER = 'X-Profile'
+
+logger = logging.getLogger(__name__)
+
+_PARAMS_REPR_LIMIT = 500
+
+
+class RequestMetrics:
+    # Prometheus histogram bounds, in seconds
+    DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS, log=logger):
+        self.slow_query = slow_query_ms / 1000
+        self.log = log
+        self._lock = threading.Lock()
+
+        # Stats
+        self._requests = collections.Counter()  # (method, route, status)
+        self._durations = {}  # (method, route) -> [bucket counts..., sum, count]
+        self._queries = collections.Counter()  # route -> statements
+        self._query_seconds = collections.Counter()  # route -> seconds
+        self._slow_queries = 0
+        self._in_flight = 0
+
+    def observe_query(self, statement, parameters, seconds):
+        """Record one SQL statement against the current request, if any."""
+        in_request = has_request_context() and 'sql_queries' in g
+        if in_request:
+            g.sql_queries += 1
+            g.sql_seconds += seconds
+        if seconds >= self.slow_query:
+            with self._lock:
+                self._slow_queries += 1
+            params = repr(parameters)
+            if len(params) > _PARAMS_REPR_LIMIT:
+                params = params[:_PARAMS_REPR_LIMIT] + '...'
+            self.log.warning('Slow query (%.1f ms) on %s: %s; params=%s', seconds * 1000,
+                             request.path if in_request else '-', ' '.join(statement.split()), params)
+
+    def _started(self):
+        with self._lock:
+            self._in_flight += 1
+
+    def _finished(self, method, route, status, seconds, queries, query_seconds):
+        with self._lock:
+            self._in_flight -= 1
+            self._requests[method, route, status] += 1
+            histogram = self._durations.setdefault((method, route), [0] * (len(self.DURATION_BUCKETS) + 2))
+            for i, bound in enumerate(self.DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            self._queries[route] += queries
+            self._query_seconds[route] += query_seconds
+
+    def prometheus(self):
+        """The counters in the Prometheus text exposition format."""
+        with self._lock:
+            requests = sorted(self._requests.items())
+            durations = sorted((key, list(values)) for key, values in self._durations.items())
+            queries = sorted(self._queries.items())
+            query_seconds = dict(self._query_seconds)
+            slow_queries, in_flight = self._slow_queries, self._in_flight
+
+        lines = ['# HELP campus_http_requests_total Requests handled, by route rule and status.',
+                 '# TYPE campus_http_requests_total counter']
+        for (method, route, status), count in requests:
+            lines.append(f'campus_http_requests_total{_labels(method=method, route=route, status=status)} {count}')
+
+        lines += ['# HELP campus_http_request_duration_seconds Time from the request to the end of its response body.',
+                  '# TYPE campus_http_request_duration_seconds histogram']
+        for (method, route), histogram in durations:
+            cumulative = 0
+            for bound, count in zip(self.DURATION_BUCKETS, histogram):
+                cumulative += count
+                lines.append(f'campus_http_request_duration_seconds_bucket'
+                             f'{_labels(method=method, route=route, le=bound)} {cumulative}')
+            lines.append(f'campus_http_request_duration_seconds_bucket'
+                         f'{_labels(method=method, route=route, le="+Inf")} {histogram[-1]}')
+            lines.append(f'campus_http_request_duration_seconds_sum{_labels(method=method, route=route)} '
+                         f'{histogram[-2]:.6f}')
+            lines.append(f'campus_http_request_duration_seconds_count{_labels(method=method, route=route)} '
+                         f'{histogram[-1]}')
+
+        lines += ['# HELP campus_db_queries_total SQL statements issued while handling requests.',
+                  '# TYPE campus_db_queries_total counter']
+        lines += [f'campus_db_queries_total{_labels(route=route)} {count}' for route, count in queries]
+        lines += ['# HELP campus_db_query_seconds_total Time spent in those SQL statements.',
+                  '# TYPE campus_db_query_seconds_total counter']
+        lines += [f'campus_db_query_seconds_total{_labels(route=route)} {query_seconds[route]:.6f}'
+                  for route, _ in queries]
+        lines += ['# HELP campus_db_slow_queries_total Statements slower than the slow query threshold.',
+                  '# TYPE campus_db_slow_queries_total counter',
+                  f'campus_db_slow_queries_total {slow_queries}',
+                  '# HELP campus_http_requests_in_flight Requests being handled right now.',
+                  '# TYPE campus_http_requests_in_flight gauge',
+                  f'campus_http_requests_in_flight {in_flight}']
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class _Profile:
+    """cProfile or pyinstrument around one request; one request at a time."""
+
+    _busy = threading.Lock()
+
+    def __init__(self, kind):
+        self.kind = kind
+        if kind == 'pyinstrument':
+            from pyinstrument import Profiler
+            self.profiler = Profiler()
+        else:
+            self.profiler = cProfile.Profile()
+
+    @classmethod
+    def start(cls, requested):
+        if not cls._busy.acquire(blocking=False):
+            return None
+        kind = 'pyinstrument' if (requested.lower() == 'pyinstrument'
+                                  and importlib.util.find_spec('pyinstrument')) else 'cprofile'
+        profile = cls(kind)
+        if kind == 'pyinstrument':
+            profile.profiler.start()
+        else:
+            profile.profiler.enable()
+        return profile
+
+    def stop(self, directory, name):
+        """Stop profiling and write the profile; returns its file name."""
+        try:
+            if self.kind == 'pyinstrument':
+                self.profiler.stop()
+            else:
+                self.profiler.disable()
+            os.makedirs(directory, exist_ok=True)
+            filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}"
+            if self.kind == 'pyinstrument':
+                filename += '.html'
+                with open(os.path.join(directory, filename), 'w') as f:
+                    f.write(self.profiler.output_html())
+            else:
+                # Open with pstats, snakeviz or similar
+                filename += '.prof'
+                self.profiler.dump_stats(os.path.join(directory, filename))
+            return filename
+        finally:
+            self._busy.release()
+
+
+def init_app(app, metrics, profile=PROFILE_REQUESTS, profile_dir=PROFILE_DIR, token=METRICS_TOKEN):
+    """Time ``app``'s requests into ``metrics`` and serve them at ``/metrics``."""
+    app.extensions['request_metrics'] = metrics
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+        metrics._started()
+        if profile and request.headers.get(PROFILE_HEADER):
+            g.request_profile = _Profile.start(request.headers[PROFILE_HEADER])
+
+    @app.after_request
+    def add_server_timing(response):
+        if 'request_started' not in g:
+            return response
+        profiled = g.pop('request_profile', None)
+        if profiled:
+            response.headers[PROFILE_FILE_HEADER] = profiled.stop(profile_dir, request.endpoint or 'unmatched')
+        g.response_status = response.status_code
+        elapsed_ms = (time.perf_counter() - g.request_started) * 1000
+        response.headers.add('Server-Timing', f'app;dur={elapsed_ms:.1f}')
+        response.headers.add('Server-Timing', f'db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_queries} queries"')
+        return response
+
+    @app.teardown_request
+    def record_request(exc):
+        # Runs once the response body has been sent, streamed or not
+        if 'request_started' not in g:
+            return
+        profiled = g.pop('request_profile', None)
+        if profiled:
+            profiled.stop(profile_dir, request.endpoint or 'unmatched')
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics._finished(request.method, route, g.pop('response_status', 500),
+                          time.perf_counter() - g.pop('request_started'),
+                          g.pop('sql_queries'), g.pop('sql_seconds'))
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({'error': 'Metrics token required'}), 401
+        return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+def instrument_engine(engine, metrics):
+    """Time every statement ``engine`` runs into ``metrics``."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        metrics.observe_query(statement, parameters, time.perf_counter() - conn.info['query_started'].pop())
+
+    @event.listens_for(engine, 'handle_error')
+    def discard_query_timer(context):
+        started = context.connection.info.get('query_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def _observe(statement, parameters, started):
+    if has_app_context():
+        metrics = current_app.extensions.get('request_metrics')
+        if metrics is not None:
+            metrics.observe_query(statement, parameters, time.perf_counter() - started)
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe(sql, parameters, started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe(sql, '<executemany>', started)
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            _observe(sql_script, (), started)
+
+
+class TimedConnection(sqlite3.Connection):
+    """A connection whose statements are timed into the app's RequestMetrics;
+    pass as ``factory`` to ``sqlite3.connect``."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The C implementations of these skip the cursor's Python methods
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
@@ -0,0 +1,182 @@
+"""Cached JSON for the read-heavy GET routes, with ETags and 304s.
+
+Each college has a data version that write paths bump (``bump``) once they
+have committed. A cached response is kept under its route, query string and
+the parts of the caller's identity it depends on (``scope``), and tagged
+with a strong ETag made from that key and the college's version when it was
+built. A request whose ``If-None-Match`` carries the current tag gets a 304
+straight away, without the view or the cache being looked at; otherwise a
+cached body with the current tag is sent as is, and anything else is built
+by the view and cached for the next request.
+
+Versions are per process, like the dashboard cache, so a write served by
+another worker is not seen until the tag's period of ``ttl`` seconds runs
+out; that also refreshes lists such as upcoming events, which change with
+the clock rather than with writes. ``ttl`` 0 turns caching off. The cache
+is an LRU bounded by both entry count and total body size.
+
+This module only depends on the standard library and Flask so that both the
+SQLAlchemy backend and the sqlite3 simple backends can use it.
+"""
+import collections
+import functools
+import hashlib
+import os
+import threading
+import time
+
+from flask import Response, current_app, request
+
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '60'))
+RESPONSE_CACHE_ENTRIES = int(os.getenv('RESPONSE_CACHE_ENTRIES', '1024'))
+RESPONSE_CACHE_BYTES = int(float(os.getenv('RESPONSE_CACHE_MB', '32')) * 1024 * 1024)
+
+# Clients must revalidate, and only their own cache may keep the response
+CACHE_CONTROL = 'private, no-cache'
+VARY = 'Authorization'
+
+# compression.py tags a compressed body "<tag>-<encoding>"
+_ENCODING_SUFFIXES = ('-gzip"', '-br"')
+
+
+def _unencoded(tag):
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+class ResponseCache:
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_ENTRIES, max_bytes=RESPONSE_CACHE_BYTES,
+                 clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> (etag, body, headers)
+        self._bytes = 0
+        self._versions = collections.Counter()
+        # A restarted process starts counting again; its tags must not match old ones
+        self._run = f'{int(time.time() * 1000):x}'
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def bump(self, college_id):
+        """Mark ``college_id``'s data as changed."""
+        with self._lock:
+            self._versions[college_id] += 1
+
+    def etag(self, key, college_id):
+        """The tag of ``key``'s response at ``college_id``'s current version."""
+        with self._lock:
+            version = self._versions[college_id]
+        period = int(self._clock() // self.ttl)
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+        return f'"{self._run}-{version}-{period}-{digest}"'
+
+    def matches(self, if_none_match, etag):
+        """Whether an ``If-None-Match`` header lets the response be a 304."""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        # If-None-Match compares weakly, so any encoding of the body matches
+        if '*' in tags or etag in (_unencoded(tag) for tag in tags):
+            with self._lock:
+                self.not_modified += 1
+            return True
+        return False
+
+    def get(self, key, etag):
+        """``(body, headers)`` cached for ``key`` under ``etag``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+            return None
+
+    def set(self, key, etag, body, headers):
+        # A body that would push out a large part of the cache isn't worth keeping
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[key] = (etag, body, headers)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions
+            }
+
+
+def validator_headers(etag):
+    return {'ETag': etag, 'Cache-Control': CACHE_CONTROL, 'Vary': VARY}
+
+
+def cached_response(cache, scope):
+    """Cache a JSON GET view in ``cache``. ``scope()`` returns the college id
+    followed by whatever else of the caller the response depends on, e.g. the
+    role, or the user's id for a per-user page."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not cache.enabled:
+                return view(*args, **kwargs)
+            college_id, *identity = scope()
+            key = (request.path, tuple(sorted(request.args.items(multi=True))), college_id, *identity)
+            # Taken before the view reads anything, so a write committing
+            # meanwhile leaves the response tagged as older than it may be
+            etag = cache.etag(key, college_id)
+            if cache.matches(request.headers.get('If-None-Match'), etag):
+                return Response(status=304, headers=validator_headers(etag))
+
+            entry = cache.get(key, etag)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = (response.get_data(), [(name, value) for name, value in response.headers
+                                               if name != 'Content-Length'])
+                cache.set(key, etag, *entry)
+            body, headers = entry
+            response = Response(body, headers=headers)
+            response.headers.update(validator_headers(etag))
+            return response
+        return wrapper
+    return decorator
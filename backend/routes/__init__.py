@@ -0,0 +1,26 @@
+"""The backend's API, one blueprint per area: auth, events (with registration
+and feedback), attendance, reports (dashboards, leaderboard, live updates and
+system stats) and certificates (with the background job routes).
+
+``create_app`` in app.py registers them all; the routes share the
+extensions and services in extensions.py.
+"""
+from flask_jwt_extended import get_jwt_identity
+
+
+def college_scope():
+    current_user = get_jwt_identity()
+    return current_user['college_id'], current_user['role']
+
+
+def user_scope():
+    current_user = get_jwt_identity()
+    return current_user['college_id'], current_user['role'], current_user['id']
+
+
+def register_blueprints(app):
+    from routes import attendance, auth, certificates, events, reports
+
+    for module in (auth, events, attendance, reports, certificates):
+        app.register_blueprint(module.bp)
+    certificates.register_jobs(app)
@@ -0,0 +1,145 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+import extensions
+from extensions import db, invalidate_caches, live_updates
+from models import Attendance, Event, Registration, record_attendance_change, record_checkin
+from checkin_tokens import InvalidCheckinToken, expiry_isoformat, token_expiry
+from checkins import (DUPLICATE, REJECTED, CheckinBatchError, parse_checkins, resolve_checkins, student_ids,
+                      summarize)
+
+bp = Blueprint('attendance', __name__)
+
+def issue_checkin_token(student_id, event):
+    expires = token_expiry(event.end_date)
+    return {'token': extensions.checkin_tokens.issue(student_id, event.id, expires),
+            'expires_at': expiry_isoformat(expires)}
+
+# Attendance Routes
+@bp.route('/api/events/<int:event_id>/checkin', methods=['POST'])
+@jwt_required()
+def check_in_event(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'student':
+        return jsonify({'error': 'Student access required'}), 403
+    
+    # Check if student is registered
+    registration = Registration.query.filter_by(
+        student_id=current_user['id'], 
+        event_id=event_id,
+        status='registered'
+    ).first()
+    
+    if not registration:
+        return jsonify({'error': 'Not registered for this event'}), 400
+    
+    status = record_checkin(current_user['id'], event_id, current_user['college_id'])
+    if status == DUPLICATE:
+        return jsonify({'error': 'Already checked in'}), 400
+    if status == REJECTED:
+        return jsonify({'error': 'Event not found'}), 404
+    invalidate_caches(current_user['college_id'])
+    live_updates.publish(current_user['college_id'], 'checkins', event_id=event_id, checked_in=1)
+    
+    return jsonify({'message': 'Checked in successfully'})
+
+@bp.route('/api/events/<int:event_id>/checkin-token', methods=['GET'])
+@jwt_required()
+def get_checkin_token(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'student':
+        return jsonify({'error': 'Student access required'}), 403
+    
+    registration = Registration.query.filter_by(
+        student_id=current_user['id'],
+        event_id=event_id,
+        status='registered'
+    ).first()
+    if not registration:
+        return jsonify({'error': 'Not registered for this event'}), 400
+    
+    return jsonify(issue_checkin_token(current_user['id'], registration.event))
+
+@bp.app_errorhandler(InvalidCheckinToken)
+def invalid_checkin_token(error):
+    return jsonify({'error': str(error)}), 400
+
+@bp.route('/api/events/<int:event_id>/checkin/scan', methods=['POST'])
+@jwt_required()
+def scan_checkin(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    # Forged, expired and wrong-event codes stop here, before any query
+    claims = extensions.checkin_tokens.verify(data.get('token'), event_id)
+    
+    # A code outlives a cancelled registration, so the seat is checked again here
+    status = record_checkin(claims.student_id, event_id, current_user['college_id'], data.get('device_id'))
+    if status == DUPLICATE:
+        return jsonify({'message': 'Already checked in', 'student_id': claims.student_id}), 200
+    if status == REJECTED:
+        if not Event.query.filter_by(id=event_id, college_id=current_user['college_id']).first():
+            return jsonify({'error': 'Event not found'}), 404
+        return jsonify({'error': 'Not registered for this event', 'student_id': claims.student_id}), 400
+    invalidate_caches(current_user['college_id'])
+    live_updates.publish(current_user['college_id'], 'checkins', event_id=event_id, checked_in=1)
+    
+    return jsonify({'message': 'Checked in successfully', 'student_id': claims.student_id}), 201
+
+@bp.app_errorhandler(CheckinBatchError)
+def checkin_batch_error(error):
+    return jsonify({'error': str(error)}), 400
+
+def apply_checkins(event, checkins):
+    ids = student_ids(checkins)
+    registered = set(db.session.scalars(select(Registration.student_id).where(
+        Registration.event_id == event.id,
+        Registration.status == 'registered',
+        Registration.student_id.in_(ids)
+    )))
+    present = set(db.session.scalars(select(Attendance.student_id).where(
+        Attendance.event_id == event.id,
+        Attendance.student_id.in_(ids)
+    )))
+    new, results = resolve_checkins(checkins, registered, present, 'Not registered for this event')
+    
+    if new:
+        db.session.execute(insert(Attendance), [{
+            'student_id': checkin['student_id'],
+            'event_id': event.id,
+            'checked_in_at': checkin['checked_in_at'],
+            'device_id': checkin['device_id']
+        } for checkin in new])
+        for checkin in new:
+            record_attendance_change(checkin['student_id'], event.college_id, 1)
+    db.session.commit()
+    return new, results
+
+@bp.route('/api/events/<int:event_id>/checkins', methods=['POST'])
+@jwt_required()
+def sync_checkins(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    checkins = parse_checkins(request.get_json(silent=True),
+                              verify_token=lambda token: extensions.checkin_tokens.verify(token, event_id))
+    event = Event.query.filter_by(id=event_id, college_id=current_user['college_id']).first()
+    if not event:
+        return jsonify({'error': 'Event not found'}), 404
+    
+    try:
+        new, results = apply_checkins(event, checkins)
+    except IntegrityError:
+        # Another device checked one of these students in meanwhile; the
+        # retry reports them as duplicates
+        db.session.rollback()
+        new, results = apply_checkins(event, checkins)
+    
+    if new:
+        invalidate_caches(event.college_id)
+        live_updates.publish(event.college_id, 'checkins', event_id=event_id, checked_in=len(new))
+    return jsonify(summarize(results))
@@ -0,0 +1,167 @@
+import click
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from datetime import datetime
+from sqlalchemy import select, text
+from extensions import db, invalidate_caches, password_hasher, student_importer
+from models import Admin, Student
+from password_hasher import HashQueueFull, upgrade_weak_hashes
+from student_import import ImportFileError, ImportUnavailable, read_records
+
+bp = Blueprint('auth', __name__)
+
+# Authentication Routes
+@bp.app_errorhandler(HashQueueFull)
+def hash_queue_full(error):
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+@bp.route('/api/auth/admin/login', methods=['POST'])
+def admin_login():
+    data = request.get_json()
+    admin = Admin.query.filter_by(username=data['username'], is_active=True).first()
+    
+    if admin and password_hasher.verify(admin.password_hash, data['password'])[0]:
+        access_token = create_access_token(identity={'id': admin.id, 'role': 'admin', 'college_id': admin.college_id})
+        return jsonify({
+            'access_token': access_token,
+            'user': {
+                'id': admin.id,
+                'username': admin.username,
+                'name': admin.name,
+                'college_id': admin.college_id,
+                'role': 'admin'
+            }
+        })
+    
+    return jsonify({'error': 'Invalid credentials'}), 401
+
+@bp.route('/api/auth/student/login', methods=['POST'])
+def student_login():
+    data = request.get_json()
+    student = Student.query.filter_by(email=data['email'], is_active=True).first()
+    matches, needs_rehash = password_hasher.verify(student.password_hash, data['password']) if student else (False, False)
+    
+    if matches and needs_rehash:
+        # Imported accounts carry a cheaper hash until their first sign-in
+        student.password_hash = password_hasher.hash(data['password'])
+        db.session.commit()
+    
+    if matches:
+        access_token = create_access_token(identity={'id': student.id, 'role': 'student', 'college_id': student.college_id})
+        return jsonify({
+            'access_token': access_token,
+            'user': {
+                'id': student.id,
+                'student_id': student.student_id,
+                'email': student.email,
+                'name': student.name,
+                'college_id': student.college_id,
+                'role': 'student'
+            }
+        })
+    
+    return jsonify({'error': 'Invalid credentials'}), 401
+
+@bp.route('/api/auth/student/register', methods=['POST'])
+def student_register():
+    data = request.get_json()
+    
+    # Check if student already exists
+    if Student.query.filter_by(email=data['email']).first():
+        return jsonify({'error': 'Email already registered'}), 400
+    
+    if Student.query.filter_by(student_id=data['student_id']).first():
+        return jsonify({'error': 'Student ID already exists'}), 400
+    
+    # Create new student
+    student = Student(
+        student_id=data['student_id'],
+        email=data['email'],
+        password_hash=password_hasher.hash(data['password']),
+        name=data['name'],
+        phone=data.get('phone'),
+        college_id=data['college_id']
+    )
+    
+    db.session.add(student)
+    db.session.commit()
+    invalidate_caches(student.college_id)
+    
+    return jsonify({'message': 'Student registered successfully'}), 201
+
+class StudentImportStore:
+    """The student table as seen by StudentImporter, for one college."""
+    
+    INSERT_SQL = text("""
+        INSERT INTO student (student_id, email, password_hash, name, phone, college_id, created_at, is_active)
+        VALUES (:student_id, :email, :password_hash, :name, :phone, :college_id, :created_at, 1)
+        ON CONFLICT DO NOTHING
+    """)
+    
+    def __init__(self, college_id):
+        self.college_id = college_id
+    
+    def taken(self, students):
+        ids = [s['student_id'] for s in students]
+        emails = [s['email'] for s in students]
+        return (set(db.session.scalars(select(Student.student_id).where(Student.student_id.in_(ids)))),
+                set(db.session.scalars(select(Student.email).where(Student.email.in_(emails)))))
+    
+    def insert(self, students):
+        now = datetime.utcnow()
+        result = db.session.execute(self.INSERT_SQL, [dict(s, college_id=self.college_id, created_at=now)
+                                                      for s in students])
+        db.session.commit()
+        if result.rowcount == len(students):
+            return {s['student_id'] for s in students}
+        # Lost a race for some ids or emails; ours hold the hash just written
+        stored = dict(db.session.execute(select(Student.student_id, Student.password_hash).where(
+            Student.student_id.in_([s['student_id'] for s in students]))).all())
+        return {s['student_id'] for s in students if stored.get(s['student_id']) == s['password_hash']}
+    
+    def pbkdf2_hashes(self, after_id, limit):
+        return db.session.execute(select(Student.id, Student.password_hash).where(
+            Student.id > after_id, Student.password_hash.like('pbkdf2:%')
+        ).order_by(Student.id).limit(limit)).all()
+    
+    def replace_hashes(self, rows):
+        db.session.execute(text("UPDATE student SET password_hash = :new WHERE id = :id AND password_hash = :old"),
+                           [{'new': new, 'id': student_id, 'old': old} for new, student_id, old in rows])
+        db.session.commit()
+
+@bp.app_errorhandler(ImportFileError)
+def import_file_error(error):
+    return jsonify({'error': str(error)}), 400
+
+@bp.app_errorhandler(ImportUnavailable)
+def import_unavailable(error):
+    response = jsonify({'error': str(error), 'created': error.created})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+@bp.route('/api/admin/students/import', methods=['POST'])
+@jwt_required()
+def import_students():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    upload = request.files.get('file')
+    if not upload:
+        raise ImportFileError('Attach the CSV or XLSX file as "file"')
+    
+    college_id = current_user['college_id']
+    report = student_importer.run(read_records(upload.stream, upload.filename), StudentImportStore(college_id))
+    if report['created']:
+        invalidate_caches(college_id)
+    
+    return jsonify(report), 201 if report['created'] else 200
+
+@bp.cli.command('upgrade-import-hashes')
+@click.option('--dry-run', is_flag=True, help='Only count the accounts still on an import hash.')
+def upgrade_import_hashes(dry_run):
+    """Bring imported accounts that never signed in up to full-strength hashes."""
+    found = upgrade_weak_hashes(StudentImportStore(None), dry_run=dry_run)
+    click.echo(f"{found} imported account(s) on a weak hash{'' if dry_run else ', upgraded'}")
@@ -0,0 +1,181 @@
+from flask import Blueprint, Response, jsonify, stream_with_context, url_for
+from flask_jwt_extended import jwt_required, get_jwt_identity
+import functools
+import os
+from sqlalchemy import select, update
+import extensions
+from extensions import db, response_cache
+from models import Attendance, Event, Student
+from artifacts import ArtifactStore
+from certificate_export import EXPORT_ID_HEADER, ExportUnavailable
+import renderers
+
+bp = Blueprint('certificates', __name__)
+
+@bp.app_errorhandler(ExportUnavailable)
+def export_unavailable(error):
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+# Certificate Generation Route
+@bp.route('/api/events/<int:event_id>/certificate/<int:student_id>', methods=['GET'])
+@jwt_required()
+def generate_certificate(event_id, student_id):
+    current_user = get_jwt_identity()
+    
+    # Verify student attended the event
+    attendance = Attendance.query.filter_by(
+        student_id=student_id, 
+        event_id=event_id
+    ).first()
+    
+    if not attendance:
+        return jsonify({'error': 'Student did not attend this event'}), 400
+    
+    student = Student.query.get(student_id)
+    event = Event.query.get(event_id)
+    
+    # Same name, event and template means the same PDF: serve the stored one
+    inputs = {'student_name': student.name, 'event_title': event.title, 'event_date': event.start_date.isoformat()}
+    key = ArtifactStore.key_for('certificate', renderers.CERTIFICATE_TEMPLATE_VERSION, **inputs)
+    if extensions.artifact_store.exists(key, 'pdf'):
+        return extensions.artifact_store.send(key, 'pdf', 'application/pdf',
+                                              download_name=f'certificate-{event.id}-{student.id}.pdf')
+    
+    job = extensions.job_queue.enqueue('certificate', {
+        'event_id': event.id,
+        'student_id': student.id,
+        **inputs,
+        'artifact_key': key,
+        'artifact_path': extensions.artifact_store.relative_path(key, 'pdf')
+    }, dedupe_key=f'certificate:{event.id}:{student.id}:{key}', requeue_done=True,
+       owner=f"{current_user['role']}:{current_user['id']}", college_id=event.college_id)
+    
+    return jsonify(job_status(job)), 202
+
+@bp.route('/api/events/<int:event_id>/certificates.zip', methods=['GET'])
+@jwt_required()
+def export_certificates(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    event = Event.query.filter_by(id=event_id, college_id=current_user['college_id']).first()
+    if not event:
+        return jsonify({'error': 'Event not found'}), 404
+    
+    # Every attendee in one query rather than a lookup per certificate
+    attendees = db.session.execute(
+        select(Student.id, Student.name)
+        .join(Attendance, Attendance.student_id == Student.id)
+        .where(Attendance.event_id == event.id)
+        .order_by(Student.id)
+    ).all()
+    
+    event_date = event.start_date.isoformat()
+    items = []
+    for student_id, student_name in attendees:
+        key = ArtifactStore.key_for('certificate', renderers.CERTIFICATE_TEMPLATE_VERSION, student_name=student_name,
+                                    event_title=event.title, event_date=event_date)
+        items.append({
+            'event_id': event.id,
+            'student_id': student_id,
+            'student_name': student_name,
+            'event_title': event.title,
+            'event_date': event_date,
+            'artifact_key': key,
+            'artifact_path': extensions.artifact_store.relative_path(key, 'pdf'),
+            'filename': f'certificate-{event.id}-{student_id}.pdf'
+        })
+    
+    export_id = extensions.certificate_exporter.start(items)
+    stream = extensions.certificate_exporter.stream_zip(export_id, items)
+    # Wait for the first chunk, so a broken render pool is still a 503 rather
+    # than a truncated download
+    first = next(stream)
+    
+    def resumed():
+        yield first
+        yield from stream
+    
+    return Response(stream_with_context(resumed()), mimetype='application/zip', headers={
+        'Content-Disposition': f'attachment; filename=certificates-event-{event.id}.zip',
+        EXPORT_ID_HEADER: export_id
+    })
+
+@bp.route('/api/exports/<export_id>', methods=['GET'])
+@jwt_required()
+def get_export_progress(export_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    progress = extensions.certificate_exporter.progress(export_id)
+    if not progress:
+        return jsonify({'error': 'Export not found'}), 404
+    return jsonify(progress)
+
+# Background Job Routes
+def job_status(job):
+    status = {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'status_url': url_for('certificates.get_job', job_id=job['id'])
+    }
+    if job['status'] == 'done':
+        status['result_url'] = url_for('certificates.get_job_result', job_id=job['id'])
+    if job['error']:
+        status['error'] = job['error']
+    return status
+
+def visible_job(job_id):
+    current_user = get_jwt_identity()
+    job = extensions.job_queue.get(job_id)
+    if not job:
+        return None
+    if job['owner'] == f"{current_user['role']}:{current_user['id']}":
+        return job
+    if current_user['role'] == 'admin' and job['college_id'] == current_user['college_id']:
+        return job
+    return None
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    job = visible_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job_status(job))
+
+@bp.route('/api/jobs/<job_id>/result', methods=['GET'])
+@jwt_required()
+def get_job_result(job_id):
+    job = visible_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    path = extensions.job_queue.result_path(job)
+    if not path or not os.path.exists(path):
+        return jsonify({'error': 'Job has not finished', 'status': job['status']}), 409
+    
+    return extensions.artifact_store.send(job['result']['key'], os.path.splitext(path)[1][1:],
+                                          job['result']['content_type'], download_name=job['result']['filename'])
+
+def store_event_qr(app, job):
+    # The events row only keeps the artifact key, not the image
+    with app.app_context():
+        event_id = job['payload']['event_id']
+        db.session.execute(update(Event).where(Event.id == event_id).values(qr_code=job['result']['key']))
+        db.session.commit()
+        # The events list links the new QR code
+        college_id = db.session.scalar(select(Event.college_id).where(Event.id == event_id))
+        if college_id is not None:
+            response_cache.bump(college_id)
+
+def register_jobs(app):
+    extensions.job_queue.register('event_qr', renderers.render_event_qr, on_complete=functools.partial(store_event_qr, app))
+    extensions.job_queue.register('certificate', renderers.render_certificate)
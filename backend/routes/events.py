@@ -0,0 +1,545 @@
+from flask import Blueprint, request, jsonify, url_for
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
+from sqlalchemy import case, desc, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
+import extensions
+from extensions import db, invalidate_caches, live_updates, response_cache
+from models import Attendance, Event, Feedback, Registration, Student
+from artifacts import ArtifactStore
+from exports import ExportError, export_response, parse_format
+from event_search import SearchError, match_expression, search_sql
+from schedule_conflicts import (ACTIVE_STATUSES, ScheduleError, overlap_params, overlap_sql, registered_condition,
+                                student_conflicts_sql, venue_conflicts_sql)
+from response_cache import cached_response
+import renderers
+from pagination import (NEXT_CURSOR_HEADER, PaginationError, decode_cursor, encode_cursor,
+                        parse_fields, parse_limit, parse_order)
+from routes import college_scope
+from routes.attendance import issue_checkin_token
+
+bp = Blueprint('events', __name__)
+
+# Event Management Routes
+# Fields a client can pick with ?fields=, mapped to their serializers; the
+# JSON provider writes dates as ISO 8601
+EVENT_FIELDS = {
+    'id': lambda event: event.id,
+    'title': lambda event: event.title,
+    'description': lambda event: event.description,
+    'event_type': lambda event: event.event_type,
+    'start_date': lambda event: event.start_date,
+    'end_date': lambda event: event.end_date,
+    'location': lambda event: event.location,
+    'max_participants': lambda event: event.max_participants,
+    'seats_taken': lambda event: event.seats_taken,
+    'registration_deadline': lambda event: event.registration_deadline,
+    'created_at': lambda event: event.created_at,
+    # Only the artifact key is stored; clients get the image's URL
+    'qr_code': lambda event: url_for('events.get_event_qr', event_id=event.id) if event.qr_code else None,
+}
+DEFAULT_EVENT_FIELDS = list(EVENT_FIELDS)
+
+@bp.app_errorhandler(PaginationError)
+@bp.app_errorhandler(ExportError)
+@bp.app_errorhandler(SearchError)
+@bp.app_errorhandler(ScheduleError)
+def bad_query_parameter(error):
+    return jsonify({'error': str(error)}), 400
+
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f'{name} must be an ISO date')
+
+@bp.route('/api/events', methods=['GET'])
+@jwt_required()
+@cached_response(response_cache, college_scope)
+def get_events():
+    current_user = get_jwt_identity()
+    college_id = current_user['college_id']
+    
+    fields = parse_fields(request.args.get('fields'), EVENT_FIELDS, DEFAULT_EVENT_FIELDS)
+    limit = parse_limit(request.args.get('limit'))
+    order = parse_order(request.args.get('order'))
+    cursor = request.args.get('cursor')
+    
+    query = Event.query.filter_by(college_id=college_id, is_active=True)
+    
+    # Filters
+    event_type = request.args.get('event_type')
+    if event_type and event_type != 'all':
+        query = query.filter(Event.event_type == event_type)
+    
+    start_date = parse_date_arg('start_date')
+    if start_date:
+        query = query.filter(Event.start_date >= start_date)
+    
+    end_date = parse_date_arg('end_date')
+    if end_date:
+        query = query.filter(Event.end_date <= end_date)
+    
+    when = request.args.get('when')
+    if when == 'upcoming':
+        query = query.filter(Event.end_date >= datetime.utcnow())
+    elif when == 'past':
+        query = query.filter(Event.end_date < datetime.utcnow())
+    elif when:
+        raise PaginationError('when must be upcoming or past')
+    
+    # Keyset pagination on (start_date, id), served by ix_event_college_active_start
+    sort_key = tuple_(Event.start_date, Event.id)
+    if cursor:
+        last_start, last_id = decode_cursor(cursor, 2)
+        try:
+            after = (datetime.fromisoformat(last_start), int(last_id))
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+        query = query.filter(sort_key > after if order == 'asc' else sort_key < after)
+    
+    if order == 'asc':
+        query = query.order_by(Event.start_date, Event.id)
+    else:
+        query = query.order_by(Event.start_date.desc(), Event.id.desc())
+    
+    # Skip heavy columns the client didn't ask for
+    columns = {getattr(Event, field) for field in fields if field in Event.__table__.columns}
+    query = query.options(load_only(Event.start_date, *columns))
+    
+    if limit:
+        events = query.limit(limit + 1).all()
+        has_more = len(events) > limit
+        events = events[:limit]
+    else:
+        events = query.all()
+        has_more = False
+    
+    response = jsonify([{field: EVENT_FIELDS[field](event) for field in fields} for event in events])
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(events[-1].start_date.isoformat(), events[-1].id)
+    return response
+
+# Ranked search over event_fts (see upgrade_schema); the page is picked in
+# SQL, then its events are loaded for the usual field serializers
+EVENT_SEARCH_SQL = search_sql('event', 'event_fts', ('id',), ['e.college_id = ?', 'e.is_active = 1'])
+EVENT_SEARCH_PAGE_SQL = search_sql('event', 'event_fts', ('id',), ['e.college_id = ?', 'e.is_active = 1'], after=True)
+
+@bp.route('/api/events/search', methods=['GET'])
+@jwt_required()
+def search_events():
+    current_user = get_jwt_identity()
+    if db.engine.dialect.name != 'sqlite':
+        return jsonify({'error': 'Search needs SQLite FTS5'}), 501
+    
+    fields = parse_fields(request.args.get('fields'), EVENT_FIELDS, DEFAULT_EVENT_FIELDS)
+    match = match_expression(request.args.get('q'))
+    limit = parse_limit(request.args.get('limit'), default=20, maximum=100)
+    cursor = request.args.get('cursor')
+    
+    connection = db.session.connection()
+    if cursor:
+        last_score, last_id = decode_cursor(cursor, 2)
+        try:
+            last_score, last_id = float(last_score), int(last_id)
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+        rows = connection.exec_driver_sql(EVENT_SEARCH_PAGE_SQL, (match, current_user['college_id'], last_score,
+                                                                  last_id, limit + 1)).all()
+    else:
+        rows = connection.exec_driver_sql(EVENT_SEARCH_SQL, (match, current_user['college_id'], limit + 1)).all()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    events = {event.id: event for event in Event.query.filter(Event.id.in_([event_id for event_id, _ in rows]))}
+    
+    response = jsonify([dict({field: EVENT_FIELDS[field](events[event_id]) for field in fields}, score=score)
+                        for event_id, score in rows])
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][1], rows[-1][0])
+    return response
+
+# Schedule conflicts, found through the event_spans interval index (see
+# upgrade_schema); other databases fall back to a plain range query
+CONFLICT_FIELDS = ('id', 'title', 'start_date', 'end_date', 'location')
+VENUE_OVERLAP_SQL = overlap_sql('event', 'event_spans', ('id',), ['e.is_active = 1', 'e.location = ?', 'e.id != ?'])
+STUDENT_OVERLAP_SQL = overlap_sql('event', 'event_spans', ('id',),
+                                  ['e.is_active = 1', registered_condition('registration'), 'e.id != ?'])
+VENUE_CONFLICTS_SQL = venue_conflicts_sql('event', 'event_spans', ('id',), ['a.is_active = 1', 'b.is_active = 1'])
+STUDENT_CONFLICTS_SQL = student_conflicts_sql('event', 'event_spans', 'registration', ('id',),
+                                              ['a.is_active = 1', 'b.is_active = 1'])
+
+def conflict_summary(event):
+    return {field: EVENT_FIELDS[field](event) for field in CONFLICT_FIELDS}
+
+def overlapping_events(event, location=None, student_id=None):
+    """Other active events of ``event``'s college overlapping it, either at
+    ``location`` or among ``student_id``'s registrations."""
+    if db.engine.dialect.name == 'sqlite':
+        if student_id is not None:
+            sql, params = STUDENT_OVERLAP_SQL, (student_id, event.id)
+        else:
+            sql, params = VENUE_OVERLAP_SQL, (location, event.id)
+        span = overlap_params(event.college_id, event.start_date, event.end_date)
+        ids = [event_id for event_id, in db.session.connection().exec_driver_sql(sql, span + params)]
+        query = Event.query.filter(Event.id.in_(ids))
+    else:
+        query = Event.query.filter(
+            Event.college_id == event.college_id,
+            Event.is_active == True,
+            Event.id != event.id,
+            Event.start_date < event.end_date,
+            Event.end_date > event.start_date
+        )
+        if student_id is not None:
+            query = query.join(Registration).filter(Registration.student_id == student_id,
+                                                    Registration.status.in_(ACTIVE_STATUSES))
+        else:
+            query = query.filter(Event.location == location)
+    return [conflict_summary(other) for other in query.order_by(Event.start_date, Event.id)]
+
+@bp.route('/api/schedule/conflicts', methods=['GET'])
+@jwt_required()
+def get_schedule_conflicts():
+    current_user = get_jwt_identity()
+    if db.engine.dialect.name != 'sqlite':
+        return jsonify({'error': 'Conflict listings need the SQLite interval index'}), 501
+    
+    # Admins pick a venue or a student; students only see their own schedule
+    location = request.args.get('location')
+    student_id = request.args.get('student_id', type=int)
+    if current_user['role'] != 'admin':
+        if location or (student_id and student_id != current_user['id']):
+            return jsonify({'error': 'Admin access required'}), 403
+        student_id = current_user['id']
+    
+    connection = db.session.connection()
+    if location:
+        rows = connection.exec_driver_sql(VENUE_CONFLICTS_SQL, (current_user['college_id'], location)).all()
+    elif student_id:
+        rows = connection.exec_driver_sql(STUDENT_CONFLICTS_SQL, (student_id, student_id)).all()
+    else:
+        return jsonify({'error': 'location or student_id is required'}), 400
+    
+    events = {event.id: event for event in Event.query.filter(Event.id.in_({event_id for row in rows for event_id in row}))}
+    return jsonify([{'event': conflict_summary(events[first]), 'overlaps': conflict_summary(events[second])}
+                    for first, second in rows])
+
+@bp.route('/api/events', methods=['POST'])
+@jwt_required()
+def create_event():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    data = request.get_json()
+    
+    event = Event(
+        title=data['title'],
+        description=data['description'],
+        event_type=data['event_type'],
+        start_date=datetime.fromisoformat(data['start_date']),
+        end_date=datetime.fromisoformat(data['end_date']),
+        location=data['location'],
+        max_participants=data['max_participants'],
+        registration_deadline=datetime.fromisoformat(data['registration_deadline']) if data.get('registration_deadline') else None,
+        college_id=current_user['college_id'],
+        created_by=current_user['id']
+    )
+    
+    db.session.add(event)
+    db.session.commit()
+    invalidate_caches(event.college_id)
+    
+    # Created either way; the admin is warned about double-booked venues
+    venue_conflicts = overlapping_events(event, location=event.location) if event.location else []
+    
+    # The QR code is filled in by store_event_qr once a worker has drawn it
+    qr_data = f"event_{event.title}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    key = ArtifactStore.key_for('event_qr', renderers.QR_TEMPLATE_VERSION, data=qr_data)
+    job = extensions.job_queue.enqueue('event_qr', {
+        'event_id': event.id,
+        'data': qr_data,
+        'artifact_key': key,
+        'artifact_path': extensions.artifact_store.relative_path(key, 'png')
+    }, dedupe_key=f'event_qr:{event.id}', owner=f"admin:{current_user['id']}", college_id=event.college_id)
+    
+    return jsonify({'message': 'Event created successfully', 'event_id': event.id, 'qr_job_id': job['id'],
+                    'venue_conflicts': venue_conflicts}), 201
+
+@bp.route('/api/events/<int:event_id>', methods=['PUT'])
+@jwt_required()
+def update_event(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    event = Event.query.filter_by(id=event_id, college_id=current_user['college_id']).first()
+    if not event:
+        return jsonify({'error': 'Event not found'}), 404
+    
+    data = request.get_json()
+    event.title = data.get('title', event.title)
+    event.description = data.get('description', event.description)
+    event.event_type = data.get('event_type', event.event_type)
+    event.start_date = datetime.fromisoformat(data['start_date']) if data.get('start_date') else event.start_date
+    event.end_date = datetime.fromisoformat(data['end_date']) if data.get('end_date') else event.end_date
+    event.location = data.get('location', event.location)
+    event.max_participants = data.get('max_participants', event.max_participants)
+    event.registration_deadline = datetime.fromisoformat(data['registration_deadline']) if data.get('registration_deadline') else event.registration_deadline
+    db.session.flush()
+    
+    # More seats may have opened up for the waitlist
+    promoted = promote_waitlisted(event.id)
+    
+    db.session.commit()
+    invalidate_caches(event.college_id)
+    if promoted:
+        live_updates.publish(event.college_id, 'registrations', event_id=event.id, seats_taken=promoted,
+                             waitlisted=-promoted)
+    
+    venue_conflicts = overlapping_events(event, location=event.location) if event.location else []
+    return jsonify({'message': 'Event updated successfully', 'venue_conflicts': venue_conflicts})
+
+@bp.route('/api/events/<int:event_id>', methods=['DELETE'])
+@jwt_required()
+def delete_event(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    event = Event.query.filter_by(id=event_id, college_id=current_user['college_id']).first()
+    if not event:
+        return jsonify({'error': 'Event not found'}), 404
+    
+    event.is_active = False
+    db.session.commit()
+    invalidate_caches(event.college_id)
+    return jsonify({'message': 'Event deleted successfully'})
+
+# Seat Management
+# Event.seats_taken is only ever changed with a conditional UPDATE in the same
+# transaction as the registration row, so SQLite's single writer lock makes
+# claiming a seat atomic and the count can never run past max_participants.
+def claim_seat(event_id):
+    result = db.session.execute(
+        update(Event)
+        .where(Event.id == event_id, Event.seats_taken < Event.max_participants)
+        .values(seats_taken=Event.seats_taken + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def release_seat(event_id):
+    db.session.execute(
+        update(Event)
+        .where(Event.id == event_id, Event.seats_taken > 0)
+        .values(seats_taken=Event.seats_taken - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def promote_waitlisted(event_id):
+    """Fill free seats from the waitlist, first come first served."""
+    promoted = 0
+    while claim_seat(event_id):
+        next_in_line = select(Registration.id).where(
+            Registration.event_id == event_id,
+            Registration.status == 'waitlisted'
+        ).order_by(Registration.registered_at, Registration.id).limit(1).scalar_subquery()
+        
+        result = db.session.execute(
+            update(Registration)
+            .where(Registration.id == next_in_line)
+            .values(status='registered')
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            # Nobody waiting, hand the seat back
+            release_seat(event_id)
+            break
+        promoted += 1
+    return promoted
+
+# Registration Routes
+
+@bp.route('/api/events/<int:event_id>/register', methods=['POST'])
+@jwt_required()
+def register_for_event(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'student':
+        return jsonify({'error': 'Student access required'}), 403
+    
+    event = Event.query.filter_by(id=event_id, is_active=True).first()
+    if not event:
+        return jsonify({'error': 'Event not found'}), 404
+    
+    # Check if already registered
+    existing_registration = Registration.query.filter_by(
+        student_id=current_user['id'], 
+        event_id=event_id
+    ).first()
+    
+    if existing_registration and existing_registration.status != 'cancelled':
+        return jsonify({'error': 'Already registered for this event'}), 400
+    
+    # Check registration deadline
+    if event.registration_deadline and datetime.utcnow() > event.registration_deadline:
+        return jsonify({'error': 'Registration deadline has passed'}), 400
+    
+    # Refuse a second event at the same time
+    conflicts = overlapping_events(event, student_id=current_user['id'])
+    if conflicts:
+        return jsonify({'error': 'Overlaps with an event you are registered for', 'conflicts': conflicts}), 409
+    
+    # Claim a seat and write the registration in one transaction; a full
+    # event puts the student on the waitlist instead
+    status = 'registered' if claim_seat(event_id) else 'waitlisted'
+    
+    if existing_registration:
+        # Re-registering after a cancellation goes to the back of the queue
+        result = db.session.execute(
+            update(Registration)
+            .where(Registration.id == existing_registration.id, Registration.status == 'cancelled')
+            .values(status=status, registered_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
+            return jsonify({'error': 'Already registered for this event'}), 400
+    else:
+        db.session.add(Registration(
+            student_id=current_user['id'],
+            event_id=event_id,
+            status=status
+        ))
+    
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Already registered for this event'}), 400
+    invalidate_caches(event.college_id)
+    live_updates.publish(event.college_id, 'registrations', event_id=event_id,
+                         **({'seats_taken': 1} if status == 'registered' else {'waitlisted': 1}))
+    
+    if status == 'waitlisted':
+        return jsonify({'message': 'Added to waitlist', 'status': 'waitlisted'})
+    return jsonify({'message': 'Registered successfully', 'status': 'registered',
+                    'checkin_token': issue_checkin_token(current_user['id'], event)})
+
+@bp.route('/api/events/<int:event_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_registration(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'student':
+        return jsonify({'error': 'Student access required'}), 403
+    
+    registration = Registration.query.filter(
+        Registration.student_id == current_user['id'],
+        Registration.event_id == event_id,
+        Registration.status.in_(['registered', 'waitlisted'])
+    ).first()
+    
+    if not registration:
+        return jsonify({'error': 'Not registered for this event'}), 400
+    
+    previous_status = registration.status
+    result = db.session.execute(
+        update(Registration)
+        .where(Registration.id == registration.id, Registration.status == previous_status)
+        .values(status='cancelled')
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
+        return jsonify({'error': 'Registration changed, please retry'}), 409
+    
+    promoted = 0
+    if previous_status == 'registered':
+        release_seat(event_id)
+        promoted = promote_waitlisted(event_id)
+    
+    db.session.commit()
+    invalidate_caches(current_user['college_id'])
+    if previous_status == 'registered':
+        live_updates.publish(current_user['college_id'], 'registrations', event_id=event_id,
+                             seats_taken=promoted - 1, waitlisted=-promoted)
+    else:
+        live_updates.publish(current_user['college_id'], 'registrations', event_id=event_id, waitlisted=-1)
+    return jsonify({'message': 'Registration cancelled', 'promoted': promoted})
+
+# Feedback Routes
+@bp.route('/api/events/<int:event_id>/feedback', methods=['POST'])
+@jwt_required()
+def submit_feedback(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'student':
+        return jsonify({'error': 'Student access required'}), 403
+    
+    data = request.get_json()
+    
+    # Check if already submitted feedback
+    existing_feedback = Feedback.query.filter_by(
+        student_id=current_user['id'], 
+        event_id=event_id
+    ).first()
+    
+    if existing_feedback:
+        return jsonify({'error': 'Feedback already submitted'}), 400
+    
+    feedback = Feedback(
+        student_id=current_user['id'],
+        event_id=event_id,
+        rating=data['rating'],
+        comment=data.get('comment', '')
+    )
+    db.session.add(feedback)
+    db.session.commit()
+    invalidate_caches(current_user['college_id'])
+    live_updates.publish(current_user['college_id'], 'feedback', event_id=event_id, feedback=1, rating=feedback.rating)
+    
+    return jsonify({'message': 'Feedback submitted successfully'})
+
+REGISTRATIONS_EXPORT_HEADER = ('Registration ID', 'Student Name', 'Student ID', 'Email',
+                               'Registered At', 'Status', 'Attendance')
+
+def event_registrations_query(event_id):
+    return select(
+        Registration.id, Student.name, Student.student_id, Student.email, Registration.registered_at,
+        Registration.status, case((Attendance.id.is_not(None), 'present'), else_='absent')
+    ).join(Student, Student.id == Registration.student_id).outerjoin(Attendance, (
+        Attendance.student_id == Registration.student_id) & (Attendance.event_id == Registration.event_id)
+    ).where(Registration.event_id == event_id).order_by(desc(Registration.registered_at))
+
+@bp.route('/api/events/<int:event_id>/registrations/export', methods=['GET'])
+@jwt_required()
+def export_event_registrations(event_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    fmt = parse_format(request.args.get('format'))
+    event = Event.query.filter_by(id=event_id, college_id=current_user['college_id']).first()
+    if not event:
+        return jsonify({'error': 'Event not found'}), 404
+    
+    # Rows are fetched in batches as the response is sent
+    rows = db.session.execute(event_registrations_query(event.id).execution_options(yield_per=500))
+    return export_response(fmt, f'event-{event.id}-registrations', REGISTRATIONS_EXPORT_HEADER,
+                           rows, 'Registrations')
+
+@bp.route('/api/events/<int:event_id>/qr', methods=['GET'])
+@jwt_required()
+def get_event_qr(event_id):
+    current_user = get_jwt_identity()
+    event = Event.query.filter_by(id=event_id, college_id=current_user['college_id']).first()
+    if not event:
+        return jsonify({'error': 'Event not found'}), 404
+    if not event.qr_code or not extensions.artifact_store.exists(event.qr_code, 'png'):
+        return jsonify({'error': 'QR code is not ready yet'}), 404
+    
+    return extensions.artifact_store.send(event.qr_code, 'png', 'image/png')
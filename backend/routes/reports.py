@@ -0,0 +1,263 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, desc, select
+from extensions import compressor, dashboard_cache, db, live_updates, password_hasher, response_cache
+from models import Attendance, Event, Feedback, Registration, Student, StudentStats
+from response_cache import cached_response
+from live_updates import event_stream
+from exports import export_response, parse_format
+from routes import college_scope, user_scope
+from routes.events import parse_date_arg
+
+bp = Blueprint('reports', __name__)
+
+# Dashboard and Reports Routes
+def dashboard_stats_query(college_id):
+    # All four figures as scalar subqueries of a single SELECT
+    return select(
+        select(func.count(Event.id)).where(
+            Event.college_id == college_id, Event.is_active == True
+        ).scalar_subquery(),
+        select(func.count(Student.id)).where(
+            Student.college_id == college_id, Student.is_active == True
+        ).scalar_subquery(),
+        select(func.count(Registration.id)).join(Event, Event.id == Registration.event_id).where(
+            Event.college_id == college_id
+        ).scalar_subquery(),
+        select(func.count(Attendance.id)).join(Event, Event.id == Attendance.event_id).where(
+            Event.college_id == college_id
+        ).scalar_subquery(),
+    )
+
+def compute_admin_dashboard(college_id):
+    total_events, total_students, total_registrations, total_attendance = \
+        db.session.execute(dashboard_stats_query(college_id)).one()
+    
+    # Recent events
+    recent_events = Event.query.filter_by(college_id=college_id, is_active=True).order_by(desc(Event.created_at)).limit(5).all()
+    
+    # Top events by confirmed registrations, read off the seats_taken counter
+    top_events = db.session.query(Event.title, Event.seats_taken).filter(
+        Event.college_id == college_id,
+        Event.is_active == True,
+        Event.seats_taken > 0
+    ).order_by(desc(Event.seats_taken)).limit(5).all()
+    
+    return {
+        'stats': {
+            'total_events': total_events,
+            'total_students': total_students,
+            'total_registrations': total_registrations,
+            'total_attendance': total_attendance
+        },
+        'recent_events': [{
+            'id': event.id,
+            'title': event.title,
+            'event_type': event.event_type,
+            'start_date': event.start_date,
+            'created_at': event.created_at
+        } for event in recent_events],
+        'top_events': [{'title': title, 'registrations': count} for title, count in top_events]
+    }
+
+# Column titles of the event report export, in event_report_query order
+EVENT_REPORT_HEADER = ('ID', 'Title', 'Description', 'Type', 'Start', 'End', 'Location',
+                       'Max Participants', 'Registration Deadline', 'Registrations',
+                       'Attendance', 'Average Rating')
+
+def event_report_query(college_id, event_type=None, start_date=None, end_date=None):
+    # Each figure is a subquery over one table, so joining them can't
+    # multiply the rows
+    query = select(
+        Event.id, Event.title, Event.description, Event.event_type, Event.start_date, Event.end_date,
+        Event.location, Event.max_participants, Event.registration_deadline,
+        select(func.count(Registration.id)).where(Registration.event_id == Event.id).scalar_subquery(),
+        select(func.count(Attendance.id)).where(Attendance.event_id == Event.id).scalar_subquery(),
+        select(func.coalesce(func.round(func.avg(Feedback.rating), 2), 0))
+        .where(Feedback.event_id == Event.id).scalar_subquery(),
+    ).where(Event.college_id == college_id, Event.is_active == True)
+    if event_type and event_type != 'all':
+        query = query.where(Event.event_type == event_type)
+    if start_date:
+        query = query.where(Event.start_date >= start_date)
+    if end_date:
+        query = query.where(Event.end_date <= end_date)
+    return query.order_by(desc(Event.id))
+
+@bp.route('/api/reports/events/export', methods=['GET'])
+@jwt_required()
+def export_event_report():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    fmt = parse_format(request.args.get('format'))
+    query = event_report_query(current_user['college_id'], request.args.get('event_type'),
+                               parse_date_arg('start_date'), parse_date_arg('end_date'))
+    rows = db.session.execute(query.execution_options(yield_per=500))
+    return export_response(fmt, 'event-report', EVENT_REPORT_HEADER, rows, 'Events')
+
+@bp.route('/api/admin/dashboard', methods=['GET'])
+@jwt_required()
+@cached_response(response_cache, college_scope)
+def admin_dashboard():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    college_id = current_user['college_id']
+    return jsonify(dashboard_cache.get_or_compute(college_id, lambda: compute_admin_dashboard(college_id)))
+
+@bp.route('/api/system/password-hashing', methods=['GET'])
+@jwt_required()
+def password_hashing_stats():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    return jsonify(password_hasher.stats())
+
+# Live updates; EventSource can't set headers, so the token may come as ?jwt=
+@bp.route('/api/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_updates():
+    return event_stream(live_updates, get_jwt_identity()['college_id'])
+
+@bp.route('/api/system/live-updates', methods=['GET'])
+@jwt_required()
+def live_updates_stats():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    return jsonify(live_updates.stats())
+
+@bp.route('/api/system/response-cache', methods=['GET'])
+@jwt_required()
+def response_cache_stats():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    return jsonify(response_cache.stats())
+
+@bp.route('/api/system/compression', methods=['GET'])
+@jwt_required()
+def compression_stats():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    return jsonify(compressor.stats())
+
+@bp.route('/api/student/dashboard', methods=['GET'])
+@jwt_required()
+@cached_response(response_cache, user_scope)
+def student_dashboard():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'student':
+        return jsonify({'error': 'Student access required'}), 403
+    
+    student_id = current_user['id']
+    
+    # Get student's registrations
+    registrations = db.session.query(Registration, Event).join(Event).filter(
+        Registration.student_id == student_id
+    ).all()
+    
+    # Get student's attendance
+    attendance = db.session.query(Attendance, Event).join(Event).filter(
+        Attendance.student_id == student_id
+    ).all()
+    
+    # Get student's feedback
+    feedback = db.session.query(Feedback, Event).join(Event).filter(
+        Feedback.student_id == student_id
+    ).all()
+    
+    return jsonify({
+        'registrations': [{
+            'event_id': event.id,
+            'title': event.title,
+            'event_type': event.event_type,
+            'start_date': event.start_date,
+            'status': reg.status,
+            'registered_at': reg.registered_at
+        } for reg, event in registrations],
+        'attendance': [{
+            'event_id': event.id,
+            'title': event.title,
+            'checked_in_at': att.checked_in_at
+        } for att, event in attendance],
+        'feedback': [{
+            'event_id': event.id,
+            'title': event.title,
+            'rating': fb.rating,
+            'comment': fb.comment,
+            'submitted_at': fb.submitted_at
+        } for fb, event in feedback]
+    })
+
+# Leaderboard Route
+def leaderboard_query(college_id):
+    # Top students by attendance, walking ix_student_stats_college_attendance
+    return db.session.query(
+        Student.name,
+        Student.student_id,
+        StudentStats.attendance_count
+    ).join(Student, Student.id == StudentStats.student_id).filter(
+        StudentStats.college_id == college_id,
+        StudentStats.attendance_count > 0,
+        Student.is_active == True
+    ).order_by(desc(StudentStats.attendance_count))
+
+@bp.route('/api/leaderboard', methods=['GET'])
+@jwt_required()
+@cached_response(response_cache, college_scope)
+def get_leaderboard():
+    current_user = get_jwt_identity()
+    college_id = current_user['college_id']
+    limit = min(request.args.get('limit', 10, type=int), 100)
+    
+    top_students = leaderboard_query(college_id).limit(limit).all()
+    
+    return jsonify([{
+        'name': name,
+        'student_id': student_id,
+        'attendance_count': count
+    } for name, student_id, count in top_students])
+
+@bp.route('/api/leaderboard/export', methods=['GET'])
+@jwt_required()
+def export_leaderboard():
+    current_user = get_jwt_identity()
+    fmt = parse_format(request.args.get('format'))
+    
+    # yield_per: rows are fetched in batches as the response is sent
+    rows = leaderboard_query(current_user['college_id']).yield_per(500)
+    return export_response(fmt, 'leaderboard', ('Name', 'Student ID', 'Attendance'), rows, 'Leaderboard')
+
+@bp.route('/api/leaderboard/me', methods=['GET'])
+@jwt_required()
+def get_my_rank():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'student':
+        return jsonify({'error': 'Student access required'}), 403
+    
+    stats = db.session.get(StudentStats, current_user['id'])
+    attendance_count = stats.attendance_count if stats else 0
+    
+    # Rank = 1 + active students with strictly more check-ins (ties share a rank)
+    ahead = db.session.query(func.count(StudentStats.student_id)).join(
+        Student, Student.id == StudentStats.student_id
+    ).filter(
+        StudentStats.college_id == current_user['college_id'],
+        StudentStats.attendance_count > attendance_count,
+        Student.is_active == True
+    ).scalar()
+    
+    return jsonify({
+        'student_id': current_user['id'],
+        'attendance_count': attendance_count,
+        'rank': ahead + 1
+    })
@@ -0,0 +1,170 @@
+"""Overlapping-event checks on a SQLite R*Tree interval index.
+
+Every event has a box in an R*Tree: its start and end time in seconds since
+the epoch on one axis and its college id on the other. Finding the events
+that overlap a time range in one college is then a tree lookup instead of a
+scan of the college's events, or of everything a student has registered
+for. Triggers keep the tree in step with inserts, deletes and changes to an
+event's dates or college.
+
+The R*Tree stores 32-bit floats, rounded outwards, so it can return a few
+near misses; the exact times are kept alongside each box and checked after
+the lookup. Intervals are half-open, so an event that starts as another one
+ends does not conflict with it. Naive times are taken as UTC, like SQLite's
+own date functions do.
+
+This module only depends on the standard library so that both the SQLAlchemy
+backend and the sqlite3 simple backends can use it.
+"""
+from datetime import datetime, timezone
+
+# Registrations that hold (or may yet be promoted into) a seat
+ACTIVE_STATUSES = ('registered', 'waitlisted')
+
+EVENT_COLUMNS = ('id', 'title', 'start_date', 'end_date', 'location')
+
+
+class ScheduleError(ValueError):
+    """An unusable date range; reported to the client as a 400."""
+
+
+def epoch(value):
+    """Seconds since the epoch for a datetime or ISO 8601 string."""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise ScheduleError(f'{value!r} is not an ISO date')
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _epoch_sql(column):
+    return f"coalesce(CAST(strftime('%s', {column}) AS INTEGER), 0)"
+
+
+def _span_values(row):
+    start, end = _epoch_sql(f'{row}.start_date'), _epoch_sql(f'{row}.end_date')
+    college = f'coalesce({row}.college_id, 0)'
+    # An end before the start would be rejected by the R*Tree
+    return f'{row}.id, {start}, max({start}, {end}), {college}, {college}, {start}, {end}'
+
+
+def span_schema(events_table, spans_table):
+    """Statements that create ``spans_table`` over ``events_table``, its sync
+    triggers, and index the rows already there."""
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {spans_table} USING rtree(
+            id, start_min, end_max, college_min, college_max, +starts_at, +ends_at
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {spans_table}_insert AFTER INSERT ON {events_table}
+        BEGIN
+            INSERT OR REPLACE INTO {spans_table} VALUES ({_span_values('new')});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {spans_table}_delete AFTER DELETE ON {events_table}
+        BEGIN
+            DELETE FROM {spans_table} WHERE id = old.id;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {spans_table}_update
+        AFTER UPDATE OF start_date, end_date, college_id ON {events_table}
+        BEGIN
+            INSERT OR REPLACE INTO {spans_table} VALUES ({_span_values('new')});
+        END""",
+        f"INSERT OR REPLACE INTO {spans_table} SELECT {_span_values('e')} FROM {events_table} e",
+    ]
+
+
+def overlap_params(college_id, start, end):
+    """Leading parameters of ``overlap_sql`` for events in ``college_id``
+    overlapping [start, end)."""
+    start, end = epoch(start), epoch(end)
+    return (college_id, college_id, end, start, end, start)
+
+
+def stored_overlap_params(college_id, start, end):
+    """``overlap_params`` for an event already in the database, or None if its
+    dates can't be read. The triggers index such an event at 0, so it can't
+    be checked for overlaps; only dates from requests are rejected."""
+    try:
+        return overlap_params(college_id, start, end)
+    except (ScheduleError, TypeError, AttributeError):
+        return None
+
+
+def overlap_sql(events_table, spans_table, columns=EVENT_COLUMNS, conditions=()):
+    """Events overlapping a time range in one college, earliest first.
+
+    Parameters, in order: ``overlap_params(...)``, then one per condition.
+    The event is ``e`` in conditions.
+    """
+    where = [
+        f'{spans_table}.college_min <= ?', f'{spans_table}.college_max >= ?',
+        f'{spans_table}.start_min < ?', f'{spans_table}.end_max > ?',
+        f'{spans_table}.starts_at < ?', f'{spans_table}.ends_at > ?',
+    ] + list(conditions)
+    return f"""
+        SELECT {', '.join(f'e.{column}' for column in columns)}
+        FROM {spans_table}
+        JOIN {events_table} e ON e.id = {spans_table}.id
+        WHERE {' AND '.join(where)}
+        ORDER BY {spans_table}.starts_at, e.id
+    """
+
+
+def registered_condition(registrations_table, event='e'):
+    """Condition that the student given as its parameter holds an active
+    registration for ``event``."""
+    statuses = ', '.join(f"'{status}'" for status in ACTIVE_STATUSES)
+    return f"""EXISTS (
+            SELECT 1 FROM {registrations_table} r
+            WHERE r.student_id = ? AND r.event_id = {event}.id AND r.status IN ({statuses})
+        )"""
+
+
+def _pairs_sql(events_table, spans_table, columns, source, conditions):
+    selected = [f'a.{column}' for column in columns] + [f'b.{column}' for column in columns]
+    return f"""
+        SELECT {', '.join(selected)}
+        FROM {source}
+        JOIN {spans_table} sa ON sa.id = a.id
+        JOIN {spans_table} sb ON sb.college_min <= sa.college_max AND sb.college_max >= sa.college_min
+            AND sb.start_min < sa.end_max AND sb.end_max > sa.start_min
+        JOIN {events_table} b ON b.id = sb.id
+        WHERE {' AND '.join(['sb.id > sa.id', 'sb.starts_at < sa.ends_at', 'sb.ends_at > sa.starts_at']
+                            + list(conditions))}
+        ORDER BY sa.starts_at, a.id, b.id
+    """
+
+
+def student_conflicts_sql(events_table, spans_table, registrations_table, columns=EVENT_COLUMNS, conditions=()):
+    """Pairs of overlapping events a student is registered for, as ``columns``
+    of the first event followed by ``columns`` of the second.
+
+    Parameters: the student's id twice, then one per condition. The events
+    are ``a`` and ``b`` in conditions.
+    """
+    statuses = ', '.join(f"'{status}'" for status in ACTIVE_STATUSES)
+    return _pairs_sql(
+        events_table, spans_table, columns,
+        f'{registrations_table} ra JOIN {events_table} a ON a.id = ra.event_id',
+        ['ra.student_id = ?', f'ra.status IN ({statuses})', registered_condition(registrations_table, 'b')]
+        + list(conditions))
+
+
+def venue_conflicts_sql(events_table, spans_table, columns=EVENT_COLUMNS, conditions=()):
+    """Pairs of overlapping events at one location of a college, laid out like
+    ``student_conflicts_sql``.
+
+    Parameters: the college id and location, then one per condition.
+    """
+    return _pairs_sql(
+        events_table, spans_table, columns, f'{events_table} a',
+        ['a.college_id = ?', 'a.location = ?', 'b.location = a.location'] + list(conditions))
+
+
+def pairs(rows, columns=EVENT_COLUMNS):
+    """Rows of a conflicts query as ``{'event': ..., 'overlaps': ...}`` dicts."""
+    width = len(columns)
+    return [{'event': dict(zip(columns, row[:width])), 'overlaps': dict(zip(columns, row[width:]))}
+            for row in rows]
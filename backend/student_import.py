@@ -0,0 +1,309 @@
+"""Bulk student import from a CSV or XLSX upload.
+
+The file is read and validated a row at a time. Valid rows are grouped into
+batches; each batch is checked against existing accounts with one query per
+column, its passwords are hashed on a pool of worker processes, and it is
+written with a single ``executemany`` and commit. Hashing of one batch
+overlaps validating the next and inserting the previous one.
+
+Hashing is most of the cost, so imported passwords use PBKDF2 with
+``IMPORT_HASH_ITERATIONS`` rounds instead of Werkzeug's 600k. They are
+initial passwords, and ``PasswordHasher.verify`` flags the cheaper hash so
+the login routes replace it with a full-strength one at first sign-in.
+Accounts that never sign in would keep it, so run
+``flask auth upgrade-import-hashes`` (``flask --app simple_backend_no_qr
+upgrade-import-hashes`` for the simple backend) some time after an import;
+it finds the remaining weak hashes and wraps them to full strength without
+needing the passwords (see ``password_hasher.upgrade_weak_hashes``).
+
+A worker that dies breaks the hashing pool; the import then stops with
+``ImportUnavailable`` (a 503) and the next one starts a fresh pool.
+
+Databases are reached through a small store object (see
+``SQLiteStudentStore``) so the SQLAlchemy app and the simple backends share
+the pipeline.
+"""
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+IMPORT_WORKERS = int(os.getenv('STUDENT_IMPORT_WORKERS', str(min(4, os.cpu_count() or 1))))
+IMPORT_BATCH_SIZE = int(os.getenv('STUDENT_IMPORT_BATCH', '500'))
+IMPORT_HASH_ITERATIONS = int(os.getenv('STUDENT_IMPORT_HASH_ITERATIONS', '5000'))
+# Per-row errors past this many are counted but not listed
+IMPORT_MAX_ERRORS = int(os.getenv('STUDENT_IMPORT_MAX_ERRORS', '1000'))
+IMPORT_RETRY_AFTER = int(os.getenv('STUDENT_IMPORT_RETRY_AFTER', '5'))
+
+REQUIRED_COLUMNS = ('student_id', 'email', 'name', 'password')
+# Column limits of the Student model
+MAX_LENGTHS = {'student_id': 20, 'email': 100, 'name': 100, 'phone': 15}
+
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+$')
+# What _csv_rows decodes invalid UTF-8 to
+UNDECODABLE = '\ufffd'
+
+
+class ImportFileError(ValueError):
+    """The upload is missing, of an unknown type or has no usable header row;
+    reported to the client as a 400."""
+
+
+class ImportUnavailable(Exception):
+    """Raised when the hashing pool broke mid-import; reported to the client
+    as a 503. Batches written before that stay imported, so ``created``
+    says how many, and a retry reports those rows as existing."""
+
+    def __init__(self, created, retry_after=IMPORT_RETRY_AFTER):
+        super().__init__('Import workers are restarting, please retry shortly')
+        self.created = created
+        self.retry_after = retry_after
+
+
+def _column_name(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _csv_rows(stream):
+    # Bytes that aren't UTF-8 (a sheet saved as ANSI, say) become U+FFFD so
+    # validate() rejects just the rows holding them, with their row number,
+    # rather than the decode failing part-way through the import
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline=''))
+    yield from reader
+
+
+def _xlsx_rows(stream):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_records(stream, filename):
+    """Yield ``(row_number, record)`` for each data row of an upload.
+
+    Row numbers are as a spreadsheet shows them, so the header is row 1.
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        rows = _csv_rows(stream)
+    elif extension == '.xlsx':
+        rows = _xlsx_rows(stream)
+    else:
+        raise ImportFileError('Upload a .csv or .xlsx file')
+
+    header = [_column_name(value) for value in next(rows, ())]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}")
+
+    for row_number, row in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in row):
+            continue
+        yield row_number, dict(zip(header, row))
+
+
+def validate(record):
+    """Return ``(student, error)``; exactly one of them is None."""
+    student = {}
+    for column in REQUIRED_COLUMNS + ('phone',):
+        value = record.get(column)
+        value = '' if value is None else str(value).strip()
+        if column in REQUIRED_COLUMNS and not value:
+            return None, f'{column} is required'
+        if UNDECODABLE in value:
+            return None, f'{column} is not UTF-8 text; save the file as CSV UTF-8'
+        if len(value) > MAX_LENGTHS.get(column, len(value)):
+            return None, f'{column} is longer than {MAX_LENGTHS[column]} characters'
+        student[column] = value
+    student['email'] = student['email'].lower()
+    if not _EMAIL.match(student['email']):
+        return None, 'email is not a valid address'
+    return student, None
+
+
+def hash_import_password(password):
+    """Worker side: hash one imported password."""
+    return generate_password_hash(password, method=f'pbkdf2:sha256:{IMPORT_HASH_ITERATIONS}')
+
+
+class SQLiteStudentStore:
+    """Reads and writes the simple backends' ``students`` table over a
+    sqlite3 connection."""
+
+    def __init__(self, conn, college_id):
+        self.conn = conn
+        self.college_id = college_id
+
+    def _existing(self, column, values):
+        placeholders = ', '.join('?' * len(values))
+        rows = self.conn.execute(f'SELECT {column} FROM students WHERE {column} IN ({placeholders})', values)
+        return {value for value, in rows}
+
+    def taken(self, students):
+        """The student ids and emails in ``students`` already in use."""
+        return (self._existing('student_id', [s['student_id'] for s in students]),
+                self._existing('email', [s['email'] for s in students]))
+
+    def insert(self, students):
+        """Insert a batch in one transaction; return the student ids written."""
+        cursor = self.conn.executemany("""
+            INSERT INTO students (student_id, email, password_hash, name, phone, college_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+        """, [(s['student_id'], s['email'], s['password_hash'], s['name'], s['phone'], self.college_id)
+              for s in students])
+        self.conn.commit()
+        if cursor.rowcount == len(students):
+            return {s['student_id'] for s in students}
+        # Someone else took an id or email since taken(); ours are the rows
+        # holding the hash we just wrote (hashes are salted, so unique)
+        ids = [s['student_id'] for s in students]
+        stored = dict(self.conn.execute(
+            f"SELECT student_id, password_hash FROM students WHERE student_id IN ({', '.join('?' * len(ids))})", ids))
+        return {s['student_id'] for s in students if stored.get(s['student_id']) == s['password_hash']}
+
+    def pbkdf2_hashes(self, after_id, limit):
+        """``(id, password_hash)`` of PBKDF2-hashed students past ``after_id``,
+        in every college."""
+        return self.conn.execute(
+            "SELECT id, password_hash FROM students WHERE id > ? AND password_hash LIKE 'pbkdf2:%' "
+            "ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+
+    def replace_hashes(self, rows):
+        """Apply ``(new_hash, id, old_hash)`` updates, skipping accounts whose
+        hash changed meanwhile (a sign-in already rehashed it)."""
+        self.conn.executemany("UPDATE students SET password_hash = ? WHERE id = ? AND password_hash = ?", rows)
+        self.conn.commit()
+
+
+class StudentImporter:
+    def __init__(self, workers=IMPORT_WORKERS, batch_size=IMPORT_BATCH_SIZE, max_errors=IMPORT_MAX_ERRORS):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _discard(self, executor):
+        # A dead worker breaks the pool for good; the next import starts afresh
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def run(self, records, store):
+        """Import ``(row_number, record)`` pairs through ``store``.
+
+        Returns the report: row counts, throughput and one entry per
+        rejected row (up to ``max_errors``).
+        """
+        started = time.perf_counter()
+        report = {'rows': 0, 'created': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+
+        def reject(row_number, student_id, error):
+            report['failed'] += 1
+            if len(report['errors']) < self.max_errors:
+                report['errors'].append({'row': row_number, 'student_id': student_id, 'error': error})
+            else:
+                report['errors_truncated'] = True
+
+        pool = self._pool()
+        try:
+            pending = None
+            for batch in self._batches(records, report, reject):
+                taken_ids, taken_emails = store.taken([student for _, student in batch])
+                accepted = []
+                for row_number, student in batch:
+                    if student['student_id'] in taken_ids:
+                        reject(row_number, student['student_id'], 'Student ID already exists')
+                    elif student['email'] in taken_emails:
+                        reject(row_number, student['student_id'], 'Email already registered')
+                    else:
+                        accepted.append((row_number, student))
+
+                # Start hashing this batch, then write the previous one meanwhile
+                chunksize = max(1, len(accepted) // (self.workers * 4))
+                hashes = pool.map(hash_import_password, [student['password'] for _, student in accepted],
+                                  chunksize=chunksize)
+                if pending:
+                    self._insert(store, *pending, report, reject)
+                pending = (accepted, hashes)
+            if pending:
+                self._insert(store, *pending, report, reject)
+        except BrokenProcessPool as error:
+            self._discard(pool)
+            logger.error('Student import: hashing pool broke after %d created: %s', report['created'], error)
+            raise ImportUnavailable(report['created']) from error
+
+        report['errors'].sort(key=lambda error: error['row'])
+        elapsed = time.perf_counter() - started
+        report['elapsed_seconds'] = round(elapsed, 3)
+        report['per_second'] = round(report['rows'] / elapsed, 1) if elapsed else 0.0
+        logger.info('Student import: %d rows, %d created, %d failed in %.2fs',
+                    report['rows'], report['created'], report['failed'], elapsed)
+        return report
+
+    def _batches(self, records, report, reject):
+        # Ids and emails seen earlier in the file; later duplicates are rejected
+        seen_ids, seen_emails = set(), set()
+        batch = []
+        for row_number, record in records:
+            report['rows'] += 1
+            student, error = validate(record)
+            if error:
+                reject(row_number, str(record.get('student_id') or ''), error)
+                continue
+            if student['student_id'] in seen_ids:
+                reject(row_number, student['student_id'], 'Student ID appears earlier in the file')
+                continue
+            if student['email'] in seen_emails:
+                reject(row_number, student['student_id'], 'Email appears earlier in the file')
+                continue
+            seen_ids.add(student['student_id'])
+            seen_emails.add(student['email'])
+
+            batch.append((row_number, student))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _insert(self, store, batch, hashes, report, reject):
+        students = []
+        for (_, student), password_hash in zip(batch, hashes):
+            students.append(dict(student, password=None, password_hash=password_hash))
+        if not students:
+            return
+        inserted = store.insert(students)
+        report['created'] += len(inserted)
+        for row_number, student in batch:
+            if student['student_id'] not in inserted:
+                reject(row_number, student['student_id'], 'Email or Student ID already exists')
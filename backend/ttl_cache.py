@@ -0,0 +1,56 @@
+"""A small thread-safe cache whose entries expire after a fixed TTL.
+
+Used for per-college figures that are expensive to compute but fine to serve
+a few seconds stale. Write paths call ``invalidate`` for the college they
+touched, so the TTL only bounds staleness from writers in other processes.
+"""
+import threading
+import time
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, ttl, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires, value = entry
+                if expires > self._clock():
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if self.ttl > 0:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
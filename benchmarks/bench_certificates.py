@@ -0,0 +1,101 @@
+"""Benchmark certificate rendering and the bulk ZIP export.
+
+Times drawing each certificate from scratch with a ReportLab canvas (the old
+way) against filling in the shared CertificateTemplate, then streams a ZIP of
+``--count`` certificates through CertificateExporter with 1 and ``--workers``
+processes into a throwaway artifact store. Reports certificates per second.
+
+    python benchmarks/bench_certificates.py --count 2000 --workers 4
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+import renderers  # noqa: E402
+from artifacts import ArtifactStore  # noqa: E402
+from certificate_export import CertificateExporter  # noqa: E402
+
+
+def canvas_certificate(student_name, event_title, event_date):
+    # The per-request drawing code the template replaced
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+    for font, size, top, text in renderers.CertificateTemplate.STATIC_LINES + renderers.CertificateTemplate.FIELD_LINES:
+        p.setFont(font, size)
+        p.drawCentredString(width/2, height - top, text.format(
+            student_name=student_name, event_title=event_title, event_date=event_date, generated_on=event_date))
+    p.save()
+    return buffer.getvalue()
+
+
+def items_for(store, count):
+    items = []
+    for i in range(count):
+        inputs = {'student_name': f'Student {i}', 'event_title': 'Annual Fest', 'event_date': '2025-03-14T10:00:00'}
+        key = ArtifactStore.key_for('certificate', renderers.CERTIFICATE_TEMPLATE_VERSION, **inputs)
+        items.append(dict(inputs, event_id=1, student_id=i, artifact_key=key,
+                          artifact_path=store.relative_path(key, 'pdf'), filename=f'certificate-1-{i}.pdf'))
+    return items
+
+
+def export(workers, count, chunk_size):
+    root = tempfile.mkdtemp(prefix='campus-certs-')
+    try:
+        store = ArtifactStore(root)
+        exporter = CertificateExporter(root, workers=workers, chunk_size=chunk_size)
+        # Start the pool outside the timing
+        exporter._pool().submit(renderers.certificate_template).result()
+
+        items = items_for(store, count)
+        export_id = exporter.start(items)
+        size = sum(len(part) for part in exporter.stream_zip(export_id, items))
+        progress = exporter.progress(export_id)
+        exporter.shutdown()
+        return progress, size
+    finally:
+        shutil.rmtree(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--chunk-size', type=int, default=50)
+    args = parser.parse_args()
+
+    sample = min(args.count, 500)
+    start = time.perf_counter()
+    for i in range(sample):
+        canvas_certificate(f'Student {i}', 'Annual Fest', 'March 14, 2025')
+    canvas_rate = sample / (time.perf_counter() - start)
+
+    renderers.certificate_template()
+    start = time.perf_counter()
+    for i in range(sample):
+        renderers.certificate_pdf(f'Student {i}', 'Annual Fest', '2025-03-14T10:00:00')
+    template_rate = sample / (time.perf_counter() - start)
+
+    print(f'single process, {sample} certificates:')
+    print(f'  canvas per certificate: {canvas_rate:8.0f} /s')
+    print(f'  shared template:        {template_rate:8.0f} /s  ({template_rate / canvas_rate:.1f}x)')
+
+    print(f'\nZIP export of {args.count} certificates, chunks of {args.chunk_size}:')
+    for workers in sorted({1, args.workers}):
+        progress, size = export(workers, args.count, args.chunk_size)
+        print(f"  {workers} worker(s): {progress['per_second']:8.0f} /s  "
+              f"({progress['elapsed_seconds']:.2f}s, {size / 1024 / 1024:.1f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
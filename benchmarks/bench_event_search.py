@@ -0,0 +1,140 @@
+"""Benchmark event search on the FTS5 index against a LIKE '%term%' scan.
+
+Seeds a throwaway database with ``--events`` events (default 100k) across
+``--colleges`` colleges, each with a generated title, description, location
+and type, and builds the events_fts index the way migration 6 does. Then
+times a page of results for a few queries both ways: the ranked FTS5 search
+that /api/events/search runs, and the LIKE scan over the four columns a
+naive search would have used. Also reports what the sync triggers add to
+inserting events.
+
+LIMIT lets the unranked LIKE scan stop at the first page of hits in date
+order, while bm25 scores every match before picking the best. So LIKE still
+wins for a term found in a large share of all events, and loses by a wide
+margin whenever the term is selective or absent.
+
+    python benchmarks/bench_event_search.py --events 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from event_search import fts_schema, match_expression, search_sql  # noqa: E402
+
+SCHEMA = """
+    CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT,
+        event_type TEXT NOT NULL, start_date TEXT NOT NULL, end_date TEXT NOT NULL, location TEXT,
+        max_participants INTEGER DEFAULT 100, registration_deadline TEXT, college_id INTEGER,
+        created_by INTEGER, qr_code TEXT);
+    CREATE INDEX idx_events_college ON events (college_id, start_date);
+"""
+COLUMNS = ('id', 'title', 'description', 'event_type', 'start_date', 'end_date', 'location', 'max_participants')
+LIKE_SQL = f"""
+    SELECT {', '.join(COLUMNS)} FROM events
+    WHERE college_id = ? AND (title LIKE ? OR description LIKE ? OR location LIKE ? OR event_type LIKE ?)
+    ORDER BY start_date DESC LIMIT ?
+"""
+
+EVENT_TYPES = ('hackathon', 'workshop', 'fest', 'seminar')
+TOPICS = ('robotics', 'machine learning', 'cloud computing', 'photography', 'debate', 'startup pitching',
+          'quantum physics', 'creative writing', 'cybersecurity', 'data visualisation', 'music production',
+          'sustainable design', 'public speaking', 'game development', 'bioinformatics', 'film making')
+PLACES = ('Main Hall', 'Auditorium', 'Lab 1', 'Lab 2', 'Library', 'Open Ground', 'Seminar Room', 'Cafeteria')
+
+
+def vocabulary(rng, size=5000):
+    # Made-up words, so descriptions vary like real text does
+    return [''.join(rng.choice('abcdefghiklmnoprstuvy') for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+
+def queries(words):
+    return [
+        ('hackathon', 'a quarter of all events'),
+        ('robotics', 'one topic in 16'),
+        ('machine learning', 'two words'),
+        (words[0], 'a word in ~0.6% of descriptions'),
+        (words[1][:3], 'a three-letter prefix'),
+        (f'{words[2]} {words[3]}', 'two rare words'),
+        ('zzzz', 'no match'),
+    ]
+
+
+def seed(conn, events, colleges, rng, words):
+    rows = []
+    for i in range(events):
+        event_type = rng.choice(EVENT_TYPES)
+        topic = rng.choice(TOPICS)
+        day = f'2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+        rows.append((f'{topic.title()} {event_type.title()} {rng.choice(words).title()}',
+                     ' '.join(rng.choice(words) for _ in range(30)) + f' about {topic}',
+                     event_type, f'{day}T10:00:00', f'{day}T17:00:00', rng.choice(PLACES), 100,
+                     i % colleges + 1, 1))
+    conn.executemany("INSERT INTO events (title, description, event_type, start_date, end_date, location, "
+                     "max_participants, college_id, created_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    return rows
+
+
+def timed(conn, sql, params, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--colleges', type=int, default=4)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory(prefix='campus-search-') as root:
+        conn = sqlite3.connect(os.path.join(root, 'events.db'))
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.executescript(SCHEMA)
+
+        start = time.perf_counter()
+        words = vocabulary(rng)
+        rows = seed(conn, args.events, args.colleges, rng, words)
+        plain_insert = time.perf_counter() - start
+        start = time.perf_counter()
+        for statement in fts_schema('events', 'events_fts'):
+            conn.execute(statement)
+        conn.commit()
+        print(f'{args.events} events: inserted in {plain_insert:.2f}s, FTS index built in '
+              f'{time.perf_counter() - start:.2f}s')
+
+        # The same rows again, now through the sync triggers
+        start = time.perf_counter()
+        conn.executemany("INSERT INTO events (title, description, event_type, start_date, end_date, location, "
+                         "max_participants, college_id, created_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         rows[:10000])
+        conn.commit()
+        print(f'10000 inserts with triggers: {time.perf_counter() - start:.2f}s '
+              f'(without: ~{plain_insert * 10000 / args.events:.2f}s)')
+        conn.execute('ANALYZE')
+
+        fts_sql = search_sql('events', 'events_fts', COLUMNS, ['e.college_id = ?'])
+        print(f"\n{'query':<22}{'LIKE ms':>9}{'FTS5 ms':>9}{'speedup':>9}  matches")
+        for query, note in queries(words):
+            # LIKE can only look for the first word anywhere in the text
+            pattern = f'%{query.split()[0]}%'
+            like_ms, _ = timed(conn, LIKE_SQL, (1, pattern, pattern, pattern, pattern, args.limit), args.repeat)
+            fts_ms, _ = timed(conn, fts_sql, (match_expression(query), 1, args.limit), args.repeat)
+            print(f'{query:<22}{like_ms:>9.2f}{fts_ms:>9.2f}{like_ms / fts_ms:>8.1f}x  {note}')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark JSON encoding and response compression for the events list and reports.
+
+Seeds a throwaway campus the way load_test.py does, with ``--events`` events
+and descriptions of ``--description-words`` words, and builds the payloads
+of three responses through the simple backend: a 50-event page of
+/api/events, every event at once, and /api/reports/events. Then reports:
+
+    encoding     time to serialize each payload with Flask's stock encoder
+                 (json, sorted keys), the json fallback of json_provider.py
+                 and orjson when it is installed, for both the simple
+                 backend's string dates and the SQLAlchemy backend's datetime
+                 objects (no more isoformat() calls in the routes)
+    on the wire  bytes and compression time for identity, gzip and, when the
+                 brotli package is installed, brotli, at the levels
+                 compression.py uses and at their maximums
+
+    python benchmarks/bench_json.py --events 2000
+"""
+import argparse
+import gzip
+import importlib.util
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from load_test import Campus, SimpleTarget  # noqa: E402
+
+DATE_FIELDS = ('start_date', 'end_date', 'registration_deadline', 'created_at')
+
+
+def as_datetimes(payload):
+    # The same payload as the SQLAlchemy backend builds it, with datetime values
+    if isinstance(payload, list):
+        return [as_datetimes(item) for item in payload]
+    if isinstance(payload, dict):
+        return {key: datetime.fromisoformat(value) if key in DATE_FIELDS and isinstance(value, str)
+                else as_datetimes(value) for key, value in payload.items()}
+    return payload
+
+
+def flask_stock(payload):
+    # What jsonify did before json_provider: sorted keys, ASCII, isoformat() done by the route
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), default=lambda value: value.isoformat())
+
+
+def timed(function, payload, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function(payload)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def encoders():
+    from backend import json_provider
+
+    found = [('flask stock json', flask_stock)]
+    # json_provider picks its encoder at import; its dumps() is the chosen one
+    fallback = lambda payload: json.dumps(payload, default=json_provider._default, ensure_ascii=False,
+                                          separators=(',', ':')).encode()
+    found.append(('json_provider json', fallback))
+    if json_provider.orjson is not None:
+        found.append(('json_provider orjson', json_provider.dumps))
+    return found
+
+
+def compressors():
+    from backend import compression
+
+    found = [('gzip -1', lambda data: gzip.compress(data, 1, mtime=0)),
+             (f'gzip -{compression.GZIP_LEVEL} (default)', lambda data: compression.compress(data, 'gzip')),
+             ('gzip -9', lambda data: gzip.compress(data, 9, mtime=0))]
+    if importlib.util.find_spec('brotli'):
+        import brotli
+        found += [(f'brotli q{compression.BROTLI_QUALITY} (default)', lambda data: compression.compress(data, 'br')),
+                  ('brotli q11', lambda data: brotli.compress(data, quality=11))]
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--registrations', type=int, default=20000)
+    parser.add_argument('--description-words', type=int, default=80)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='campus-json-')
+    try:
+        campus = Campus(1, args.students, args.events, args.registrations, 0.7, 0.4, args.seed)
+        # Made-up words, so descriptions don't compress better than real text
+        rng = random.Random(args.seed)
+        words = [''.join(rng.choice('abcdefghiklmnoprstuvy') for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+        for event in campus.events:
+            event['description'] = ' '.join(rng.choice(words) for _ in range(args.description_words))
+        target = SimpleTarget()
+        app = target.load(workdir)
+        target.seed(campus)
+        client = app.test_client()
+        payloads = [
+            ('events, page of 50', client.get('/api/events?limit=50').get_json()),
+            (f'events, all {args.events}', client.get('/api/events').get_json()),
+            ('reports/events', client.get('/api/reports/events').get_json()),
+        ]
+        target.module.db_pool.close_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'payload':<22}{'dates':<10}{'encoder':<22}{'ms':>8}{'bytes':>10}")
+    for name, payload in payloads:
+        for dates, shaped in (('strings', payload), ('datetime', as_datetimes(payload))):
+            for encoder, dumps in encoders():
+                ms, body = timed(dumps, shaped, args.repeat)
+                print(f'{name:<22}{dates:<10}{encoder:<22}{ms:>8.2f}{len(body):>10}')
+
+    print(f"\n{'payload':<22}{'encoding':<22}{'bytes':>10}{'ratio':>8}{'ms':>8}")
+    for name, payload in payloads:
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+        print(f"{name:<22}{'identity':<22}{len(body):>10}{1:>8.2f}{0:>8.2f}")
+        for encoding, compress in compressors():
+            ms, compressed = timed(compress, body, args.repeat)
+            print(f'{name:<22}{encoding:<22}{len(compressed):>10}{len(compressed) / len(body):>8.2f}{ms:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark the simple backend's report queries.
+
+Seeds a throwaway database with ``--per-event`` registrations for each event
+(default 10k), about 70% checked in and 40% leaving feedback, then times
+reports.event_report and reports.top_active_students. The old single-JOIN
+queries are timed on a small scale ladder only: their row count grows as
+R*A*F per event, so at 10k registrations they would not finish.
+
+    python benchmarks/bench_reports.py --events 20 --per-event 10000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import reports  # noqa: E402
+from db_migrations import apply_migrations  # noqa: E402
+
+SCHEMA = """
+    CREATE TABLE students (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, name TEXT NOT NULL, phone TEXT, college_id INTEGER);
+    CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT,
+        event_type TEXT NOT NULL, start_date TEXT NOT NULL, end_date TEXT NOT NULL, location TEXT,
+        max_participants INTEGER DEFAULT 100, registration_deadline TEXT, college_id INTEGER,
+        created_by INTEGER, qr_code TEXT);
+    CREATE TABLE registrations (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, event_id INTEGER,
+        registered_at TEXT DEFAULT CURRENT_TIMESTAMP, status TEXT DEFAULT 'registered', UNIQUE(student_id, event_id));
+    CREATE TABLE attendance (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, event_id INTEGER,
+        checked_in_at TEXT DEFAULT CURRENT_TIMESTAMP, UNIQUE(student_id, event_id));
+    CREATE TABLE feedback (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, event_id INTEGER,
+        rating INTEGER NOT NULL, comment TEXT, submitted_at TEXT DEFAULT CURRENT_TIMESTAMP, UNIQUE(student_id, event_id));
+"""
+
+# The report as it was before, minus the ORDER BY on a column that never existed
+LEGACY_EVENT_REPORT = """
+    SELECT e.id, COUNT(r.id), COUNT(a.id), AVG(f.rating)
+    FROM events e
+    LEFT JOIN registrations r ON e.id = r.event_id
+    LEFT JOIN attendance a ON e.id = a.event_id
+    LEFT JOIN feedback f ON e.id = f.event_id
+    GROUP BY e.id ORDER BY e.id DESC
+"""
+
+
+def seed(path, events, per_event, rng):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany(
+        "INSERT INTO students (student_id, email, password_hash, name, college_id) VALUES (?, ?, 'x', ?, 1)",
+        ((f'S{i:06d}', f's{i}@college.edu', f'Student {i}') for i in range(per_event))
+    )
+    for e in range(events):
+        conn.execute(
+            "INSERT INTO events (title, description, event_type, start_date, end_date, location, college_id, created_by) "
+            "VALUES (?, '', ?, ?, ?, 'Hall', 1, 1)",
+            (f'Event {e}', rng.choice(['workshop', 'hackathon', 'fest']), f'2025-{1 + e % 12:02d}-10', f'2025-{1 + e % 12:02d}-11')
+        )
+        event_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        students = range(1, per_event + 1)
+        conn.executemany("INSERT INTO registrations (student_id, event_id) VALUES (?, ?)",
+                         ((s, event_id) for s in students))
+        conn.executemany("INSERT INTO attendance (student_id, event_id) VALUES (?, ?)",
+                         ((s, event_id) for s in students if rng.random() < 0.7))
+        conn.executemany("INSERT INTO feedback (student_id, event_id, rating) VALUES (?, ?, ?)",
+                         ((s, event_id, rng.randint(1, 5)) for s in students if rng.random() < 0.4))
+    conn.commit()
+    apply_migrations(conn)
+    return conn
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--per-event', type=int, default=10000)
+    parser.add_argument('--ladder', default='25,50,100,200', help='registrations per event for the legacy comparison')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='campus-bench-')
+
+    print('Scaling, 3 events per database:')
+    print(f"{'per event':>10} {'legacy ms':>10} {'report ms':>10}  counts match")
+    for size in [int(n) for n in args.ladder.split(',')]:
+        conn = seed(os.path.join(workdir, f'ladder-{size}.db'), 3, size, random.Random(args.seed))
+        legacy_time, legacy = timed(lambda: conn.execute(LEGACY_EVENT_REPORT).fetchall())
+        new_time, new = timed(lambda: reports.event_report(conn))
+        actual = [(row['registration_count'], row['attendance_count']) for row in new]
+        inflated = [(row[1], row[2]) for row in legacy]
+        print(f'{size:>10} {legacy_time * 1000:>10.1f} {new_time * 1000:>10.2f}  {actual == inflated}'
+              f'  (legacy says {inflated[0]}, actual {actual[0]})')
+        conn.close()
+
+    print(f'\nFull size: {args.events} events x {args.per_event} registrations')
+    start = time.perf_counter()
+    conn = seed(os.path.join(workdir, 'full.db'), args.events, args.per_event, random.Random(args.seed))
+    print(f'seeded in {time.perf_counter() - start:.1f}s')
+
+    report_time, rows = timed(lambda: reports.event_report(conn))
+    assert all(row['registration_count'] == args.per_event for row in rows)
+    truth = dict(conn.execute("SELECT event_id, COUNT(*) FROM attendance GROUP BY event_id").fetchall())
+    assert all(row['attendance_count'] == truth[row['id']] for row in rows)
+    print(f'event_report:          {report_time * 1000:8.1f} ms for {len(rows)} events (counts verified)')
+
+    filtered_time, rows = timed(lambda: reports.event_report(conn, 'workshop'))
+    print(f'event_report workshop: {filtered_time * 1000:8.1f} ms for {len(rows)} events')
+
+    students_time, top = timed(lambda: reports.top_active_students(conn))
+    print(f'top_active_students:   {students_time * 1000:8.1f} ms over {args.per_event} students')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Benchmark the serving modes of the simple backend under many concurrent clients.
+
+Seeds a throwaway campus the way load_test.py does, then starts the API
+three ways on a free local port, as subprocesses of ``serve.py``:
+
+    dev   the Flask dev server that ``python simple_backend_no_qr.py`` runs
+    wsgi  gunicorn with ``--workers`` processes of ``--threads`` threads
+    asgi  uvicorn with the async read routes of asgi.py
+
+and for each of ``--clients`` (default 100, 500 and 1000) opens that many
+concurrent clients, each sending ``--requests`` requests over the read
+routes (events list, leaderboard, both dashboards). Reports requests per
+second, p50/p99 latency and errors; a request that fails to connect, times
+out or gets a 5xx counts as an error. Then opens the same number of
+/api/stream connections, marks a student present at one of today's events,
+and reports how many streams were open and how long the check-in took to
+reach all of them. Under gunicorn each stream holds one of the
+``--workers`` x ``--threads`` threads, and a check-in only reaches the
+streams of the worker that served it.
+
+Clients and servers share the machine, so on a small box the client's own
+CPU use is part of what is measured; compare the modes against each other
+rather than reading the numbers as absolute capacity. Each request uses its
+own connection, as browsers behind different NATs would.
+
+    python benchmarks/bench_serving.py --modes dev,wsgi,asgi --clients 100,500,1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from load_test import Campus, SimpleTarget, percentile  # noqa: E402
+
+READ_ROUTES = (
+    '/api/events?when=upcoming&limit=20',
+    '/api/leaderboard?limit=20',
+    '/api/admin/dashboard',
+    '/api/student/dashboard',
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def request(port, method, path, timeout, body=None):
+    """Status of one request on a new connection, or None if it failed."""
+    payload = json.dumps(body).encode() if body is not None else b''
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        writer.write(f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode() + payload)
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+        return None
+    finally:
+        writer.close()
+
+
+async def read_load(port, clients, requests, timeout, seed):
+    latencies, errors = [], 0
+
+    async def client(n):
+        nonlocal errors
+        rng = random.Random(seed + n)
+        for _ in range(requests):
+            start = time.perf_counter()
+            status = await request(port, 'GET', rng.choice(READ_ROUTES), timeout)
+            if status is None or status >= 500:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'ok': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+    }
+
+
+async def fan_out(port, clients, checkin, timeout):
+    """Open ``clients`` streams, check ``checkin``'s student in to its event and
+    time the delta reaching each of them."""
+    opened, received = asyncio.Event(), []
+    ready = 0
+    writers = []
+
+    async def listen():
+        nonlocal ready
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return
+        writers.append(writer)
+        writer.write(b'GET /api/stream HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n')
+        try:
+            status_line = await asyncio.wait_for(reader.readline(), timeout)
+            if b' 200 ' not in status_line:
+                return
+            # The first message is the stream's retry/id preamble
+            while (await asyncio.wait_for(reader.readline(), timeout)).strip() != b'retry: 3000':
+                pass
+            ready += 1
+            if ready == clients:
+                opened.set()
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout * 2)
+                if not line:
+                    return
+                if line.startswith(b'event: checkins'):
+                    received.append(time.perf_counter())
+                    return
+        except (OSError, asyncio.TimeoutError):
+            return
+
+    listeners = [asyncio.ensure_future(listen()) for _ in range(clients)]
+    try:
+        await asyncio.wait_for(opened.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    open_streams = ready
+    start = time.perf_counter()
+    student_id, event_id = checkin
+    status = await request(port, 'POST', f'/api/events/{event_id}/mark-attendance', timeout,
+                           {'student_id': student_id, 'action': 'present'})
+    await asyncio.wait(listeners, timeout=timeout)
+    for listener in listeners:
+        listener.cancel()
+    for writer in writers:
+        writer.close()
+    return {
+        'streams': open_streams,
+        'checkin_status': status,
+        'delivered': len(received),
+        'all_ms': (max(received) - start) * 1000 if received else None,
+    }
+
+
+def start_server(mode, port, workdir, args):
+    command = [sys.executable, os.path.join(ROOT, 'serve.py'), mode, '--port', str(port),
+               '--workers', str(args.workers), '--threads', str(args.threads)]
+    env = dict(os.environ, DATABASE_PATH=os.path.join(workdir, 'campus_events.db'),
+               LIVE_MAX_LISTENERS=str(max(args.clients) + 10), PYTHONUNBUFFERED='1',
+               # Find the streams closed after each fan-out quickly
+               LIVE_KEEPALIVE='1')
+    log = open(os.path.join(workdir, f'{mode}.log'), 'w')
+    # A session of its own, so the dev server's reloader child is stopped too
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+                               start_new_session=True)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{mode} server exited, see {log.name}')
+        try:
+            if asyncio.run(request(port, 'GET', '/api/events?limit=1', 2)) == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f'{mode} server did not start, see {log.name}')
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='dev,wsgi,asgi')
+    parser.add_argument('--clients', default='100,500,1000')
+    parser.add_argument('--requests', type=int, default=5, help='per client')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds before a request counts as failed')
+    parser.add_argument('--workers', type=int, default=4, help='wsgi processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per wsgi process')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=120)
+    parser.add_argument('--registrations', type=int, default=12000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    args.clients = [int(clients) for clients in args.clients.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='campus-serving-')
+    try:
+        campus = Campus(1, args.students, args.events, args.registrations, 0.7, 0.4, args.seed)
+        target = SimpleTarget()
+        target.load(workdir)
+        target.seed(campus)
+        target.module.db_pool.close_all()
+        print(f'seeded {campus.summary()}; {os.cpu_count()} CPU(s)')
+
+        reads, streams = [], []
+        for mode in args.modes.split(','):
+            port = free_port()
+            process = start_server(mode, port, workdir, args)
+            try:
+                for clients in args.clients:
+                    reads.append((mode, clients, asyncio.run(
+                        read_load(port, clients, args.requests, args.timeout, args.seed))))
+                # After the read loads, so open streams don't hold a thread during them
+                for clients in args.clients:
+                    streams.append((mode, clients, asyncio.run(
+                        fan_out(port, clients, campus.checkin_queue.popleft(), args.timeout))))
+            finally:
+                stop_server(process)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def cell(value, width, spec=''):
+        return format(value, f'>{width}{spec}') if value is not None else format('-', f'>{width}')
+
+    print(f"\n{'mode':<6}{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>10}{'errors':>8}")
+    for mode, clients, run in reads:
+        print(f"{mode:<6}{clients:>8}{run['rps']:>9.0f}{cell(run['p50_ms'], 9, '.1f')}"
+              f"{cell(run['p99_ms'], 10, '.1f')}{run['errors']:>8}")
+    print(f"\n{'mode':<6}{'streams':>8}{'open':>6}{'check-in':>10}{'got delta':>11}{'all got it ms':>15}")
+    for mode, clients, run in streams:
+        print(f"{mode:<6}{clients:>8}{run['streams']:>6}{cell(run['checkin_status'], 10)}"
+              f"{run['delivered']:>11}{cell(run['all_ms'], 15, '.1f')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark the bulk student import against one-at-a-time registration.
+
+Writes a CSV of ``--count`` students (a few of them invalid or duplicated) and
+imports it through StudentImporter into a throwaway SQLite database, the way
+``/api/admin/students/import`` does. For comparison, a small sample goes
+through the register route's steps instead: two existence checks, a
+full-strength password hash and a commit per student.
+
+    python benchmarks/bench_student_import.py --count 50000 --workers 4
+"""
+import argparse
+import csv
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from student_import import SQLiteStudentStore, StudentImporter, read_records  # noqa: E402
+
+SCHEMA = """
+    CREATE TABLE students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        name TEXT NOT NULL,
+        phone TEXT,
+        college_id INTEGER
+    )
+"""
+
+
+def write_csv(path, count):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['student_id', 'email', 'name', 'phone', 'password'])
+        for i in range(count):
+            if i % 1000 == 999:
+                writer.writerow([f'S{i - 2}', f'dup{i}@example.edu', 'Duplicate', '', 'secret'])
+            elif i % 1000 == 998:
+                writer.writerow([f'S{i}', 'not-an-email', 'Invalid', '', 'secret'])
+            else:
+                writer.writerow([f'S{i}', f'student{i}@example.edu', f'Student {i}', '5550100', f'secret{i}'])
+
+
+def one_at_a_time(conn, count):
+    start = time.perf_counter()
+    for i in range(count):
+        student_id, email = f'R{i}', f'register{i}@example.edu'
+        conn.execute('SELECT 1 FROM students WHERE email = ?', (email,)).fetchone()
+        conn.execute('SELECT 1 FROM students WHERE student_id = ?', (student_id,)).fetchone()
+        conn.execute('INSERT INTO students (student_id, email, password_hash, name, phone, college_id) '
+                     'VALUES (?, ?, ?, ?, ?, 1)', (student_id, email, generate_password_hash('secret'), 'R', ''))
+        conn.commit()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='campus-import-')
+    try:
+        conn = sqlite3.connect(os.path.join(root, 'students.db'))
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(SCHEMA)
+
+        sample = min(args.count, 20)
+        register_rate = one_at_a_time(conn, sample)
+        print(f'register route, {sample} students: {register_rate:8.1f} /s '
+              f'(~{args.count / register_rate / 60:.0f} min for {args.count})')
+
+        path = os.path.join(root, 'students.csv')
+        write_csv(path, args.count)
+        importer = StudentImporter(workers=args.workers, batch_size=args.batch_size)
+        # Start the pool outside the timing
+        importer._pool().submit(len, '').result()
+
+        with open(path, 'rb') as f:
+            report = importer.run(read_records(f, path), SQLiteStudentStore(conn, 1))
+        importer.shutdown()
+        print(f"bulk import, {report['rows']} rows, {args.workers} worker(s): {report['per_second']:8.1f} /s "
+              f"({report['elapsed_seconds']:.1f}s, {report['created']} created, {report['failed']} rejected)")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark group commit against committing every insert on its own.
+
+``--threads`` request threads each insert ``--count`` check-ins into a
+throwaway database configured like the simple backend's pool. Every tenth
+insert repeats an earlier one, so unique-constraint failures have to come
+back to the right caller. The threads first commit one at a time on pooled
+connections, then go through a WriteBatcher. Reports writes per second and
+the batcher's batch size and commit latency.
+
+    python benchmarks/bench_write_batcher.py --threads 16 --count 500
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db_pool import ConnectionPool  # noqa: E402
+from write_batcher import WriteBatcher  # noqa: E402
+
+SCHEMA = """
+    CREATE TABLE attendance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        event_id INTEGER,
+        checked_in_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(student_id, event_id)
+    )
+"""
+INSERT_SQL = "INSERT INTO attendance (student_id, event_id) VALUES (?, ?)"
+
+
+def run(threads, count, execute):
+    """Insert from every thread; returns (seconds, inserted, duplicates)."""
+    inserted, duplicates = [0] * threads, [0] * threads
+
+    def worker(n):
+        for i in range(count):
+            # Every tenth check-in is a repeat of this thread's previous one
+            student_id = n * count + (i - 1 if i % 10 == 9 else i)
+            try:
+                execute(INSERT_SQL, (student_id, 1))
+                inserted[n] += 1
+            except sqlite3.IntegrityError:
+                duplicates[n] += 1
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, sum(inserted), sum(duplicates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--delay-ms', type=float, default=0)
+    parser.add_argument('--synchronous', default='NORMAL', choices=('NORMAL', 'FULL'))
+    args = parser.parse_args()
+    total = args.threads * args.count
+
+    root = tempfile.mkdtemp(prefix='campus-writes-')
+    try:
+        for mode in ('commit each', 'group commit'):
+            database = os.path.join(root, f"{mode.replace(' ', '-')}.db")
+            pool = ConnectionPool(database, max_size=args.threads)
+            conn = pool.open_connection()
+            conn.execute(SCHEMA)
+            conn.close()
+
+            def connect():
+                conn = pool.open_connection()
+                conn.execute(f'PRAGMA synchronous={args.synchronous}')
+                return conn
+
+            if mode == 'commit each':
+                local = threading.local()
+
+                def execute(sql, params):
+                    if not hasattr(local, 'conn'):
+                        local.conn = connect()
+                    try:
+                        local.conn.execute(sql, params)
+                        local.conn.commit()
+                    except sqlite3.Error:
+                        local.conn.rollback()
+                        raise
+                batcher = None
+            else:
+                batcher = WriteBatcher(connect, max_batch=args.batch_size, max_delay_ms=args.delay_ms)
+                execute = batcher.execute
+
+            seconds, inserted, duplicates = run(args.threads, args.count, execute)
+            print(f'{mode:>12}: {total / seconds:8.0f} writes/s  ({seconds:.2f}s, '
+                  f'{inserted} inserted, {duplicates} duplicates rejected)')
+            if batcher:
+                stats = batcher.stats()
+                batcher.stop()
+                print(f"{'':>14}{stats['batches']} commits, avg batch {stats['avg_batch']}, "
+                      f"largest {stats['largest_batch']}, commit avg {stats['commit_latency']['avg_ms']} ms, "
+                      f"queue wait avg {stats['queue_wait']['avg_ms']} ms")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Check how long backend/app.py takes to import against a startup budget.
+
+Runs ``python -X importtime -c "import app"`` in backend/ ``--runs`` times,
+against a throwaway database, and takes the median of the cumulative time
+of ``app``; importing it builds the app through ``create_app``, so that is
+the time before the first request can be served. Fails (exit status 1)
+when the median is over ``--budget-ms``, or when a module that should only
+load on demand was imported on the way:
+
+    qrcode, reportlab, PIL   drawn by the job workers in renderers.py
+    flask_migrate, alembic   only needed by the ``flask db`` commands
+
+Also lists the heaviest imports of the slowest run, to show where a
+regression comes from. Timings depend on the machine; set the budget with
+``IMPORT_BUDGET_MS`` where the default doesn't fit.
+
+    python benchmarks/check_import_time.py --runs 5 --budget-ms 800
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+
+LAZY_MODULES = ('qrcode', 'reportlab', 'PIL', 'flask_migrate', 'alembic')
+
+
+def import_times(workdir):
+    """``{module: (self_us, cumulative_us, depth)}`` of one import of app."""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'campus_events.db')}",
+               JOBS_DATABASE=os.path.join(workdir, 'jobs.db'), ARTIFACT_DIR=os.path.join(workdir, 'artifacts'))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nesting shows as two more spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', '800')))
+    parser.add_argument('--top', type=int, default=10, help='heaviest imports to list')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='campus-import-')
+    try:
+        runs = [import_times(workdir) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    totals = [run['app'][1] / 1000 for run in runs]
+    median = statistics.median(totals)
+    slowest = runs[totals.index(max(totals))]
+    print(f"import app: median {median:.0f} ms, min {min(totals):.0f} ms, max {max(totals):.0f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    # Direct imports of app, and of the site packages it pulls in
+    app_depth = slowest['app'][2]
+    heaviest = sorted(((cumulative, name) for name, (_, cumulative, depth) in slowest.items()
+                       if depth == app_depth + 1), reverse=True)[:args.top]
+    print(f"\n{'module':<32}{'cumulative ms':>14}")
+    for cumulative, name in heaviest:
+        print(f'{name:<32}{cumulative / 1000:>14.1f}')
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f'import app took {median:.0f} ms, over the {args.budget_ms:.0f} ms budget')
+    loaded = sorted({name.split('.')[0] for run in runs for name in run} & set(LAZY_MODULES))
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if failures:
+        sys.exit(1)
+    print('\nOK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,657 @@
+"""Load-test the API routes of either backend against a synthetic campus.
+
+Seeds a throwaway database with ``--colleges`` colleges, ``--students``
+students and ``--events`` events (past, running today and upcoming), plus
+registrations, attendance and feedback, then drives the routes from
+``--threads`` threads, first through the Flask test client and then over
+HTTP against a threaded WSGI server on a free local port. Nothing leaves
+the machine.
+
+Scenarios are weighted mixes of requests:
+
+    registration-opens  browsing upcoming events and registering for them
+    check-in-rush       door scanners, batched check-ins and the leaderboard
+    report-day          admin reports, exports and dashboards
+    routes              every route below, equally often
+
+Reports requests per second and p50/p95/p99 latency per endpoint and saves
+them as JSON; ``--compare`` prints the change against an earlier file.
+
+    python benchmarks/load_test.py --target simple --threads 8 --requests 2000
+    python benchmarks/load_test.py --target backend --compare load-test-backend-ae87bbb.json
+
+Deleting events, bulk imports and the certificate ZIP are left out: the first
+would empty the campus mid-run and the others have their own benchmarks.
+Every scenario and driver runs against the same database, so writes repeated
+by a later run (registering twice, a second feedback) come back as 4xx; run
+one ``--scenario`` and ``--driver`` at a time for like-for-like numbers.
+Only 5xx responses and failed requests count as errors.
+"""
+import argparse
+import collections
+import http.client
+import importlib
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED_PASSWORD = 'campus-load-test'
+EVENT_TYPES = ('hackathon', 'workshop', 'fest', 'seminar')
+
+Call = collections.namedtuple('Call', 'method path json headers', defaults=(None, None))
+
+SCENARIOS = {
+    'registration-opens': {
+        'GET /api/events': 30,
+        'POST /api/events/<id>/register': 30,
+        'POST /api/events/<id>/cancel': 3,
+        'GET /api/events/<id>/checkin-token': 5,
+        'GET /api/student/dashboard': 15,
+        'GET /api/events/<id>/registrations': 5,
+        'POST /api/auth/student/login': 1,
+        'POST /api/auth/student/register': 1,
+    },
+    'check-in-rush': {
+        'POST /api/events/<id>/checkin/scan': 45,
+        'POST /api/events/<id>/checkins': 10,
+        'POST /api/events/<id>/checkin': 10,
+        'GET /api/events/<id>/checkin-token': 10,
+        'POST /api/events/<id>/mark-attendance': 5,
+        'GET /api/leaderboard/me': 10,
+        'GET /api/leaderboard': 5,
+        'GET /api/admin/dashboard': 5,
+    },
+    'report-day': {
+        'GET /api/reports/events': 15,
+        'GET /api/reports/events/export': 5,
+        'GET /api/reports/top-active-students': 10,
+        'GET /api/admin/dashboard': 15,
+        'GET /api/events/<id>/registrations': 15,
+        'GET /api/events/<id>/registrations/export': 5,
+        'GET /api/leaderboard': 10,
+        'GET /api/leaderboard/export': 5,
+        'POST /api/events/<id>/feedback': 10,
+        'GET /api/events?when=past': 10,
+    },
+}
+
+
+def percentile(ordered, fraction):
+    # Nearest rank
+    return ordered[max(int(round(fraction * len(ordered))) - 1, 0)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Campus:
+    """The synthetic data set, generated up front so both backends get the same one."""
+
+    def __init__(self, colleges, students, events, registrations, attendance, feedback, seed):
+        rng = random.Random(seed)
+        now = datetime.utcnow().replace(microsecond=0)
+        self.colleges = list(range(1, colleges + 1))
+        self.students = [{
+            'id': i, 'student_id': f'LT{i:06d}', 'email': f'student{i}@campus.test',
+            'name': f'Student {i}', 'phone': '5550100', 'college_id': self.colleges[i % colleges]
+        } for i in range(1, students + 1)]
+
+        # A third of the events are over, a sixth are running today, the rest are upcoming
+        self.events = []
+        for i in range(1, events + 1):
+            kind = 'past' if i % 6 < 2 else 'today' if i % 6 == 2 else 'upcoming'
+            start = (now - timedelta(days=rng.randint(1, 180)) if kind == 'past' else
+                     now - timedelta(hours=1) if kind == 'today' else
+                     now + timedelta(days=rng.randint(1, 90)))
+            self.events.append({
+                'id': i, 'kind': kind, 'title': f'{EVENT_TYPES[i % 4].title()} {i}',
+                'description': 'Synthetic load-test event', 'event_type': EVENT_TYPES[i % 4],
+                'start_date': start, 'end_date': start + timedelta(hours=4), 'location': f'Hall {i % 12}',
+                'college_id': self.colleges[i % colleges]
+            })
+
+        # Upcoming events start half full, so registering fills them up
+        per_event = max(min(registrations // max(events, 1), students), 1)
+        self.registrations, self.attendance, self.feedback = [], [], []
+        for event in self.events:
+            attendees = rng.sample(range(1, students + 1), per_event)
+            event['max_participants'] = per_event * 2 if event['kind'] == 'upcoming' else per_event + 10
+            for student_id in attendees:
+                registered_at = event['start_date'] - timedelta(days=rng.randint(1, 14))
+                self.registrations.append((student_id, event['id'], registered_at))
+                if event['kind'] == 'past' and rng.random() < attendance:
+                    self.attendance.append((student_id, event['id'], event['start_date'] + timedelta(minutes=rng.randint(0, 30))))
+                    if rng.random() < feedback:
+                        self.feedback.append((student_id, event['id'], rng.randint(1, 5), 'Synthetic feedback',
+                                              event['end_date']))
+
+        self.by_kind = collections.defaultdict(list)
+        for event in self.events:
+            self.by_kind[event['kind']].append(event['id'])
+        self.registered = collections.defaultdict(list)
+        self.registrants = collections.defaultdict(list)
+        for student_id, event_id, _ in self.registrations:
+            self.registered[student_id].append(event_id)
+            self.registrants[event_id].append(student_id)
+        # Registrations for today's events nobody has checked in yet, in scan order
+        today = set(self.by_kind['today'])
+        self.today_registrations = [(s, e) for s, e, _ in self.registrations if e in today]
+        self.checkin_queue = collections.deque(rng.sample(self.today_registrations, len(self.today_registrations)))
+        self.new_students = itertools.count(students + 1)
+
+    def summary(self):
+        return {'colleges': len(self.colleges), 'students': len(self.students), 'events': len(self.events),
+                'registrations': len(self.registrations), 'attendance': len(self.attendance),
+                'feedback': len(self.feedback)}
+
+    def next_checkin(self, rng):
+        # Once everyone is in, scans are of students already checked in
+        try:
+            return self.checkin_queue.popleft()
+        except IndexError:
+            return rng.choice(self.today_registrations)
+
+    def checkin_batch(self, rng, size=20):
+        # A scanner's queue: students registered for one of today's events
+        event_id = rng.choice(self.by_kind['today'])
+        students = self.registrants[event_id]
+        return event_id, rng.sample(students, min(size, len(students)))
+
+    def new_student(self):
+        i = next(self.new_students)
+        return {'student_id': f'LT{i:06d}', 'email': f'student{i}@campus.test', 'password': SEED_PASSWORD,
+                'name': f'Student {i}', 'phone': '5550100', 'college_id': self.colleges[0]}
+
+
+class SimpleTarget:
+    """simple_backend_no_qr.py: no auth, the demo student is always id 1."""
+
+    name = 'simple'
+
+    def load(self, workdir):
+        os.environ['DATABASE_PATH'] = os.path.join(workdir, 'campus_events.db')
+        sys.path.insert(0, ROOT)
+        self.module = importlib.import_module('simple_backend_no_qr')
+        self.module.init_db()
+        return self.module.app
+
+    def seed(self, campus):
+        password_hash = generate_password_hash(SEED_PASSWORD)
+        conn = self.module.db_pool.acquire()
+        conn.executemany("INSERT OR IGNORE INTO colleges (id, name, code) VALUES (?, ?, ?)",
+                         [(c, f'College {c}', f'C{c}') for c in campus.colleges])
+        conn.executemany("INSERT INTO students (id, student_id, email, password_hash, name, phone, college_id) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         [(s['id'], s['student_id'], s['email'], password_hash, s['name'], s['phone'], s['college_id'])
+                          for s in campus.students])
+        conn.executemany("INSERT INTO events (id, title, description, event_type, start_date, end_date, location, "
+                         "max_participants, college_id, created_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)",
+                         [(e['id'], e['title'], e['description'], e['event_type'], e['start_date'].isoformat(),
+                           e['end_date'].isoformat(), e['location'], e['max_participants'], e['college_id'])
+                          for e in campus.events])
+        conn.executemany("INSERT INTO registrations (student_id, event_id, registered_at) VALUES (?, ?, ?)",
+                         [(s, e, at.strftime('%Y-%m-%d %H:%M:%S')) for s, e, at in campus.registrations])
+        conn.executemany("INSERT INTO attendance (student_id, event_id, checked_in_at) VALUES (?, ?, ?)",
+                         [(s, e, at.strftime('%Y-%m-%d %H:%M:%S')) for s, e, at in campus.attendance])
+        conn.executemany("INSERT INTO feedback (student_id, event_id, rating, comment, submitted_at) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         [(s, e, r, c, at.strftime('%Y-%m-%d %H:%M:%S')) for s, e, r, c, at in campus.feedback])
+        conn.commit()
+        conn.execute("ANALYZE")
+        self.module.db_pool.release(conn)
+
+    def token(self, student_id, event_id):
+        expires = self.module.token_expiry(self.campus_events[event_id]['end_date'])
+        return self.module.checkin_tokens.issue(student_id, event_id, expires)
+
+    def routes(self, campus):
+        self.campus_events = {event['id']: event for event in campus.events}
+        any_event = lambda rng: rng.choice(campus.events)['id']
+
+        def scan(rng):
+            student_id, event_id = campus.next_checkin(rng)
+            return Call('POST', f'/api/events/{event_id}/checkin/scan',
+                        {'token': self.token(student_id, event_id), 'device_id': 'door-1'})
+
+        def batch(rng):
+            event_id, students = campus.checkin_batch(rng)
+            return Call('POST', f'/api/events/{event_id}/checkins', {'checkins': [
+                {'token': self.token(s, event_id), 'device_id': 'door-2'} for s in students]})
+
+        return {
+            'POST /api/auth/admin/login': lambda rng: Call('POST', '/api/auth/admin/login',
+                                                          {'username': 'admin', 'password': 'admin123'}),
+            'POST /api/auth/student/login': lambda rng: Call('POST', '/api/auth/student/login', {
+                'email': rng.choice(campus.students)['email'], 'password': SEED_PASSWORD}),
+            'POST /api/auth/student/register': lambda rng: Call('POST', '/api/auth/student/register',
+                                                                campus.new_student()),
+            'GET /api/events': lambda rng: Call('GET', '/api/events?when=upcoming&limit=20'),
+            'GET /api/events?when=past': lambda rng: Call(
+                'GET', f'/api/events?when=past&limit=50&event_type={rng.choice(EVENT_TYPES)}'),
+            'POST /api/events/<id>/register': lambda rng: Call(
+                'POST', f"/api/events/{rng.choice(campus.by_kind['upcoming'])}/register"),
+            'GET /api/events/<id>/checkin-token': lambda rng: Call(
+                'GET', f"/api/events/{rng.choice(campus.by_kind['upcoming'] + campus.by_kind['today'])}/checkin-token"),
+            'POST /api/events/<id>/checkin/scan': scan,
+            'POST /api/events/<id>/checkins': batch,
+            'POST /api/events/<id>/checkin': lambda rng: Call(
+                'POST', f"/api/events/{rng.choice(campus.by_kind['today'])}/checkin"),
+            'POST /api/events/<id>/mark-attendance': lambda rng: Call(
+                'POST', f"/api/events/{rng.choice(campus.by_kind['today'])}/mark-attendance",
+                {'student_id': rng.choice(campus.students)['id'], 'action': rng.choice(('present', 'absent'))}),
+            'POST /api/events/<id>/feedback': lambda rng: Call(
+                'POST', f"/api/events/{rng.choice(campus.by_kind['past'])}/feedback",
+                {'rating': rng.randint(1, 5), 'comment': 'Great event'}),
+            'GET /api/admin/dashboard': lambda rng: Call('GET', '/api/admin/dashboard'),
+            'GET /api/student/dashboard': lambda rng: Call('GET', '/api/student/dashboard'),
+            'GET /api/reports/top-active-students': lambda rng: Call('GET', '/api/reports/top-active-students'),
+            'GET /api/reports/events': lambda rng: Call(
+                'GET', f'/api/reports/events?event_type={rng.choice(EVENT_TYPES + ("all",))}'),
+            'GET /api/reports/events/export': lambda rng: Call('GET', '/api/reports/events/export?format=csv'),
+            'GET /api/events/<id>/registrations': lambda rng: Call('GET', f'/api/events/{any_event(rng)}/registrations'),
+            'GET /api/events/<id>/registrations/export': lambda rng: Call(
+                'GET', f'/api/events/{any_event(rng)}/registrations/export?format=csv'),
+            'GET /api/leaderboard': lambda rng: Call('GET', '/api/leaderboard?limit=20'),
+            'GET /api/leaderboard/export': lambda rng: Call('GET', '/api/leaderboard/export?format=csv'),
+            'GET /api/leaderboard/me': lambda rng: Call(
+                'GET', f"/api/leaderboard/me?student_id={rng.choice(campus.students)['id']}"),
+            'GET /api/system/password-hashing': lambda rng: Call('GET', '/api/system/password-hashing'),
+        }
+
+
+class BackendTarget:
+    """backend/app.py: JWT auth, every college has its own admin."""
+
+    name = 'backend'
+
+    def load(self, workdir):
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'campus_events.db')}"
+        os.environ['JOBS_DATABASE'] = os.path.join(workdir, 'jobs.db')
+        os.environ['ARTIFACT_DIR'] = os.path.join(workdir, 'artifacts')
+        sys.path.insert(0, os.path.join(ROOT, 'backend'))
+        self.module = importlib.import_module('app')
+        self.models = importlib.import_module('models')
+        self.extensions = importlib.import_module('extensions')
+        with self.module.app.app_context():
+            self.module.create_tables()
+        return self.module.app
+
+    def seed(self, campus):
+        from sqlalchemy import insert, text
+
+        models = self.models
+        db = self.extensions.db
+        password_hash = generate_password_hash(SEED_PASSWORD)
+        with self.module.app.app_context():
+            existing = {college.id for college in models.College.query}
+            db.session.execute(insert(models.College), [
+                {'id': c, 'name': f'College {c}', 'code': f'C{c}'} for c in campus.colleges if c not in existing])
+            existing = {admin.college_id for admin in models.Admin.query}
+            db.session.execute(insert(models.Admin), [{
+                'username': f'admin{c}', 'email': f'admin{c}@campus.test', 'password_hash': password_hash,
+                'name': f'Admin {c}', 'college_id': c} for c in campus.colleges if c not in existing])
+            admins = {admin.college_id: admin.id for admin in models.Admin.query}
+            db.session.execute(insert(models.Student), [
+                dict(student, password_hash=password_hash) for student in campus.students])
+            seats = collections.Counter(event_id for _, event_id, _ in campus.registrations)
+            db.session.execute(insert(models.Event), [{
+                key: event[key] for key in ('id', 'title', 'description', 'event_type', 'start_date', 'end_date',
+                                            'location', 'max_participants', 'college_id')
+            } | {'seats_taken': seats[event['id']], 'created_by': admins[event['college_id']]}
+                for event in campus.events])
+            db.session.execute(insert(models.Registration), [
+                {'student_id': s, 'event_id': e, 'registered_at': at} for s, e, at in campus.registrations])
+            db.session.execute(insert(models.Attendance), [
+                {'student_id': s, 'event_id': e, 'checked_in_at': at} for s, e, at in campus.attendance])
+            db.session.execute(insert(models.Feedback), [
+                {'student_id': s, 'event_id': e, 'rating': r, 'comment': c, 'submitted_at': at}
+                for s, e, r, c, at in campus.feedback])
+            db.session.commit()
+            # Backfills student_stats from the attendance just written
+            self.module.upgrade_schema()
+            db.session.execute(text("ANALYZE"))
+            self.admin_headers = {college_id: self.bearer({'id': admin_id, 'role': 'admin', 'college_id': college_id})
+                                  for college_id, admin_id in admins.items()}
+            self.student_headers = {student['id']: self.bearer({
+                'id': student['id'], 'role': 'student', 'college_id': student['college_id']})
+                for student in campus.students}
+
+    def bearer(self, identity):
+        from flask_jwt_extended import create_access_token
+
+        return {'Authorization': f'Bearer {create_access_token(identity=identity)}'}
+
+    def token(self, student_id, event):
+        from checkin_tokens import token_expiry
+
+        return self.extensions.checkin_tokens.issue(student_id, event['id'], token_expiry(event['end_date']))
+
+    def routes(self, campus):
+        events = {event['id']: event for event in campus.events}
+        student = lambda rng: rng.choice(campus.students)['id']
+        admin_of = lambda event_id: self.admin_headers[events[event_id]['college_id']]
+        any_admin = lambda rng: self.admin_headers[rng.choice(campus.colleges)]
+
+        def own_event(rng, kinds):
+            # A student and one of the events they are registered for
+            while True:
+                student_id = student(rng)
+                choices = [e for e in campus.registered[student_id] if events[e]['kind'] in kinds]
+                if choices:
+                    return student_id, rng.choice(choices)
+
+        def scan(rng):
+            student_id, event_id = campus.next_checkin(rng)
+            return Call('POST', f'/api/events/{event_id}/checkin/scan',
+                        {'token': self.token(student_id, events[event_id]), 'device_id': 'door-1'},
+                        admin_of(event_id))
+
+        def batch(rng):
+            event_id, students = campus.checkin_batch(rng)
+            return Call('POST', f'/api/events/{event_id}/checkins', {'checkins': [
+                {'token': self.token(s, events[event_id]), 'device_id': 'door-2'} for s in students]},
+                admin_of(event_id))
+
+        def self_checkin(rng):
+            student_id, event_id = own_event(rng, ('today',))
+            return Call('POST', f'/api/events/{event_id}/checkin', headers=self.student_headers[student_id])
+
+        def checkin_token(rng):
+            student_id, event_id = own_event(rng, ('today', 'upcoming'))
+            return Call('GET', f'/api/events/{event_id}/checkin-token', headers=self.student_headers[student_id])
+
+        def cancel(rng):
+            student_id, event_id = own_event(rng, ('upcoming',))
+            return Call('POST', f'/api/events/{event_id}/cancel', headers=self.student_headers[student_id])
+
+        def feedback(rng):
+            student_id, event_id = own_event(rng, ('past',))
+            return Call('POST', f'/api/events/{event_id}/feedback', {'rating': rng.randint(1, 5), 'comment': 'Great event'},
+                        self.student_headers[student_id])
+
+        def certificate(rng):
+            student_id, event_id, _ = rng.choice(campus.attendance)
+            return Call('GET', f'/api/events/{event_id}/certificate/{student_id}', headers=admin_of(event_id))
+
+        return {
+            'POST /api/auth/admin/login': lambda rng: Call('POST', '/api/auth/admin/login',
+                                                          {'username': 'admin', 'password': 'admin123'}),
+            'POST /api/auth/student/login': lambda rng: Call('POST', '/api/auth/student/login', {
+                'email': rng.choice(campus.students)['email'], 'password': SEED_PASSWORD}),
+            'POST /api/auth/student/register': lambda rng: Call('POST', '/api/auth/student/register',
+                                                                campus.new_student()),
+            'GET /api/events': lambda rng: Call('GET', '/api/events?when=upcoming&limit=20',
+                                                headers=self.student_headers[student(rng)]),
+            'GET /api/events?when=past': lambda rng: Call(
+                'GET', f'/api/events?when=past&limit=50&event_type={rng.choice(EVENT_TYPES)}',
+                headers=any_admin(rng)),
+            'PUT /api/events/<id>': lambda rng: (lambda event_id: Call(
+                'PUT', f'/api/events/{event_id}', {'location': f'Hall {rng.randint(1, 12)}'}, admin_of(event_id)))(
+                rng.choice(campus.by_kind['upcoming'])),
+            'POST /api/events/<id>/register': lambda rng: Call(
+                'POST', f"/api/events/{rng.choice(campus.by_kind['upcoming'])}/register",
+                headers=self.student_headers[student(rng)]),
+            'POST /api/events/<id>/cancel': cancel,
+            'GET /api/events/<id>/checkin-token': checkin_token,
+            'POST /api/events/<id>/checkin/scan': scan,
+            'POST /api/events/<id>/checkins': batch,
+            'POST /api/events/<id>/checkin': self_checkin,
+            'POST /api/events/<id>/feedback': feedback,
+            'GET /api/admin/dashboard': lambda rng: Call('GET', '/api/admin/dashboard', headers=any_admin(rng)),
+            'GET /api/student/dashboard': lambda rng: Call('GET', '/api/student/dashboard',
+                                                           headers=self.student_headers[student(rng)]),
+            'GET /api/leaderboard': lambda rng: Call('GET', '/api/leaderboard?limit=20', headers=any_admin(rng)),
+            'GET /api/leaderboard/export': lambda rng: Call('GET', '/api/leaderboard/export?format=csv',
+                                                            headers=any_admin(rng)),
+            'GET /api/leaderboard/me': lambda rng: Call('GET', '/api/leaderboard/me',
+                                                        headers=self.student_headers[student(rng)]),
+            'GET /api/events/<id>/certificate/<student_id>': certificate,
+            'GET /api/system/password-hashing': lambda rng: Call('GET', '/api/system/password-hashing',
+                                                                 headers=any_admin(rng)),
+        }
+
+
+TARGETS = {'simple': SimpleTarget, 'backend': BackendTarget}
+
+
+class TestClientDriver:
+    name = 'test-client'
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, call):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(call.path, method=call.method, json=call.json, headers=call.headers)
+        # Read streamed bodies to the end, as a real client would
+        response.get_data()
+        response.close()
+        return response.status_code
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args):
+        pass
+
+
+class WSGIServerDriver:
+    name = 'wsgi'
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+        return False
+
+    def send(self, call):
+        conn = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=60)
+        try:
+            headers = dict(call.headers or {})
+            body = None
+            if call.json is not None:
+                body = json.dumps(call.json)
+                headers['Content-Type'] = 'application/json'
+            conn.request(call.method, call.path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+
+DRIVERS = {'test-client': TestClientDriver, 'wsgi': WSGIServerDriver}
+
+
+def run_scenario(driver, routes, weights, requests, threads, seed):
+    """Send ``requests`` calls drawn from ``weights``; returns the scenario's results."""
+    names = [name for name in weights if name in routes]
+    cumulative = list(itertools.accumulate(weights[name] for name in names))
+    remaining = itertools.count()
+    samples = collections.defaultdict(list)
+    statuses = collections.defaultdict(collections.Counter)
+    lock = threading.Lock()
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        while next(remaining) < requests:
+            name = rng.choices(names, cum_weights=cumulative)[0]
+            call = routes[name](rng)
+            start = time.perf_counter()
+            try:
+                status = driver.send(call)
+            except Exception as error:
+                status = type(error).__name__
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                samples[name].append(elapsed_ms)
+                statuses[name][status] += 1
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for name in names:
+        ordered = sorted(samples[name])
+        if not ordered:
+            continue
+        endpoints[name] = {
+            'requests': len(ordered),
+            'rps': round(len(ordered) / elapsed, 1),
+            'errors': sum(count for status, count in statuses[name].items()
+                          if not isinstance(status, int) or status >= 500),
+            'statuses': {str(status): count for status, count in sorted(statuses[name].items(), key=str)},
+            'mean_ms': round(sum(ordered) / len(ordered), 2),
+            'p50_ms': round(percentile(ordered, 0.50), 2),
+            'p95_ms': round(percentile(ordered, 0.95), 2),
+            'p99_ms': round(percentile(ordered, 0.99), 2),
+            'max_ms': round(ordered[-1], 2),
+        }
+    return {
+        'requests': sum(endpoint['requests'] for endpoint in endpoints.values()),
+        'elapsed_seconds': round(elapsed, 3),
+        'rps': round(sum(endpoint['requests'] for endpoint in endpoints.values()) / elapsed, 1),
+        'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+        'endpoints': endpoints,
+    }
+
+
+def print_results(driver, scenario, results):
+    print(f"\n[{driver}] {scenario}: {results['requests']} requests in {results['elapsed_seconds']}s, "
+          f"{results['rps']} req/s, {results['errors']} errors")
+    print(f"  {'endpoint':<48}{'n':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}  statuses")
+    for name, endpoint in sorted(results['endpoints'].items(), key=lambda item: -item[1]['p95_ms']):
+        statuses = ' '.join(f'{status}x{count}' for status, count in endpoint['statuses'].items())
+        print(f"  {name:<48}{endpoint['requests']:>6}{endpoint['rps']:>9}{endpoint['p50_ms']:>9}"
+              f"{endpoint['p95_ms']:>9}{endpoint['p99_ms']:>9}  {statuses}")
+
+
+def compare(previous, current):
+    """Print the p95 latency and throughput of every endpoint against ``previous``."""
+    print(f"\nChange since {previous['meta']['commit']} ({previous['meta']['created_at']}):")
+    change = lambda old, new: f'{(new - old) / old * 100:+.0f}%' if old else 'n/a'
+    for driver, scenarios in current['runs'].items():
+        for scenario, results in scenarios.items():
+            before = previous.get('runs', {}).get(driver, {}).get(scenario)
+            if not before:
+                continue
+            print(f"  [{driver}] {scenario}: {before['rps']} -> {results['rps']} req/s "
+                  f"({change(before['rps'], results['rps'])})")
+            for name, endpoint in sorted(results['endpoints'].items()):
+                old = before['endpoints'].get(name)
+                if old:
+                    print(f"    {name:<48} p95 {old['p95_ms']:>8} -> {endpoint['p95_ms']:>8} ms "
+                          f"({change(old['p95_ms'], endpoint['p95_ms'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=TARGETS, default='simple')
+    parser.add_argument('--driver', choices=tuple(DRIVERS) + ('all',), default='all')
+    parser.add_argument('--scenario', choices=tuple(SCENARIOS) + ('routes', 'all'), default='all')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000, help='per scenario')
+    parser.add_argument('--colleges', type=int, default=2)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=120)
+    parser.add_argument('--registrations', type=int, default=24000)
+    parser.add_argument('--attendance', type=float, default=0.7, help='share of past registrations checked in')
+    parser.add_argument('--feedback', type=float, default=0.4, help='share of attendees leaving feedback')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='JSON results file (default: load-test-<target>-<commit>.json)')
+    parser.add_argument('--compare', help='earlier JSON results file to compare against')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    drivers = list(DRIVERS) if args.driver == 'all' else [args.driver]
+    scenarios = list(SCENARIOS) + ['routes'] if args.scenario == 'all' else [args.scenario]
+
+    workdir = tempfile.mkdtemp(prefix='campus-load-')
+    try:
+        campus = Campus(args.colleges, args.students, args.events, args.registrations,
+                        args.attendance, args.feedback, args.seed)
+        target = TARGETS[args.target]()
+        app = target.load(workdir)
+        start = time.perf_counter()
+        target.seed(campus)
+        print(f"seeded {campus.summary()} in {time.perf_counter() - start:.1f}s")
+        routes = target.routes(campus)
+
+        results = {
+            'meta': {
+                'target': args.target,
+                'commit': commit,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'threads': args.threads,
+                'requests_per_scenario': args.requests,
+                'campus': campus.summary(),
+                'env': {name: os.environ[name] for name in ('WRITE_BATCHING', 'DB_POOL_SIZE') if name in os.environ},
+            },
+            'runs': {},
+        }
+        for driver_name in drivers:
+            with DRIVERS[driver_name](app) as driver:
+                for scenario in scenarios:
+                    weights = SCENARIOS.get(scenario) or dict.fromkeys(routes, 1)
+                    run = run_scenario(driver, routes, weights, args.requests, args.threads, args.seed)
+                    results['runs'].setdefault(driver_name, {})[scenario] = run
+                    print_results(driver_name, scenario, run)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or f'load-test-{args.target}-{commit}.json'
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'\nresults written to {output}')
+
+    if previous:
+        compare(previous, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Concurrency stress test for seat claiming in backend/app.py.
+
+Fires N parallel registrations at one event with fewer seats than students,
+then cancels a handful of seats, and checks that nothing was over-admitted
+and that the waitlist was promoted in FIFO order.
+
+    python benchmarks/stress_registration.py --students 300 --seats 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    sys.path.insert(0, os.path.join(ROOT, 'backend'))
+    import app as backend
+    import models
+    from extensions import db
+    from flask_jwt_extended import create_access_token
+    return backend.app, db, backend.create_tables, models, create_access_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=300)
+    parser.add_argument('--seats', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--cancel', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='campus-stress-')
+    app, db, create_tables, models, create_access_token = load_app(os.path.join(workdir, 'stress.db'))
+
+    with app.app_context():
+        create_tables()
+        college = models.College.query.first()
+        admin = models.Admin.query.first()
+        event = models.Event(
+            title='Stress Hackathon', description='', event_type='hackathon',
+            start_date=datetime.utcnow() + timedelta(days=7),
+            end_date=datetime.utcnow() + timedelta(days=8),
+            location='Main Hall', max_participants=args.seats,
+            college_id=college.id, created_by=admin.id
+        )
+        db.session.add(event)
+        students = [models.Student(
+            student_id=f'STRESS{i:05d}', email=f'stress{i}@college.edu',
+            password_hash='x', name=f'Student {i}', college_id=college.id
+        ) for i in range(args.students)]
+        db.session.add_all(students)
+        db.session.commit()
+        event_id = event.id
+        student_ids = [student.id for student in students]
+        tokens = [create_access_token(identity={
+            'id': student.id, 'role': 'student', 'college_id': college.id
+        }) for student in students]
+
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return local.client
+
+    def post(path, token):
+        response = client().post(path, headers={'Authorization': f'Bearer {token}'})
+        return response.status_code, response.get_json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(lambda t: post(f'/api/events/{event_id}/register', t), tokens))
+    elapsed = time.perf_counter() - start
+
+    errors = [r for r in results if r[0] != 200]
+    registered = sum(1 for code, body in results if code == 200 and body['status'] == 'registered')
+    waitlisted = sum(1 for code, body in results if code == 200 and body['status'] == 'waitlisted')
+    print(f'{len(tokens)} registrations in {elapsed:.2f}s ({len(tokens) / elapsed:.0f} req/s): '
+          f'{registered} registered, {waitlisted} waitlisted, {len(errors)} errors')
+
+    def check(label):
+        with app.app_context():
+            rows = models.Registration.query.filter_by(event_id=event_id, status='registered').count()
+            seats = db.session.get(models.Event, event_id).seats_taken
+        print(f'{label}: seats_taken={seats}, registered rows={rows}')
+        assert rows == seats == min(args.seats, args.students), 'seat counter drifted'
+
+    assert not errors, errors[:5]
+    assert registered == min(args.seats, args.students)
+    check('after registration')
+
+    # Cancel some seats concurrently; the oldest waitlisted students take them
+    with app.app_context():
+        holders = models.Registration.query.filter_by(event_id=event_id, status='registered') \
+            .limit(args.cancel).all()
+        cancel_ids = [r.student_id for r in holders]
+        expected = [r.student_id for r in models.Registration.query.filter_by(
+            event_id=event_id, status='waitlisted'
+        ).order_by(models.Registration.registered_at, models.Registration.id).limit(len(cancel_ids))]
+    id_to_token = dict(zip(student_ids, tokens))
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        cancelled = list(pool.map(lambda s_id: post(f'/api/events/{event_id}/cancel', id_to_token[s_id]), cancel_ids))
+    assert all(code == 200 for code, _ in cancelled), cancelled
+
+    check('after cancellations')
+    with app.app_context():
+        promoted = {r.student_id for r in models.Registration.query.filter(
+            models.Registration.event_id == event_id,
+            models.Registration.student_id.in_(expected)
+        ) if r.status == 'registered'}
+    assert promoted == set(expected), 'waitlist was not promoted in FIFO order'
+    print(f'promoted {len(promoted)} waitlisted students in FIFO order - OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Versioned schema upgrades for the simple backends' SQLite database.
+
+``init_db()`` creates the base tables; everything added after that lives
+here. ``PRAGMA user_version`` records the last step applied, so upgrading an
+existing ``campus_events.db`` only runs the steps it has not seen yet. Add a
+new ``(version, statements)`` entry rather than editing an old one.
+"""
+from backend.event_search import fts_schema
+from backend.schedule_conflicts import span_schema
+
+MIGRATIONS = [
+    # 1: secondary indexes for the routes' hot queries
+    (1, [
+        # Events list ordered by date
+        "CREATE INDEX IF NOT EXISTS idx_events_start_date ON events (start_date)",
+        # Per-event registration lists, capacity checks and waitlist order
+        "CREATE INDEX IF NOT EXISTS idx_registrations_event_status ON registrations (event_id, status, registered_at)",
+        # Report joins and event deletes; (student_id, event_id) is already covered by UNIQUE
+        "CREATE INDEX IF NOT EXISTS idx_attendance_event ON attendance (event_id)",
+        "CREATE INDEX IF NOT EXISTS idx_feedback_event ON feedback (event_id)",
+    ]),
+    # 2: let the event report average ratings from the index alone
+    (2, [
+        "CREATE INDEX IF NOT EXISTS idx_feedback_event_rating ON feedback (event_id, rating)",
+        "DROP INDEX IF EXISTS idx_feedback_event",
+    ]),
+    # 3: per-student attendance tallies for the leaderboard, kept in step with
+    # every insert into and delete from attendance by triggers
+    (3, [
+        """CREATE TABLE IF NOT EXISTS student_stats (
+            student_id INTEGER PRIMARY KEY,
+            college_id INTEGER,
+            attendance_count INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_student_stats_college_attendance ON student_stats (college_id, attendance_count)",
+        """INSERT OR REPLACE INTO student_stats (student_id, college_id, attendance_count)
+            SELECT a.student_id, s.college_id, COUNT(*)
+            FROM attendance a JOIN students s ON s.id = a.student_id
+            GROUP BY a.student_id""",
+        """CREATE TRIGGER IF NOT EXISTS trg_attendance_insert_stats AFTER INSERT ON attendance
+        BEGIN
+            INSERT INTO student_stats (student_id, college_id, attendance_count)
+            SELECT NEW.student_id, college_id, 1 FROM students WHERE id = NEW.student_id
+            ON CONFLICT (student_id) DO UPDATE SET attendance_count = attendance_count + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_attendance_delete_stats AFTER DELETE ON attendance
+        BEGIN
+            UPDATE student_stats SET attendance_count = attendance_count - 1
+            WHERE student_id = OLD.student_id;
+        END""",
+    ]),
+    # 4: college-scoped dashboard counts
+    (4, [
+        "CREATE INDEX IF NOT EXISTS idx_events_college ON events (college_id, start_date)",
+        "CREATE INDEX IF NOT EXISTS idx_students_college ON students (college_id)",
+    ]),
+    # 5: which scanner recorded a check-in, for batched offline sync
+    (5, [
+        "ALTER TABLE attendance ADD COLUMN device_id TEXT",
+    ]),
+    # 6: full-text index over event titles, descriptions, locations and types
+    # for /api/events/search, kept in step with events by triggers
+    (6, fts_schema('events', 'events_fts')),
+    # 7: interval index over event dates for schedule-conflict checks, kept in
+    # step with events by triggers, and venue lookups within a college
+    (7, span_schema('events', 'event_spans') + [
+        "CREATE INDEX IF NOT EXISTS idx_events_college_location ON events (college_id, location)",
+    ]),
+]
+
+
+def apply_migrations(conn):
+    """Bring the schema up to date; returns the resulting version."""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        for statement in statements:
+            conn.execute(statement)
+        # PRAGMA does not take bound parameters
+        conn.execute(f"PRAGMA user_version = {int(version)}")
+        conn.commit()
+        current = version
+    conn.execute("PRAGMA optimize")
+    return current
@@ -0,0 +1,161 @@
+"""Pooled SQLite connections for the simple backends.
+
+Opening ``campus_events.db`` on every request means a fresh file open, schema
+parse and cold page cache each time. ``ConnectionPool`` keeps a bounded set of
+connections that are configured once (WAL, synchronous=NORMAL, busy timeout,
+mmap and cache size) and lends one to each request through Flask's app context.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, jsonify
+
+DATABASE = os.getenv('DATABASE_PATH', 'campus_events.db')
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free within the pool's wait timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, database=DATABASE, max_size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 busy_timeout_ms=5000, mmap_size=64 * 1024 * 1024, cache_size_kb=16 * 1024,
+                 factory=sqlite3.Connection):
+        self.database = database
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+        # Stats
+        self._acquired = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+
+    def pragmas(self):
+        """The statements every connection is configured with."""
+        return [
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}",
+            f"PRAGMA mmap_size={int(self.mmap_size)}",
+            # Negative cache_size is in KiB rather than pages
+            f"PRAGMA cache_size=-{int(self.cache_size_kb)}",
+            "PRAGMA temp_store=MEMORY",
+        ]
+
+    def _configure(self, conn):
+        for pragma in self.pragmas():
+            conn.execute(pragma)
+
+    def open_connection(self):
+        """A connection configured like the pool's, but not counted or lent
+        by it; for long-lived owners such as the write batcher's thread."""
+        conn = sqlite3.connect(self.database, timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False, factory=self.factory)
+        self._configure(conn)
+        return conn
+
+    def acquire(self):
+        start = time.perf_counter()
+        with self._cond:
+            while not self._idle and self._created >= self.max_size:
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f'No database connection free after {self.timeout}s')
+                self._cond.wait(remaining)
+
+            waited = time.perf_counter() - start
+            self._acquired += 1
+            if waited > 0.001:
+                self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        # Open outside the lock so a slow disk doesn't block other borrowers
+        try:
+            return self.open_connection()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                discard = True
+
+        with self._cond:
+            if discard:
+                self._created -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._created -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'database': self.database,
+                'max_size': self.max_size,
+                'open': self._created,
+                'idle': len(self._idle),
+                'in_use': self._created - len(self._idle),
+                'acquired': self._acquired,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'wait_avg_ms': round(self._wait_total / self._acquired * 1000, 3) if self._acquired else 0,
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+
+def init_app(app, pool):
+    app.extensions['db_pool'] = pool
+
+    @app.teardown_appcontext
+    def return_connection(exc):
+        conn = g.pop('db', None)
+        if conn is not None:
+            pool.release(conn)
+
+    @app.errorhandler(PoolTimeout)
+    def pool_exhausted(error):
+        return jsonify({'error': 'Server busy, please retry'}), 503
+
+    @app.route('/api/system/db-pool', methods=['GET'])
+    def db_pool_stats():
+        return jsonify(pool.stats())
+
+
+def get_db():
+    """Return the connection lent to the current app context."""
+    if 'db' not in g:
+        g.db = current_app.extensions['db_pool'].acquire()
+    return g.db
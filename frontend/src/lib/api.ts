@@ -1,4 +1,4 @@
-import axios from 'axios';
+import axios, { AxiosResponse, InternalAxiosRequestConfig } from 'axios';
 import { API_BASE_URL } from './utils';
 
 const api = axios.create({
@@ -6,22 +6,60 @@ const api = axios.create({
   headers: {
     'Content-Type': 'application/json',
   },
+  // 304 answers a conditional GET; see the validator interceptors below
+  validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
 });
 
-// Add token to requests
+// The last ETag-tagged response of each GET URL. The tag goes back as
+// If-None-Match, and on a 304 the stored response stands in for the body the
+// server didn't resend.
+const MAX_VALIDATED = 200;
+const validated = new Map<string, AxiosResponse>();
+
+const validatorKey = (config: InternalAxiosRequestConfig) =>
+  config.method === 'get' && config.responseType !== 'blob' ? api.getUri(config) : null;
+
+// Add token and validators to requests
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem('token');
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  const key = validatorKey(config);
+  const etag = key && validated.get(key)?.headers.etag;
+  if (etag) {
+    config.headers['If-None-Match'] = etag;
+  }
   return config;
 });
 
+// Keep tagged responses and answer 304s from them
+api.interceptors.response.use((response) => {
+  const key = validatorKey(response.config);
+  if (!key) return response;
+  const stored = validated.get(key);
+  if (response.status === 304 && stored) {
+    // Most recently used last
+    validated.delete(key);
+    validated.set(key, stored);
+    return stored;
+  }
+  if (response.headers.etag) {
+    validated.delete(key);
+    validated.set(key, response);
+    if (validated.size > MAX_VALIDATED) {
+      validated.delete(validated.keys().next().value);
+    }
+  }
+  return response;
+});
+
 // Handle token expiration
 api.interceptors.response.use(
   (response) => response,
   (error) => {
     if (error.response?.status === 401) {
+      validated.clear();
       localStorage.removeItem('token');
       localStorage.removeItem('user');
       window.location.href = '/login';
@@ -51,8 +89,69 @@ export const authAPI = {
 };
 
 // Events API
+// Omitting limit returns every matching event; with limit, the next page's
+// cursor comes back in the X-Next-Cursor response header.
+export interface EventListParams {
+  limit?: number;
+  cursor?: string;
+  order?: 'asc' | 'desc';
+  event_type?: string;
+  start_date?: string;
+  end_date?: string;
+  when?: 'upcoming' | 'past';
+  fields?: string;
+}
+
+// Ranked full-text search; every word is matched as a prefix
+export interface EventSearchParams {
+  q: string;
+  limit?: number;
+  cursor?: string;
+  fields?: string;
+}
+
+export interface ConflictingEvent {
+  id: number;
+  title: string;
+  start_date: string;
+  end_date: string;
+  location: string;
+}
+
+export interface ScheduleConflict {
+  event: ConflictingEvent;
+  overlaps: ConflictingEvent;
+}
+
+// Either the student's id or the signed token from their QR code
+export interface CheckinItem {
+  student_id?: number;
+  token?: string;
+  timestamp?: string;
+  device_id: string;
+}
+
+export interface CheckinToken {
+  token: string;
+  expires_at: string;
+}
+
+export interface CheckinSyncResult {
+  counts: { checked_in: number; duplicate: number; rejected: number };
+  results: Array<{
+    index: number;
+    student_id: number;
+    status: 'checked_in' | 'duplicate' | 'rejected';
+    checked_in_at?: string;
+    error?: string;
+  }>;
+}
+
 export const eventsAPI = {
-  getEvents: () => api.get('/events'),
+  getEvents: (params?: EventListParams) => api.get('/events', { params }),
+  
+  // Best matches first; the next page's cursor is in X-Next-Cursor
+  searchEvents: (params: EventSearchParams) => api.get('/events/search', { params }),
   
   createEvent: (data: {
     title: string;
@@ -71,20 +170,129 @@ export const eventsAPI = {
   
   registerForEvent: (eventId: number) => api.post(`/events/${eventId}/register`),
   
+  cancelRegistration: (eventId: number) => api.post(`/events/${eventId}/cancel`),
+  
   checkInEvent: (eventId: number) => api.post(`/events/${eventId}/checkin`),
   
   submitFeedback: (eventId: number, data: { rating: number; comment?: string }) =>
     api.post(`/events/${eventId}/feedback`, data),
+
+  // Signed token for the student's check-in QR code
+  getCheckinToken: (eventId: number) => api.get<CheckinToken>(`/events/${eventId}/checkin-token`),
+  
+  scanCheckin: (eventId: number, token: string, deviceId?: string) =>
+    api.post(`/events/${eventId}/checkin/scan`, { token, device_id: deviceId }),
+  
+  // Scanner check-ins queued while offline, applied in one transaction;
+  // safe to resend, already-checked-in students come back as 'duplicate'
+  syncCheckins: (eventId: number, checkins: CheckinItem[]) =>
+    api.post<CheckinSyncResult>(`/events/${eventId}/checkins`, { checkins }),
+
+  // ZIP of every attendee's certificate; the X-Export-Id header identifies
+  // the export for getExportProgress while it downloads
+  exportCertificates: (eventId: number) =>
+    api.get(`/events/${eventId}/certificates.zip`, { responseType: 'blob' }),
+
+  getExportProgress: (exportId: string) => api.get(`/exports/${exportId}`),
+
+  // Overlapping events at a venue (admins) or among a student's registrations
+  getScheduleConflicts: (params?: { location?: string; student_id?: number }) =>
+    api.get<ScheduleConflict[]>('/schedule/conflicts', { params }),
 };
 
 // Dashboard API
+export interface LiveUpdate {
+  event_id: number;
+  seats_taken?: number;
+  waitlisted?: number;
+  checked_in?: number;
+  feedback?: number;
+  rating?: number;
+}
+
 export const dashboardAPI = {
   getAdminDashboard: () => api.get('/admin/dashboard'),
   
   getStudentDashboard: () => api.get('/student/dashboard'),
   
-  getLeaderboard: () => api.get('/leaderboard'),
+  getLeaderboard: (limit?: number) => api.get('/leaderboard', { params: { limit } }),
+  
+  getMyRank: () => api.get('/leaderboard/me'),
+  
+  // Deltas as 'registrations', 'checkins' and 'feedback' events (see
+  // LiveUpdate); 'resync' means reload the totals. EventSource can't send
+  // headers, so the token goes in the query string
+  openLiveUpdates: () => {
+    const token = localStorage.getItem('token');
+    return new EventSource(`${API_BASE_URL}/stream${token ? `?jwt=${encodeURIComponent(token)}` : ''}`);
+  },
+  
+  exportLeaderboard: (format: ExportFormat) =>
+    api.get('/leaderboard/export', { params: { format }, responseType: 'blob' }),
   
+  // The PDF itself if already rendered, otherwise a 202 with the queued job
   generateCertificate: (eventId: number, studentId: number) =>
-    api.get(`/events/${eventId}/certificate/${studentId}`),
+    api.get(`/events/${eventId}/certificate/${studentId}`, { responseType: 'blob' }),
+};
+
+// Admin API
+export interface StudentImportReport {
+  rows: number;
+  created: number;
+  failed: number;
+  errors: Array<{ row: number; student_id: string; error: string }>;
+  errors_truncated: boolean;
+  elapsed_seconds: number;
+  per_second: number;
+}
+
+export const adminAPI = {
+  // CSV or XLSX with student_id, email, name, password and optional phone columns
+  importStudents: (file: File) => {
+    const form = new FormData();
+    form.append('file', file);
+    return api.post<StudentImportReport>('/admin/students/import', form, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+  },
+};
+
+// Reports API
+// Exports are streamed by the server as file downloads
+export type ExportFormat = 'csv' | 'xlsx';
+
+export const reportsAPI = {
+  exportEvents: (format: ExportFormat, params?: { event_type?: string; start_date?: string; end_date?: string }) =>
+    api.get('/reports/events/export', { params: { format, ...params }, responseType: 'blob' }),
+  
+  exportEventRegistrations: (eventId: number, format: ExportFormat) =>
+    api.get(`/events/${eventId}/registrations/export`, { params: { format }, responseType: 'blob' }),
+};
+
+// Background jobs API
+export interface JobStatus {
+  job_id: string;
+  kind: string;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  attempts: number;
+  status_url: string;
+  result_url?: string;
+  error?: string;
+}
+
+export const jobsAPI = {
+  getJob: (jobId: string) => api.get<JobStatus>(`/jobs/${jobId}`),
+  
+  getResult: (jobId: string) => api.get(`/jobs/${jobId}/result`, { responseType: 'blob' }),
+  
+  waitFor: async (jobId: string, intervalMs = 500, timeoutMs = 60000): Promise<JobStatus> => {
+    const deadline = Date.now() + timeoutMs;
+    for (;;) {
+      const { data } = await jobsAPI.getJob(jobId);
+      if (data.status === 'done') return data;
+      if (data.status === 'failed') throw new Error(data.error || 'Job failed');
+      if (Date.now() > deadline) throw new Error('Timed out waiting for job');
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  },
 };
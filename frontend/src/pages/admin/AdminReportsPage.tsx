@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
-import { dashboardAPI } from '@/lib/api';
+import { dashboardAPI, reportsAPI } from '@/lib/api';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
@@ -88,9 +88,20 @@ const AdminReportsPage: React.FC = () => {
     }
   };
 
-  const handleExportReport = (format: 'csv' | 'excel') => {
-    // In a real app, you'd call an API endpoint to generate and download the report
-    alert(`Exporting report as ${format.toUpperCase()}...`);
+  const handleExportReport = async (format: 'csv' | 'excel') => {
+    const extension = format === 'excel' ? 'xlsx' : 'csv';
+    try {
+      const response = await reportsAPI.exportEvents(extension);
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `event-report.${extension}`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error('Failed to export report:', error);
+      alert('Failed to export report');
+    }
   };
 
   const COLORS = ['#0088FE', '#00C49F', '#FFBB28', '#FF8042', '#8884D8'];
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
-import { dashboardAPI, eventsAPI } from '@/lib/api';
+import { dashboardAPI, eventsAPI, jobsAPI } from '@/lib/api';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
@@ -87,13 +87,20 @@ const MyEventsPage: React.FC = () => {
 
   const handleDownloadCertificate = async (eventId: number) => {
     try {
-      const response = await dashboardAPI.generateCertificate(eventId, 1); // Student ID from context
+      let response = await dashboardAPI.generateCertificate(eventId, 1); // Student ID from context
+      if (response.status === 202) {
+        const job = JSON.parse(await response.data.text());
+        await jobsAPI.waitFor(job.job_id);
+        response = await jobsAPI.getResult(job.job_id);
+      }
+      const url = URL.createObjectURL(response.data);
       const link = document.createElement('a');
-      link.href = `data:application/pdf;base64,${response.data.certificate}`;
+      link.href = url;
       link.download = `certificate-${eventId}.pdf`;
       link.click();
+      URL.revokeObjectURL(url);
     } catch (error: any) {
-      alert(error.response?.data?.error || 'Failed to generate certificate');
+      alert(error.response?.data?.error || error.message || 'Failed to generate certificate');
     }
   };
 
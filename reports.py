@@ -0,0 +1,164 @@
+"""Report queries for the simple backend.
+
+Joining registrations, attendance and feedback onto events (or students) in
+one GROUP BY multiplies the rows: an event with R registrations, A check-ins
+and F feedback rows produces R*A*F joined rows, so COUNT() over-reports and
+the query slows down quadratically as events fill up. Each figure here is an
+aggregate over a single table, looked up per event or student through the
+(event_id, ...) and (student_id, event_id) indexes, so the cost is linear in
+the rows that belong to the events being reported on.
+"""
+from datetime import datetime
+
+EVENT_REPORT_SQL = """
+    SELECT e.id, e.title, e.description, e.event_type, e.start_date, e.end_date,
+           e.location, e.max_participants, e.registration_deadline,
+           (SELECT COUNT(*) FROM registrations r WHERE r.event_id = e.id) AS registration_count,
+           (SELECT COUNT(*) FROM attendance a WHERE a.event_id = e.id) AS attendance_count,
+           (SELECT AVG(f.rating) FROM feedback f WHERE f.event_id = e.id) AS avg_rating
+    FROM events e
+"""
+
+TOP_ACTIVE_STUDENTS_SQL = """
+    SELECT id, name, email, student_id, total_registrations, total_attendance, total_feedback
+    FROM (
+        SELECT s.id, s.name, s.email, s.student_id,
+               (SELECT COUNT(*) FROM registrations r WHERE r.student_id = s.id) AS total_registrations,
+               (SELECT COUNT(*) FROM attendance a WHERE a.student_id = s.id) AS total_attendance,
+               (SELECT COUNT(*) FROM feedback f WHERE f.student_id = s.id) AS total_feedback
+        FROM students s
+    )
+    ORDER BY total_registrations DESC, total_attendance DESC
+    LIMIT ?
+"""
+
+
+# Every dashboard figure in one statement, scoped to a college
+DASHBOARD_STATS_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM events WHERE college_id = :college_id),
+        (SELECT COUNT(*) FROM students WHERE college_id = :college_id),
+        (SELECT COUNT(*) FROM registrations r JOIN events e ON e.id = r.event_id WHERE e.college_id = :college_id),
+        (SELECT COUNT(*) FROM attendance a JOIN events e ON e.id = a.event_id WHERE e.college_id = :college_id)
+"""
+
+RECENT_EVENTS_SQL = """
+    SELECT id, title, event_type, start_date FROM events
+    WHERE college_id = ?
+    ORDER BY id DESC
+    LIMIT 5
+"""
+
+TOP_EVENTS_SQL = """
+    SELECT e.title, (SELECT COUNT(*) FROM registrations r WHERE r.event_id = e.id) AS registrations
+    FROM events e
+    WHERE e.college_id = ?
+    ORDER BY registrations DESC
+    LIMIT 5
+"""
+
+
+def build_event_report_query(event_type='all', start_date=None, end_date=None):
+    conditions = []
+    params = []
+
+    if event_type and event_type != 'all':
+        conditions.append("e.event_type = ?")
+        params.append(event_type)
+
+    if start_date:
+        conditions.append("e.start_date >= ?")
+        params.append(start_date)
+
+    if end_date:
+        conditions.append("e.end_date <= ?")
+        params.append(end_date)
+
+    query = EVENT_REPORT_SQL
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    # events has no created_at column; ids are assigned in creation order
+    query += " ORDER BY e.id DESC"
+    return query, params
+
+
+# Column titles for the CSV/XLSX export, in event_report_rows order
+EVENT_REPORT_HEADER = ('ID', 'Title', 'Description', 'Type', 'Start', 'End', 'Location',
+                       'Max Participants', 'Registration Deadline', 'Registrations',
+                       'Attendance', 'Average Rating')
+
+
+def event_report_rows(conn, event_type='all', start_date=None, end_date=None):
+    """The report's rows one at a time, for exports that stream it."""
+    query, params = build_event_report_query(event_type, start_date, end_date)
+    for row in conn.execute(query, params):
+        yield row[:11] + (round(row[11], 2) if row[11] else 0,)
+
+
+def event_report(conn, event_type='all', start_date=None, end_date=None):
+    return [{
+        'id': row[0],
+        'title': row[1],
+        'description': row[2],
+        'event_type': row[3],
+        'start_date': row[4],
+        'end_date': row[5],
+        'location': row[6],
+        'max_participants': row[7],
+        'registration_deadline': row[8],
+        'registration_count': row[9],
+        'attendance_count': row[10],
+        'avg_rating': row[11]
+    } for row in event_report_rows(conn, event_type, start_date, end_date)]
+
+
+def top_active_students(conn, limit=3):
+    return [{
+        'id': row[0],
+        'name': row[1],
+        'email': row[2],
+        'student_id': row[3],
+        'total_registrations': row[4],
+        'total_attendance': row[5],
+        'total_feedback': row[6],
+        'activity_score': row[4] + row[5] + row[6]
+    } for row in conn.execute(TOP_ACTIVE_STUDENTS_SQL, (limit,))]
+
+
+def admin_dashboard(conn, college_id):
+    return dashboard_payload(conn.execute(DASHBOARD_STATS_SQL, {'college_id': college_id}).fetchone(),
+                             conn.execute(RECENT_EVENTS_SQL, (college_id,)).fetchall(),
+                             conn.execute(TOP_EVENTS_SQL, (college_id,)).fetchall())
+
+
+def dashboard_payload(stats, recent_events, top_events):
+    """The dashboard's JSON from its three queries' rows, however they were run."""
+    total_events, total_students, total_registrations, total_attendance = stats
+    return {
+        'stats': {
+            'total_events': total_events,
+            'total_students': total_students,
+            'total_registrations': total_registrations,
+            'total_attendance': total_attendance
+        },
+        'recent_events': [{
+            'id': event[0],
+            'title': event[1],
+            'event_type': event[2],
+            'start_date': event[3],
+            'created_at': datetime.now().isoformat()
+        } for event in recent_events],
+        'top_events': [{'title': title, 'registrations': count} for title, count in top_events]
+    }
+
+
+def register_queries(registry):
+    # Listing every event (or student) is the point of these reports
+    query, _ = build_event_report_query()
+    registry.register('event_report', query, allow_scan=('e',))
+    query, _ = build_event_report_query('workshop', '2025-01-01', '2025-12-31')
+    registry.register('event_report_filtered', query, allow_scan=('e',))
+    registry.register('top_active_students', TOP_ACTIVE_STUDENTS_SQL, allow_scan=('s',))
+    registry.register('dashboard_stats', DASHBOARD_STATS_SQL.replace(':college_id', '?'))
+    registry.register('recent_events', RECENT_EVENTS_SQL)
+    registry.register('top_events', TOP_EVENTS_SQL)
@@ -0,0 +1,111 @@
+"""Run the API with the Flask dev server, under gunicorn, or as ASGI.
+
+    python serve.py                      Flask's dev server, as before (debug, one process)
+    python serve.py wsgi --workers 4     gunicorn, several processes of threaded workers
+    python serve.py asgi                 uvicorn: async read routes, see asgi.py
+
+``--backend full`` serves backend/app.py instead of the simple backend, in
+``dev`` or ``wsgi`` mode; its routes use the Flask-SQLAlchemy session, which
+has no async driver, so it has no ``asgi`` mode.
+
+Every process keeps its own live update listeners, dashboard cache and write
+batcher. With ``wsgi --workers N`` a write only reaches the /api/stream
+clients of the worker that served it, so keep dashboards that follow the
+stream on ``asgi`` (a single process) or on one worker. gunicorn isn't
+available on Windows; use ``asgi`` there.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+BACKENDS = {
+    # module, directory it is imported from, how to create its tables
+    'simple': ('simple_backend_no_qr', ROOT, 'simple_backend_no_qr.init_db()'),
+    'full': ('app', os.path.join(ROOT, 'backend'), 'app.app.app_context().push(); app.create_tables()'),
+}
+
+
+def default_workers():
+    if os.getenv('WEB_CONCURRENCY'):
+        return int(os.getenv('WEB_CONCURRENCY'))
+    return min(2 * (os.cpu_count() or 1) + 1, 8)
+
+
+def run_dev(backend, host, port):
+    module_name, path, _ = BACKENDS[backend]
+    sys.path.insert(0, path)
+    module = __import__(module_name)
+    if backend == 'full':
+        with module.app.app_context():
+            module.create_tables()
+        sys.modules['extensions'].job_queue.start()
+    else:
+        module.init_db()
+    module.app.run(debug=True, host=host, port=port)
+
+
+def run_wsgi(backend, host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    module_name, path, init = BACKENDS[backend]
+    # Create the tables in a throwaway process: importing the app here would
+    # start its background threads in the master, and forked workers don't
+    # inherit running threads
+    subprocess.run([sys.executable, '-c', f'import {module_name}; {init}'], cwd=path, check=True)
+
+    def post_worker_init(worker):
+        if backend == 'full':
+            # Each worker runs queued report jobs
+            sys.modules['extensions'].job_queue.start()
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', threads)
+            # Live update streams hold their connection open
+            self.cfg.set('timeout', 0)
+            self.cfg.set('chdir', path)
+            self.cfg.set('post_worker_init', post_worker_init)
+            self.cfg.set('accesslog', '-')
+
+        def load(self):
+            sys.path.insert(0, path)
+            return __import__(module_name).app
+
+    Server().run()
+
+
+def run_asgi(host, port):
+    import uvicorn
+
+    uvicorn.run('asgi:app', host=host, port=port, app_dir=ROOT, workers=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('mode', nargs='?', choices=('dev', 'wsgi', 'asgi'), default=os.getenv('SERVE_MODE', 'dev'))
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='simple')
+    parser.add_argument('--host', default=os.getenv('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '5000')))
+    parser.add_argument('--workers', type=int, default=default_workers(), help='wsgi processes')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WSGI_THREADS', '8')),
+                        help='request threads per wsgi process')
+    args = parser.parse_args()
+
+    if args.mode == 'asgi' and args.backend != 'simple':
+        parser.error('asgi mode serves the simple backend only; use wsgi for --backend full')
+    if args.mode == 'dev':
+        run_dev(args.backend, args.host, args.port)
+    elif args.mode == 'wsgi':
+        run_wsgi(args.backend, args.host, args.port, args.workers, args.threads)
+    else:
+        run_asgi(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,59 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, url_for
 from flask_cors import CORS
 import sqlite3
-import hashlib
 import json
+import os
 from datetime import datetime
-import qrcode
-import io
+from werkzeug.security import generate_password_hash
+from db_pool import ConnectionPool, get_db, init_app as init_db_pool
+from db_migrations import apply_migrations
+import reports
+from backend.query_audit import QueryRegistry, audit_query_plans
+from backend.request_metrics import RequestMetrics, TimedConnection, init_app as init_request_metrics
+from backend.ttl_cache import TTLCache
+from backend.json_provider import init_app as init_json_provider
+from backend.compression import Compressor, init_app as init_compression
+from backend.password_hasher import HashQueueFull, PasswordHasher
+from backend.jobs import JobQueue
+from backend.artifacts import ArtifactStore
+from backend import renderers
+from backend.exports import ExportError, export_response, parse_format
+from backend.pagination import (NEXT_CURSOR_HEADER, PaginationError, decode_cursor, encode_cursor,
+                                parse_fields, parse_limit, parse_order)
 import base64
 
 app = Flask(__name__)
-CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000", "file://"])
+CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000", "file://"],
+     expose_headers=[NEXT_CURSOR_HEADER])
+
+# One pool of pre-configured connections shared by every request; their
+# statements are timed into the request metrics
+db_pool = ConnectionPool(factory=TimedConnection)
+init_db_pool(app, db_pool)
+
+# Route and SQL timings, served at /metrics
+init_request_metrics(app, RequestMetrics(log=app.logger))
+
+# jsonify through orjson when it's installed; responses are compressed when
+# the client accepts it
+init_json_provider(app)
+compressor = Compressor()
+init_compression(app, compressor)
+
+# Admin dashboard payloads per college; write routes invalidate their college
+dashboard_cache = TTLCache(float(os.getenv('DASHBOARD_CACHE_TTL', '10')))
+
+# Password hashes are computed on worker threads; a full queue turns into a 503
+password_hasher = PasswordHasher()
+
+# Event QR codes are drawn by worker processes into the content-addressed
+# artifact store; the events row only keeps the key
+artifact_store = ArtifactStore(os.getenv('ARTIFACT_DIR', 'artifacts'))
+job_queue = JobQueue(os.getenv('JOBS_DATABASE', 'jobs.db'), artifact_store.root)
+
+# Route queries checked against the indexes at startup
+queries = QueryRegistry()
+reports.register_queries(queries)
 
 # Serve the frontend
 @app.route('/')
@@ -18,7 +62,7 @@ def serve_frontend():
 
 # Initialize SQLite database
 def init_db():
-    conn = sqlite3.connect('campus_events.db')
+    conn = db_pool.acquire()
     cursor = conn.cursor()
     
     # Create tables
@@ -120,40 +164,89 @@ def init_db():
         college_id = cursor.lastrowid
         
         cursor.execute("INSERT INTO admins (username, email, password_hash, name, college_id) VALUES (?, ?, ?, ?, ?)",
-                      ("admin", "admin@college.edu", hashlib.sha256("admin123".encode()).hexdigest(), "System Administrator", college_id))
+                      ("admin", "admin@college.edu", generate_password_hash("admin123"), "System Administrator", college_id))
     
     conn.commit()
-    conn.close()
+    
+    apply_migrations(conn)
+    move_legacy_qr_codes(conn)
+    audit_query_plans(conn, queries, app.logger)
+    db_pool.release(conn)
 
 # Helper functions
+UPDATE_ADMIN_HASH_SQL = queries.register('update_admin_hash', "UPDATE admins SET password_hash = ? WHERE id = ?")
+UPDATE_STUDENT_HASH_SQL = queries.register('update_student_hash', "UPDATE students SET password_hash = ? WHERE id = ?")
+
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return password_hasher.hash(password)
+
+def verify_password(password, hashed, rehash_sql, user_id):
+    # Accounts from before salted hashes still carry a bare SHA-256 digest, and
+    # imported ones a cheaper PBKDF2 hash; swap either for a full-strength hash
+    # the first time the right password is given
+    matches, needs_rehash = password_hasher.verify(hashed, password)
+    if matches and needs_rehash:
+        conn = get_db()
+        conn.execute(rehash_sql, (hash_password(password), user_id))
+        conn.commit()
+    return matches
 
-def verify_password(password, hashed):
-    return hash_password(password) == hashed
+UPDATE_EVENT_QR_SQL = queries.register('update_event_qr', "UPDATE events SET qr_code = ? WHERE id = ?")
 
-def generate_qr_code(event_title):
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(f"event_{event_title}_{datetime.now().strftime('%Y%m%d%H%M%S')}")
-    qr.make(fit=True)
-    qr_img = qr.make_image(fill_color="black", back_color="white")
-    
-    buffer = io.BytesIO()
-    qr_img.save(buffer, format='PNG')
-    return base64.b64encode(buffer.getvalue()).decode()
+def store_event_qr(job):
+    # Runs on the job dispatcher thread, outside any request
+    conn = db_pool.acquire()
+    try:
+        conn.execute(UPDATE_EVENT_QR_SQL, (job['result']['key'], job['payload']['event_id']))
+        conn.commit()
+    finally:
+        db_pool.release(conn)
+
+job_queue.register('event_qr', renderers.render_event_qr, on_complete=store_event_qr)
+
+def generate_qr_code(event_id, event_title):
+    data = f"event_{event_title}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    key = ArtifactStore.key_for('event_qr', renderers.QR_TEMPLATE_VERSION, data=data)
+    return job_queue.enqueue('event_qr', {
+        'event_id': event_id,
+        'data': data,
+        'artifact_key': key,
+        'artifact_path': artifact_store.relative_path(key, 'png')
+    }, dedupe_key=f'event_qr:{event_id}')
+
+LEGACY_QR_SQL = queries.register('legacy_qr', "SELECT id, qr_code FROM events WHERE length(qr_code) > 64", allow_scan=('events',))
+
+def move_legacy_qr_codes(conn):
+    # QR codes used to be stored inline as base64 PNGs
+    rows = conn.execute(LEGACY_QR_SQL).fetchall()
+    for event_id, qr_code in rows:
+        key = artifact_store.put_content(base64.b64decode(qr_code), 'png')
+        conn.execute(UPDATE_EVENT_QR_SQL, (key, event_id))
+    conn.commit()
 
 # API Routes
+@app.errorhandler(HashQueueFull)
+def hash_queue_full(error):
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+@app.route('/api/system/password-hashing', methods=['GET'])
+def password_hashing_stats():
+    return jsonify(password_hasher.stats())
+
+ADMIN_BY_USERNAME_SQL = queries.register('admin_by_username', "SELECT * FROM admins WHERE username = ?")
+
 @app.route('/api/auth/admin/login', methods=['POST'])
 def admin_login():
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute("SELECT * FROM admins WHERE username = ?", (data['username'],))
+    cursor.execute(ADMIN_BY_USERNAME_SQL, (data['username'],))
     admin = cursor.fetchone()
     
-    if admin and verify_password(data['password'], admin[3]):
-        conn.close()
+    if admin and verify_password(data['password'], admin[3], UPDATE_ADMIN_HASH_SQL, admin[0]):
         return jsonify({
             'access_token': 'admin_token_' + str(admin[0]),
             'user': {
@@ -165,20 +258,20 @@ def admin_login():
             }
         })
     
-    conn.close()
     return jsonify({'error': 'Invalid credentials'}), 401
 
+STUDENT_BY_EMAIL_SQL = queries.register('student_by_email', "SELECT * FROM students WHERE email = ?")
+
 @app.route('/api/auth/student/login', methods=['POST'])
 def student_login():
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute("SELECT * FROM students WHERE email = ?", (data['email'],))
+    cursor.execute(STUDENT_BY_EMAIL_SQL, (data['email'],))
     student = cursor.fetchone()
     
-    if student and verify_password(data['password'], student[3]):
-        conn.close()
+    if student and verify_password(data['password'], student[3], UPDATE_STUDENT_HASH_SQL, student[0]):
         return jsonify({
             'access_token': 'student_token_' + str(student[0]),
             'user': {
@@ -191,69 +284,190 @@ def student_login():
             }
         })
     
-    conn.close()
     return jsonify({'error': 'Invalid credentials'}), 401
 
 @app.route('/api/auth/student/register', methods=['POST'])
 def student_register():
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
         cursor.execute("INSERT INTO students (student_id, email, password_hash, name, phone, college_id) VALUES (?, ?, ?, ?, ?, ?)",
                       (data['student_id'], data['email'], hash_password(data['password']), data['name'], data.get('phone', ''), 1))
         conn.commit()
-        conn.close()
+        dashboard_cache.invalidate(1)
         return jsonify({'message': 'Student registered successfully'}), 201
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'error': 'Email or Student ID already exists'}), 400
 
+EVENT_LIST_COLUMNS = ('id', 'title', 'description', 'event_type', 'start_date', 'end_date',
+                      'location', 'max_participants', 'registration_deadline', 'qr_code')
+EVENT_LIST_FIELDS = EVENT_LIST_COLUMNS + ('created_at',)
+DEFAULT_EVENT_LIST_FIELDS = list(EVENT_LIST_FIELDS)
+
+# get_events builds its SQL from the filters; these are its two shapes
+queries.register('events_list', "SELECT id, title, start_date FROM events ORDER BY start_date DESC, id DESC")
+queries.register('events_page', """
+    SELECT id, title, start_date FROM events
+    WHERE (start_date, id) < (?, ?)
+    ORDER BY start_date DESC, id DESC LIMIT ?
+""")
+
+@app.errorhandler(PaginationError)
+@app.errorhandler(ExportError)
+def bad_query_parameter(error):
+    return jsonify({'error': str(error)}), 400
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
-    conn = sqlite3.connect('campus_events.db')
+    fields = parse_fields(request.args.get('fields'), EVENT_LIST_FIELDS, DEFAULT_EVENT_LIST_FIELDS)
+    limit = parse_limit(request.args.get('limit'))
+    order = parse_order(request.args.get('order'), default='desc')
+    after = request.args.get('cursor')
+    
+    # Only read the columns that will be sent; start_date is the cursor key
+    columns = [field for field in fields if field in EVENT_LIST_COLUMNS]
+    if 'start_date' not in columns:
+        columns.append('start_date')
+    
+    conditions = []
+    params = []
+    
+    event_type = request.args.get('event_type')
+    if event_type and event_type != 'all':
+        conditions.append("event_type = ?")
+        params.append(event_type)
+    
+    if request.args.get('start_date'):
+        conditions.append("start_date >= ?")
+        params.append(request.args['start_date'])
+    
+    if request.args.get('end_date'):
+        conditions.append("end_date <= ?")
+        params.append(request.args['end_date'])
+    
+    when = request.args.get('when')
+    if when == 'upcoming':
+        conditions.append("end_date >= ?")
+        params.append(datetime.now().isoformat())
+    elif when == 'past':
+        conditions.append("end_date < ?")
+        params.append(datetime.now().isoformat())
+    elif when:
+        raise PaginationError('when must be upcoming or past')
+    
+    # Keyset pagination on (start_date, id)
+    direction = 'ASC' if order == 'asc' else 'DESC'
+    if after:
+        last_start, last_id = decode_cursor(after, 2)
+        # start_date is stored as text; the values are bound as they are
+        if not isinstance(last_start, str):
+            raise PaginationError('Invalid cursor')
+        try:
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+        conditions.append("(start_date, id) > (?, ?)" if order == 'asc' else "(start_date, id) < (?, ?)")
+        params.extend([last_start, last_id])
+    
+    query = f"SELECT {', '.join(columns)} FROM events"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY start_date {direction}, id {direction}"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    
+    conn = get_db()
     cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
     
-    cursor.execute("SELECT * FROM events ORDER BY start_date DESC")
-    events = cursor.fetchall()
+    has_more = bool(limit) and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
     
     result = []
-    for event in events:
-        result.append({
-            'id': event[0],
-            'title': event[1],
-            'description': event[2],
-            'event_type': event[3],
-            'start_date': event[4],
-            'end_date': event[5],
-            'location': event[6],
-            'max_participants': event[7],
-            'registration_deadline': event[8],
-            'created_at': event[11] if len(event) > 11 else None
-        })
-    
-    conn.close()
-    return jsonify(result)
+    for row in rows:
+        event = dict(zip(columns, row))
+        event['created_at'] = datetime.now().isoformat()
+        if event.get('qr_code'):
+            # Only the artifact key is stored; clients get the image's URL
+            event['qr_code'] = url_for('get_event_qr', event_id=event['id'])
+        result.append({field: event[field] for field in fields})
+    
+    response = jsonify(result)
+    if has_more:
+        last = dict(zip(columns, rows[-1]))
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last['start_date'], last['id'])
+    return response
 
 @app.route('/api/events', methods=['POST'])
 def create_event():
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    qr_code = generate_qr_code(data['title'])
-    
-    cursor.execute("INSERT INTO events (title, description, event_type, start_date, end_date, location, max_participants, registration_deadline, college_id, created_by, qr_code) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                  (data['title'], data['description'], data['event_type'], data['start_date'], data['end_date'], data['location'], data['max_participants'], data.get('registration_deadline'), 1, 1, qr_code))
+    cursor.execute("INSERT INTO events (title, description, event_type, start_date, end_date, location, max_participants, registration_deadline, college_id, created_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                  (data['title'], data['description'], data['event_type'], data['start_date'], data['end_date'], data['location'], data['max_participants'], data.get('registration_deadline'), 1, 1))
     
     conn.commit()
-    conn.close()
-    return jsonify({'message': 'Event created successfully'}), 201
+    dashboard_cache.invalidate(1)
+    
+    # qr_code stays empty until the worker has drawn it
+    job = generate_qr_code(cursor.lastrowid, data['title'])
+    return jsonify({'message': 'Event created successfully', 'event_id': cursor.lastrowid, 'qr_job_id': job['id']}), 201
+
+def job_status(job):
+    status = {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'status_url': url_for('get_job', job_id=job['id'])
+    }
+    if job['status'] == 'done':
+        status['result_url'] = url_for('get_job_result', job_id=job['id'])
+    if job['error']:
+        status['error'] = job['error']
+    return status
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    path = job_queue.result_path(job)
+    if not path or not os.path.exists(path):
+        return jsonify({'error': 'Job has not finished', 'status': job['status']}), 409
+    
+    return artifact_store.send(job['result']['key'], os.path.splitext(path)[1][1:],
+                               job['result']['content_type'], download_name=job['result']['filename'])
+
+EVENT_QR_SQL = queries.register('event_qr', "SELECT qr_code FROM events WHERE id = ?")
+
+@app.route('/api/events/<int:event_id>/qr', methods=['GET'])
+def get_event_qr(event_id):
+    row = get_db().execute(EVENT_QR_SQL, (event_id,)).fetchone()
+    if not row:
+        return jsonify({'error': 'Event not found'}), 404
+    if not row[0] or not artifact_store.exists(row[0], 'png'):
+        return jsonify({'error': 'QR code is not ready yet'}), 404
+    
+    return artifact_store.send(row[0], 'png', 'image/png')
 
 @app.route('/api/events/<int:event_id>/register', methods=['POST'])
 def register_for_event(event_id):
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # For demo purposes, using student_id = 1
@@ -263,15 +477,14 @@ def register_for_event(event_id):
         cursor.execute("INSERT INTO registrations (student_id, event_id, status) VALUES (?, ?, ?)",
                       (student_id, event_id, 'registered'))
         conn.commit()
-        conn.close()
+        dashboard_cache.invalidate(1)
         return jsonify({'message': 'Registered successfully'}), 201
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'error': 'Already registered for this event'}), 400
 
 @app.route('/api/events/<int:event_id>/checkin', methods=['POST'])
 def check_in_event(event_id):
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     student_id = 1  # For demo
@@ -280,16 +493,15 @@ def check_in_event(event_id):
         cursor.execute("INSERT INTO attendance (student_id, event_id) VALUES (?, ?)",
                       (student_id, event_id))
         conn.commit()
-        conn.close()
+        dashboard_cache.invalidate(1)
         return jsonify({'message': 'Checked in successfully'}), 201
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'error': 'Already checked in'}), 400
 
 @app.route('/api/events/<int:event_id>/feedback', methods=['POST'])
 def submit_feedback(event_id):
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     student_id = 1  # For demo
@@ -298,139 +510,108 @@ def submit_feedback(event_id):
         cursor.execute("INSERT INTO feedback (student_id, event_id, rating, comment) VALUES (?, ?, ?, ?)",
                       (student_id, event_id, data['rating'], data.get('comment', '')))
         conn.commit()
-        conn.close()
         return jsonify({'message': 'Feedback submitted successfully'}), 201
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'error': 'Feedback already submitted'}), 400
 
 @app.route('/api/admin/dashboard', methods=['GET'])
 def admin_dashboard():
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
-    
-    # Get stats
-    cursor.execute("SELECT COUNT(*) FROM events")
-    total_events = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM students")
-    total_students = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM registrations")
-    total_registrations = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM attendance")
-    total_attendance = cursor.fetchone()[0]
-    
-    # Get recent events
-    cursor.execute("SELECT * FROM events ORDER BY id DESC LIMIT 5")
-    recent_events = cursor.fetchall()
-    
-    # Get top events
-    cursor.execute("""
-        SELECT e.title, COUNT(r.id) as registrations 
-        FROM events e 
-        LEFT JOIN registrations r ON e.id = r.event_id 
-        GROUP BY e.id 
-        ORDER BY registrations DESC 
-        LIMIT 5
-    """)
-    top_events = cursor.fetchall()
-    
-    conn.close()
-    
-    return jsonify({
-        'stats': {
-            'total_events': total_events,
-            'total_students': total_students,
-            'total_registrations': total_registrations,
-            'total_attendance': total_attendance
-        },
-        'recent_events': [{
-            'id': event[0],
-            'title': event[1],
-            'event_type': event[3],
-            'start_date': event[4],
-            'created_at': datetime.now().isoformat()
-        } for event in recent_events],
-        'top_events': [{'title': title, 'registrations': count} for title, count in top_events]
-    })
+    college_id = 1  # For demo
+    return jsonify(dashboard_cache.get_or_compute(
+        college_id, lambda: reports.admin_dashboard(get_db(), college_id)))
+
+STUDENT_REGISTRATIONS_SQL = queries.register('student_registrations', """
+    SELECT r.event_id, e.title, e.event_type, e.start_date, r.status, r.registered_at
+    FROM registrations r 
+    JOIN events e ON r.event_id = e.id 
+    WHERE r.student_id = ?
+""")
+STUDENT_ATTENDANCE_SQL = queries.register('student_attendance', """
+    SELECT a.event_id, e.title, a.checked_in_at
+    FROM attendance a 
+    JOIN events e ON a.event_id = e.id 
+    WHERE a.student_id = ?
+""")
+STUDENT_FEEDBACK_SQL = queries.register('student_feedback', """
+    SELECT f.event_id, e.title, f.rating, f.comment, f.submitted_at
+    FROM feedback f 
+    JOIN events e ON f.event_id = e.id 
+    WHERE f.student_id = ?
+""")
 
 @app.route('/api/student/dashboard', methods=['GET'])
 def student_dashboard():
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     student_id = 1  # For demo
     
     # Get registrations
-    cursor.execute("""
-        SELECT r.*, e.title, e.event_type, e.start_date 
-        FROM registrations r 
-        JOIN events e ON r.event_id = e.id 
-        WHERE r.student_id = ?
-    """, (student_id,))
+    cursor.execute(STUDENT_REGISTRATIONS_SQL, (student_id,))
     registrations = cursor.fetchall()
     
     # Get attendance
-    cursor.execute("""
-        SELECT a.*, e.title 
-        FROM attendance a 
-        JOIN events e ON a.event_id = e.id 
-        WHERE a.student_id = ?
-    """, (student_id,))
+    cursor.execute(STUDENT_ATTENDANCE_SQL, (student_id,))
     attendance = cursor.fetchall()
     
     # Get feedback
-    cursor.execute("""
-        SELECT f.*, e.title 
-        FROM feedback f 
-        JOIN events e ON f.event_id = e.id 
-        WHERE f.student_id = ?
-    """, (student_id,))
+    cursor.execute(STUDENT_FEEDBACK_SQL, (student_id,))
     feedback = cursor.fetchall()
     
-    conn.close()
-    
     return jsonify({
         'registrations': [{
-            'event_id': reg[2],
-            'title': reg[4],
-            'event_type': reg[5],
-            'start_date': reg[6],
+            'event_id': reg[0],
+            'title': reg[1],
+            'event_type': reg[2],
+            'start_date': reg[3],
             'status': reg[4],
-            'registered_at': reg[3]
+            'registered_at': reg[5]
         } for reg in registrations],
         'attendance': [{
-            'event_id': att[2],
-            'title': att[4],
-            'checked_in_at': att[3]
+            'event_id': att[0],
+            'title': att[1],
+            'checked_in_at': att[2]
         } for att in attendance],
         'feedback': [{
-            'event_id': fb[2],
-            'title': fb[4],
-            'rating': fb[3],
-            'comment': fb[4],
-            'submitted_at': fb[5]
+            'event_id': fb[0],
+            'title': fb[1],
+            'rating': fb[2],
+            'comment': fb[3],
+            'submitted_at': fb[4]
         } for fb in feedback]
     })
 
+# Served from student_stats, which triggers keep in step with attendance;
+# the (college_id, attendance_count) index yields rows already in rank order
+LEADERBOARD_SQL = queries.register('leaderboard', """
+    SELECT s.name, s.student_id, ss.attendance_count
+    FROM student_stats ss
+    JOIN students s ON s.id = ss.student_id
+    WHERE ss.college_id = ? AND ss.attendance_count > 0
+    ORDER BY ss.attendance_count DESC
+    LIMIT ?
+""")
+STUDENT_TALLY_SQL = queries.register('student_tally', """
+    SELECT s.college_id, COALESCE(ss.attendance_count, 0)
+    FROM students s
+    LEFT JOIN student_stats ss ON ss.student_id = s.id
+    WHERE s.id = ?
+""")
+STUDENTS_AHEAD_SQL = queries.register('students_ahead', """
+    SELECT COUNT(*) FROM student_stats
+    WHERE college_id = ? AND attendance_count > ?
+""")
+
 @app.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
+    college_id = 1  # For demo
+    limit = min(request.args.get('limit', 10, type=int), 100)
     
-    cursor.execute("""
-        SELECT s.name, s.student_id, COUNT(a.id) as attendance_count
-        FROM students s
-        LEFT JOIN attendance a ON s.id = a.student_id
-        GROUP BY s.id
-        ORDER BY attendance_count DESC
-        LIMIT 10
-    """)
+    conn = get_db()
+    cursor = conn.cursor()
     
+    cursor.execute(LEADERBOARD_SQL, (college_id, limit))
     leaderboard = cursor.fetchall()
-    conn.close()
     
     return jsonify([{
         'name': name,
@@ -438,8 +619,44 @@ def get_leaderboard():
         'attendance_count': count
     } for name, student_id, count in leaderboard])
 
+LEADERBOARD_EXPORT_HEADER = ('Name', 'Student ID', 'Attendance')
+
+@app.route('/api/leaderboard/export', methods=['GET'])
+def export_leaderboard():
+    college_id = 1  # For demo
+    fmt = parse_format(request.args.get('format'))
+    
+    # LIMIT -1: the whole college, not just the top of the board
+    rows = get_db().execute(LEADERBOARD_SQL, (college_id, -1))
+    return export_response(fmt, 'leaderboard', LEADERBOARD_EXPORT_HEADER, rows, 'Leaderboard')
+
+@app.route('/api/leaderboard/me', methods=['GET'])
+def get_my_rank():
+    student_id = request.args.get('student_id', 1, type=int)  # Demo student by default
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    cursor.execute(STUDENT_TALLY_SQL, (student_id,))
+    student = cursor.fetchone()
+    if not student:
+        return jsonify({'error': 'Student not found'}), 404
+    
+    college_id, attendance_count = student
+    # Rank = 1 + students with strictly more check-ins (ties share a rank)
+    cursor.execute(STUDENTS_AHEAD_SQL, (college_id, attendance_count))
+    ahead = cursor.fetchone()[0]
+    
+    return jsonify({
+        'student_id': student_id,
+        'attendance_count': attendance_count,
+        'rank': ahead + 1
+    })
+
 if __name__ == '__main__':
     init_db()
+    # Pick up jobs left queued or interrupted by the previous run
+    job_queue.start()
     print("🚀 Campus Event Management Backend Starting...")
     print("📡 Backend API: http://localhost:5000")
     print("🔑 Admin Login: admin / admin123")
@@ -1,12 +1,86 @@
+import click
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import sqlite3
-import hashlib
 import json
+import os
 from datetime import datetime
+from werkzeug.security import generate_password_hash
+from db_pool import ConnectionPool, get_db, init_app as init_db_pool
+from db_migrations import apply_migrations
+from write_batcher import WRITE_BATCHING, WriteBatcher, init_app as init_write_batcher, write
+import reports
+from backend.query_audit import QueryRegistry, audit_query_plans
+from backend.request_metrics import RequestMetrics, TimedConnection, init_app as init_request_metrics
+from backend.ttl_cache import TTLCache
+from backend.response_cache import ResponseCache, cached_response
+from backend.json_provider import init_app as init_json_provider
+from backend.compression import Compressor, init_app as init_compression
+from backend.password_hasher import HashQueueFull, PasswordHasher, upgrade_weak_hashes
+from backend.exports import ExportError, export_response, parse_format
+from backend.event_search import SearchError, match_expression, search_sql
+from backend.schedule_conflicts import (EVENT_COLUMNS, ScheduleError, overlap_params, overlap_sql, pairs,
+                                        registered_condition, stored_overlap_params, student_conflicts_sql,
+                                        venue_conflicts_sql)
+from backend.checkin_tokens import CheckinTokenSigner, InvalidCheckinToken, expiry_isoformat, token_expiry
+from backend.live_updates import LiveUpdates, event_stream
+from backend.checkins import CheckinBatchError, parse_checkins, resolve_checkins, student_ids, summarize
+from backend.student_import import (ImportFileError, ImportUnavailable, SQLiteStudentStore, StudentImporter,
+                                    read_records)
+from backend.pagination import (NEXT_CURSOR_HEADER, PaginationError, decode_cursor, encode_cursor,
+                                parse_fields, parse_limit, parse_order)
 
 app = Flask(__name__)
-CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000", "file://"])
+CORS_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000", "file://"]
+CORS(app, origins=CORS_ORIGINS, expose_headers=[NEXT_CURSOR_HEADER, 'ETag'])
+
+# One pool of pre-configured connections shared by every request; their
+# statements are timed into the request metrics
+db_pool = ConnectionPool(factory=TimedConnection)
+init_db_pool(app, db_pool)
+
+# Route and SQL timings, served at /metrics
+init_request_metrics(app, RequestMetrics(log=app.logger))
+
+# jsonify through orjson when it's installed; responses are compressed when
+# the client accepts it
+init_json_provider(app)
+compressor = Compressor()
+init_compression(app, compressor)
+
+# With WRITE_BATCHING=1, single-row writes from concurrent requests are
+# committed together by one writer thread
+init_write_batcher(app, WriteBatcher(db_pool.open_connection) if WRITE_BATCHING else None)
+
+# Admin dashboard payloads per college; write routes invalidate their college
+dashboard_cache = TTLCache(float(os.getenv('DASHBOARD_CACHE_TTL', '10')))
+
+# Rendered JSON of the busiest GET routes, revalidated by ETag
+response_cache = ResponseCache()
+
+def invalidate_caches(college_id):
+    dashboard_cache.invalidate(college_id)
+    response_cache.bump(college_id)
+
+def demo_college():
+    # Every caller sees the demo college's data
+    return (1,)
+
+# Password hashes are computed on worker threads; a full queue turns into a 503
+password_hasher = PasswordHasher()
+
+# Seat, check-in and feedback deltas pushed to /api/stream
+live_updates = LiveUpdates()
+
+# Registration QR codes carry signed check-in tokens, verified without a lookup
+checkin_tokens = CheckinTokenSigner(os.getenv('CHECKIN_TOKEN_SECRET', 'dev-checkin-token-secret'))
+
+# Bulk student imports hash passwords on a pool of worker processes
+student_importer = StudentImporter()
+
+# Route queries checked against the indexes at startup
+queries = QueryRegistry()
+reports.register_queries(queries)
 
 # Serve the frontend
 @app.route('/')
@@ -15,7 +89,7 @@ def serve_frontend():
 
 # Initialize SQLite database
 def init_db():
-    conn = sqlite3.connect('campus_events.db')
+    conn = db_pool.acquire()
     cursor = conn.cursor()
     
     # Create tables
@@ -117,34 +191,59 @@ def init_db():
         college_id = cursor.lastrowid
         
         cursor.execute("INSERT INTO admins (username, email, password_hash, name, college_id) VALUES (?, ?, ?, ?, ?)",
-                      ("admin", "admin@college.edu", hashlib.sha256("admin123".encode()).hexdigest(), "System Administrator", college_id))
+                      ("admin", "admin@college.edu", generate_password_hash("admin123"), "System Administrator", college_id))
     
     conn.commit()
-    conn.close()
+    
+    apply_migrations(conn)
+    audit_query_plans(conn, queries, app.logger)
+    db_pool.release(conn)
 
 # Helper functions
+UPDATE_ADMIN_HASH_SQL = queries.register('update_admin_hash', "UPDATE admins SET password_hash = ? WHERE id = ?")
+UPDATE_STUDENT_HASH_SQL = queries.register('update_student_hash', "UPDATE students SET password_hash = ? WHERE id = ?")
+
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return password_hasher.hash(password)
 
-def verify_password(password, hashed):
-    return hash_password(password) == hashed
+def verify_password(password, hashed, rehash_sql, user_id):
+    # Accounts from before salted hashes still carry a bare SHA-256 digest, and
+    # imported ones a cheaper PBKDF2 hash; swap either for a full-strength hash
+    # the first time the right password is given
+    matches, needs_rehash = password_hasher.verify(hashed, password)
+    if matches and needs_rehash:
+        conn = get_db()
+        conn.execute(rehash_sql, (hash_password(password), user_id))
+        conn.commit()
+    return matches
 
 def generate_qr_code(event_title):
     # Simple QR code simulation without PIL dependency
     return f"QR_CODE_{event_title}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
 
 # API Routes
+@app.errorhandler(HashQueueFull)
+def hash_queue_full(error):
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+@app.route('/api/system/password-hashing', methods=['GET'])
+def password_hashing_stats():
+    return jsonify(password_hasher.stats())
+
+ADMIN_BY_USERNAME_SQL = queries.register('admin_by_username', "SELECT * FROM admins WHERE username = ?")
+
 @app.route('/api/auth/admin/login', methods=['POST'])
 def admin_login():
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute("SELECT * FROM admins WHERE username = ?", (data['username'],))
+    cursor.execute(ADMIN_BY_USERNAME_SQL, (data['username'],))
     admin = cursor.fetchone()
     
-    if admin and verify_password(data['password'], admin[3]):
-        conn.close()
+    if admin and verify_password(data['password'], admin[3], UPDATE_ADMIN_HASH_SQL, admin[0]):
         return jsonify({
             'access_token': 'admin_token_' + str(admin[0]),
             'user': {
@@ -156,20 +255,20 @@ def admin_login():
             }
         })
     
-    conn.close()
     return jsonify({'error': 'Invalid credentials'}), 401
 
+STUDENT_BY_EMAIL_SQL = queries.register('student_by_email', "SELECT * FROM students WHERE email = ?")
+
 @app.route('/api/auth/student/login', methods=['POST'])
 def student_login():
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute("SELECT * FROM students WHERE email = ?", (data['email'],))
+    cursor.execute(STUDENT_BY_EMAIL_SQL, (data['email'],))
     student = cursor.fetchone()
     
-    if student and verify_password(data['password'], student[3]):
-        conn.close()
+    if student and verify_password(data['password'], student[3], UPDATE_STUDENT_HASH_SQL, student[0]):
         return jsonify({
             'access_token': 'student_token_' + str(student[0]),
             'user': {
@@ -182,357 +281,571 @@ def student_login():
             }
         })
     
-    conn.close()
     return jsonify({'error': 'Invalid credentials'}), 401
 
 @app.route('/api/auth/student/register', methods=['POST'])
 def student_register():
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
     
     try:
-        cursor.execute("INSERT INTO students (student_id, email, password_hash, name, phone, college_id) VALUES (?, ?, ?, ?, ?, ?)",
-                      (data['student_id'], data['email'], hash_password(data['password']), data['name'], data.get('phone', ''), 1))
-        conn.commit()
-        conn.close()
+        write("INSERT INTO students (student_id, email, password_hash, name, phone, college_id) VALUES (?, ?, ?, ?, ?, ?)",
+              (data['student_id'], data['email'], hash_password(data['password']), data['name'], data.get('phone', ''), 1))
+        invalidate_caches(1)
         return jsonify({'message': 'Student registered successfully'}), 201
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'error': 'Email or Student ID already exists'}), 400
 
-@app.route('/api/events', methods=['GET'])
-def get_events():
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
+@app.errorhandler(ImportFileError)
+def import_file_error(error):
+    return jsonify({'error': str(error)}), 400
+
+@app.errorhandler(ImportUnavailable)
+def import_unavailable(error):
+    response = jsonify({'error': str(error), 'created': error.created})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+@app.route('/api/admin/students/import', methods=['POST'])
+def import_students():
+    college_id = 1  # For demo
+    upload = request.files.get('file')
+    if not upload:
+        raise ImportFileError('Attach the CSV or XLSX file as "file"')
+    
+    report = student_importer.run(read_records(upload.stream, upload.filename),
+                                  SQLiteStudentStore(get_db(), college_id))
+    if report['created']:
+        invalidate_caches(college_id)
+    
+    return jsonify(report), 201 if report['created'] else 200
+
+@app.cli.command('upgrade-import-hashes')
+@click.option('--dry-run', is_flag=True, help='Only count the accounts still on an import hash.')
+def upgrade_import_hashes(dry_run):
+    """Bring imported accounts that never signed in up to full-strength hashes."""
+    found = upgrade_weak_hashes(SQLiteStudentStore(get_db(), None), dry_run=dry_run)
+    click.echo(f"{found} imported account(s) on a weak hash{'' if dry_run else ', upgraded'}")
+
+EVENT_LIST_COLUMNS = ('id', 'title', 'description', 'event_type', 'start_date', 'end_date',
+                      'location', 'max_participants', 'registration_deadline', 'qr_code')
+EVENT_LIST_FIELDS = EVENT_LIST_COLUMNS + ('created_at',)
+# qr_code is only sent when asked for with ?fields=
+DEFAULT_EVENT_LIST_FIELDS = [field for field in EVENT_LIST_FIELDS if field != 'qr_code']
+
+# get_events builds its SQL from the filters; these are its two shapes
+queries.register('events_list', "SELECT id, title, start_date FROM events ORDER BY start_date DESC, id DESC")
+queries.register('events_page', """
+    SELECT id, title, start_date FROM events
+    WHERE (start_date, id) < (?, ?)
+    ORDER BY start_date DESC, id DESC LIMIT ?
+""")
+
+@app.errorhandler(PaginationError)
+@app.errorhandler(ExportError)
+@app.errorhandler(SearchError)
+@app.errorhandler(ScheduleError)
+def bad_query_parameter(error):
+    return jsonify({'error': str(error)}), 400
+
+def events_query(args):
+    """The SQL and parameters for a page of GET /api/events with query ``args``,
+    and the fields, columns and limit to shape its rows with ``events_page``."""
+    fields = parse_fields(args.get('fields'), EVENT_LIST_FIELDS, DEFAULT_EVENT_LIST_FIELDS)
+    limit = parse_limit(args.get('limit'))
+    order = parse_order(args.get('order'), default='desc')
+    after = args.get('cursor')
+    
+    # Only read the columns that will be sent; start_date is the cursor key
+    columns = [field for field in fields if field in EVENT_LIST_COLUMNS]
+    if 'start_date' not in columns:
+        columns.append('start_date')
     
-    cursor.execute("SELECT * FROM events ORDER BY start_date DESC")
-    events = cursor.fetchall()
+    conditions = []
+    params = []
+    
+    event_type = args.get('event_type')
+    if event_type and event_type != 'all':
+        conditions.append("event_type = ?")
+        params.append(event_type)
+    
+    if args.get('start_date'):
+        conditions.append("start_date >= ?")
+        params.append(args['start_date'])
+    
+    if args.get('end_date'):
+        conditions.append("end_date <= ?")
+        params.append(args['end_date'])
+    
+    when = args.get('when')
+    if when == 'upcoming':
+        conditions.append("end_date >= ?")
+        params.append(datetime.now().isoformat())
+    elif when == 'past':
+        conditions.append("end_date < ?")
+        params.append(datetime.now().isoformat())
+    elif when:
+        raise PaginationError('when must be upcoming or past')
+    
+    # Keyset pagination on (start_date, id)
+    direction = 'ASC' if order == 'asc' else 'DESC'
+    if after:
+        last_start, last_id = decode_cursor(after, 2)
+        # start_date is stored as text; the values are bound as they are
+        if not isinstance(last_start, str):
+            raise PaginationError('Invalid cursor')
+        try:
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+        conditions.append("(start_date, id) > (?, ?)" if order == 'asc' else "(start_date, id) < (?, ?)")
+        params.extend([last_start, last_id])
+    
+    query = f"SELECT {', '.join(columns)} FROM events"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY start_date {direction}, id {direction}"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    
+    return query, params, (fields, columns, limit)
+
+def events_page(rows, shape):
+    """The JSON list for ``events_query``'s rows, and the next page's cursor or None."""
+    fields, columns, limit = shape
+    has_more = bool(limit) and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
     
     result = []
-    for event in events:
-        result.append({
-            'id': event[0],
-            'title': event[1],
-            'description': event[2],
-            'event_type': event[3],
-            'start_date': event[4],
-            'end_date': event[5],
-            'location': event[6],
-            'max_participants': event[7],
-            'registration_deadline': event[8],
-            'created_at': datetime.now().isoformat()
-        })
+    for row in rows:
+        event = dict(zip(columns, row))
+        event['created_at'] = datetime.now().isoformat()
+        result.append({field: event[field] for field in fields})
+    
+    if not has_more:
+        return result, None
+    last = dict(zip(columns, rows[-1]))
+    return result, encode_cursor(last['start_date'], last['id'])
+
+@app.route('/api/events', methods=['GET'])
+@cached_response(response_cache, demo_college)
+def get_events():
+    query, params, shape = events_query(request.args)
+    result, next_cursor = events_page(get_db().execute(query, params).fetchall(), shape)
     
-    conn.close()
-    return jsonify(result)
+    response = jsonify(result)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+# Ranked search over events_fts (see db_migrations), one college at a time
+SEARCH_COLUMNS = ('id', 'title', 'description', 'event_type', 'start_date', 'end_date',
+                  'location', 'max_participants')
+EVENT_SEARCH_SQL = queries.register('event_search', search_sql(
+    'events', 'events_fts', SEARCH_COLUMNS, ['e.college_id = ?']), allow_scan=('events_fts',))
+EVENT_SEARCH_PAGE_SQL = queries.register('event_search_page', search_sql(
+    'events', 'events_fts', SEARCH_COLUMNS, ['e.college_id = ?'], after=True), allow_scan=('events_fts',))
+
+@app.route('/api/events/search', methods=['GET'])
+def search_events():
+    college_id = 1  # For demo
+    match = match_expression(request.args.get('q'))
+    limit = parse_limit(request.args.get('limit'), default=20, maximum=100)
+    after = request.args.get('cursor')
+    
+    if after:
+        last_score, last_id = decode_cursor(after, 2)
+        try:
+            last_score, last_id = float(last_score), int(last_id)
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+        rows = get_db().execute(EVENT_SEARCH_PAGE_SQL, (match, college_id, last_score, last_id, limit + 1)).fetchall()
+    else:
+        rows = get_db().execute(EVENT_SEARCH_SQL, (match, college_id, limit + 1)).fetchall()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    response = jsonify([dict(zip(SEARCH_COLUMNS + ('score',), row)) for row in rows])
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][-1], rows[-1][0])
+    return response
+
+# Overlap checks on the event_spans interval index (see db_migrations)
+VENUE_OVERLAP_SQL = queries.register('venue_overlap', overlap_sql(
+    'events', 'event_spans', conditions=['e.location = ?', 'e.id != ?']), allow_scan=('event_spans',))
+STUDENT_OVERLAP_SQL = queries.register('student_overlap', overlap_sql(
+    'events', 'event_spans', conditions=[registered_condition('registrations'), 'e.id != ?']), allow_scan=('event_spans',))
+VENUE_CONFLICTS_SQL = queries.register('venue_conflicts', venue_conflicts_sql(
+    'events', 'event_spans'), allow_scan=('sa', 'sb'))
+STUDENT_CONFLICTS_SQL = queries.register('student_conflicts', student_conflicts_sql(
+    'events', 'event_spans', 'registrations'), allow_scan=('sa', 'sb'))
+
+def overlapping_events(sql, span, *params):
+    rows = get_db().execute(sql, span + params).fetchall()
+    return [dict(zip(EVENT_COLUMNS, row)) for row in rows]
+
+@app.route('/api/schedule/conflicts', methods=['GET'])
+def get_schedule_conflicts():
+    college_id = 1  # For demo
+    location = request.args.get('location')
+    
+    # Overlapping events at a venue, or among a student's registrations
+    if location:
+        rows = get_db().execute(VENUE_CONFLICTS_SQL, (college_id, location)).fetchall()
+    else:
+        student_id = request.args.get('student_id', 1, type=int)
+        rows = get_db().execute(STUDENT_CONFLICTS_SQL, (student_id, student_id)).fetchall()
+    return jsonify(pairs(rows))
 
 @app.route('/api/events', methods=['POST'])
 def create_event():
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
+    # Also rejects dates the overlap check can't read, before anything is written
+    span = overlap_params(1, data['start_date'], data['end_date'])
     qr_code = generate_qr_code(data['title'])
     
     cursor.execute("INSERT INTO events (title, description, event_type, start_date, end_date, location, max_participants, registration_deadline, college_id, created_by, qr_code) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                   (data['title'], data['description'], data['event_type'], data['start_date'], data['end_date'], data['location'], data['max_participants'], data.get('registration_deadline'), 1, 1, qr_code))
     
+    event_id = cursor.lastrowid
+    
     conn.commit()
-    conn.close()
-    return jsonify({'message': 'Event created successfully'}), 201
+    invalidate_caches(1)
+    
+    # Created either way; the admin is warned about double-booked venues
+    venue_conflicts = []
+    if data['location']:
+        venue_conflicts = overlapping_events(VENUE_OVERLAP_SQL, span, data['location'], event_id)
+    return jsonify({'message': 'Event created successfully', 'event_id': event_id,
+                    'venue_conflicts': venue_conflicts}), 201
+
+DELETE_EVENT_FEEDBACK_SQL = queries.register('delete_event_feedback', "DELETE FROM feedback WHERE event_id = ?")
+DELETE_EVENT_ATTENDANCE_SQL = queries.register('delete_event_attendance', "DELETE FROM attendance WHERE event_id = ?")
+DELETE_EVENT_REGISTRATIONS_SQL = queries.register('delete_event_registrations', "DELETE FROM registrations WHERE event_id = ?")
 
 @app.route('/api/events/<int:event_id>', methods=['DELETE'])
 def delete_event(event_id):
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Delete related data first
-    cursor.execute("DELETE FROM feedback WHERE event_id = ?", (event_id,))
-    cursor.execute("DELETE FROM attendance WHERE event_id = ?", (event_id,))
-    cursor.execute("DELETE FROM registrations WHERE event_id = ?", (event_id,))
+    cursor.execute(DELETE_EVENT_FEEDBACK_SQL, (event_id,))
+    cursor.execute(DELETE_EVENT_ATTENDANCE_SQL, (event_id,))
+    cursor.execute(DELETE_EVENT_REGISTRATIONS_SQL, (event_id,))
     cursor.execute("DELETE FROM events WHERE id = ?", (event_id,))
     
     conn.commit()
-    conn.close()
+    invalidate_caches(1)
     return jsonify({'message': 'Event deleted successfully'}), 200
 
+EVENT_END_SQL = queries.register('event_end', "SELECT end_date FROM events WHERE id = ?")
+EVENT_SPAN_SQL = queries.register('event_span', "SELECT college_id, start_date, end_date FROM events WHERE id = ?")
+
+def issue_checkin_token(student_id, event_id):
+    row = get_db().execute(EVENT_END_SQL, (event_id,)).fetchone()
+    # Events saved without a readable end date get no code
+    try:
+        expires = token_expiry(datetime.fromisoformat(row[0])) if row else None
+    except (TypeError, ValueError):
+        expires = None
+    if expires is None:
+        return None
+    return {'token': checkin_tokens.issue(student_id, event_id, expires), 'expires_at': expiry_isoformat(expires)}
+
 @app.route('/api/events/<int:event_id>/register', methods=['POST'])
 def register_for_event(event_id):
     # For demo purposes, using student_id = 1
     # In a real app, you'd get this from the JWT token
     student_id = 1
     
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
+    # Refuse a second event at the same time
+    event = get_db().execute(EVENT_SPAN_SQL, (event_id,)).fetchone()
+    span = stored_overlap_params(*event) if event else None
+    if span:
+        conflicts = overlapping_events(STUDENT_OVERLAP_SQL, span, student_id, event_id)
+        if conflicts:
+            return jsonify({'error': 'Overlaps with an event you are registered for', 'conflicts': conflicts}), 409
     
     try:
-        cursor.execute("INSERT INTO registrations (student_id, event_id, status) VALUES (?, ?, ?)",
-                      (student_id, event_id, 'registered'))
-        conn.commit()
-        conn.close()
-        return jsonify({'message': 'Registered successfully'}), 201
+        write("INSERT INTO registrations (student_id, event_id, status) VALUES (?, ?, ?)",
+              (student_id, event_id, 'registered'))
+        invalidate_caches(1)
+        live_updates.publish(1, 'registrations', event_id=event_id, seats_taken=1)
+        return jsonify({'message': 'Registered successfully',
+                        'checkin_token': issue_checkin_token(student_id, event_id)}), 201
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'error': 'Already registered for this event'}), 400
 
+REGISTRATION_STATUS_SQL = queries.register('registration_status', """
+    SELECT status FROM registrations WHERE student_id = ? AND event_id = ?
+""")
+
+@app.route('/api/events/<int:event_id>/checkin-token', methods=['GET'])
+def get_checkin_token(event_id):
+    student_id = 1  # For demo
+    
+    registration = get_db().execute(REGISTRATION_STATUS_SQL, (student_id, event_id)).fetchone()
+    if not registration or registration[0] != 'registered':
+        return jsonify({'error': 'Not registered for this event'}), 400
+    
+    return jsonify(issue_checkin_token(student_id, event_id))
+
+@app.errorhandler(InvalidCheckinToken)
+def invalid_checkin_token(error):
+    return jsonify({'error': str(error)}), 400
+
+# A code outlives a cancelled registration, so the seat is checked again as
+# part of the insert
+SCAN_CHECKIN_SQL = queries.register('scan_checkin', """
+    INSERT OR IGNORE INTO attendance (student_id, event_id, device_id)
+    SELECT ?, id, ? FROM events WHERE id = ? AND EXISTS (
+        SELECT 1 FROM registrations
+        WHERE student_id = ? AND event_id = events.id AND status = 'registered'
+    )
+""")
+ATTENDANCE_EXISTS_SQL = queries.register('attendance_exists', """
+    SELECT 1 FROM attendance WHERE student_id = ? AND event_id = ?
+""")
+
+@app.route('/api/events/<int:event_id>/checkin/scan', methods=['POST'])
+def scan_checkin(event_id):
+    data = request.get_json(silent=True) or {}
+    # Forged, expired and wrong-event codes stop here, before any query
+    claims = checkin_tokens.verify(data.get('token'), event_id)
+    
+    try:
+        inserted = write(SCAN_CHECKIN_SQL, (claims.student_id, data.get('device_id'), event_id, claims.student_id))
+    except sqlite3.IntegrityError:
+        # Foreign key: the student has been deleted since the code was issued
+        return jsonify({'error': 'Not registered for this event', 'student_id': claims.student_id}), 400
+    
+    if not inserted:
+        conn = get_db()
+        if conn.execute(ATTENDANCE_EXISTS_SQL, (claims.student_id, event_id)).fetchone():
+            return jsonify({'message': 'Already checked in', 'student_id': claims.student_id}), 200
+        if not conn.execute(EVENT_END_SQL, (event_id,)).fetchone():
+            return jsonify({'error': 'Event not found'}), 404
+        return jsonify({'error': 'Not registered for this event', 'student_id': claims.student_id}), 400
+    invalidate_caches(1)
+    live_updates.publish(1, 'checkins', event_id=event_id, checked_in=1)
+    return jsonify({'message': 'Checked in successfully', 'student_id': claims.student_id}), 201
+
 @app.route('/api/events/<int:event_id>/checkin', methods=['POST'])
 def check_in_event(event_id):
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
-    
     student_id = 1  # For demo
     
     try:
-        cursor.execute("INSERT INTO attendance (student_id, event_id) VALUES (?, ?)",
-                      (student_id, event_id))
-        conn.commit()
-        conn.close()
+        write("INSERT INTO attendance (student_id, event_id) VALUES (?, ?)",
+              (student_id, event_id))
+        invalidate_caches(1)
+        live_updates.publish(1, 'checkins', event_id=event_id, checked_in=1)
         return jsonify({'message': 'Checked in successfully'}), 201
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'error': 'Already checked in'}), 400
 
+# Batched check-ins; the student ids arrive as one JSON array parameter,
+# which json_each walks to probe the tables' keys
+EVENT_EXISTS_SQL = queries.register('event_exists', "SELECT 1 FROM events WHERE id = ?")
+STUDENTS_IN_SQL = queries.register('students_in', """
+    SELECT id FROM students WHERE id IN (SELECT value FROM json_each(?))
+""", allow_scan=('json_each',))
+CHECKED_IN_SQL = queries.register('checked_in', """
+    SELECT student_id FROM attendance
+    WHERE event_id = ? AND student_id IN (SELECT value FROM json_each(?))
+""", allow_scan=('json_each',))
+INSERT_CHECKIN_SQL = """
+    INSERT INTO attendance (student_id, event_id, checked_in_at, device_id) VALUES (?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+"""
+
+@app.errorhandler(CheckinBatchError)
+def checkin_batch_error(error):
+    return jsonify({'error': str(error)}), 400
+
+@app.route('/api/events/<int:event_id>/checkins', methods=['POST'])
+def sync_checkins(event_id):
+    checkins = parse_checkins(request.get_json(silent=True),
+                              verify_token=lambda token: checkin_tokens.verify(token, event_id))
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    if not cursor.execute(EVENT_EXISTS_SQL, (event_id,)).fetchone():
+        return jsonify({'error': 'Event not found'}), 404
+    
+    # Take the write lock first, so no other check-in lands between the
+    # lookups and the insert
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        ids = json.dumps(student_ids(checkins))
+        known = {row[0] for row in cursor.execute(STUDENTS_IN_SQL, (ids,))}
+        present = {row[0] for row in cursor.execute(CHECKED_IN_SQL, (event_id, ids))}
+        new, results = resolve_checkins(checkins, known, present)
+        cursor.executemany(INSERT_CHECKIN_SQL, [
+            (checkin['student_id'], event_id, checkin['checked_in_at'].strftime('%Y-%m-%d %H:%M:%S'),
+             checkin['device_id'])
+            for checkin in new
+        ])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    if new:
+        invalidate_caches(1)
+        live_updates.publish(1, 'checkins', event_id=event_id, checked_in=len(new))
+    return jsonify(summarize(results))
+
 @app.route('/api/events/<int:event_id>/feedback', methods=['POST'])
 def submit_feedback(event_id):
     data = request.get_json()
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
-    
     student_id = 1  # For demo
     
     try:
-        cursor.execute("INSERT INTO feedback (student_id, event_id, rating, comment) VALUES (?, ?, ?, ?)",
-                      (student_id, event_id, data['rating'], data.get('comment', '')))
-        conn.commit()
-        conn.close()
+        write("INSERT INTO feedback (student_id, event_id, rating, comment) VALUES (?, ?, ?, ?)",
+              (student_id, event_id, data['rating'], data.get('comment', '')))
+        invalidate_caches(1)
+        live_updates.publish(1, 'feedback', event_id=event_id, feedback=1, rating=data['rating'])
         return jsonify({'message': 'Feedback submitted successfully'}), 201
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'error': 'Feedback already submitted'}), 400
 
+# Live updates for the demo college
+@app.route('/api/stream', methods=['GET'])
+def stream_updates():
+    return event_stream(live_updates, 1)
+
+@app.route('/api/system/live-updates', methods=['GET'])
+def live_updates_stats():
+    return jsonify(live_updates.stats())
+
+@app.route('/api/system/response-cache', methods=['GET'])
+def response_cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/api/system/compression', methods=['GET'])
+def compression_stats():
+    return jsonify(compressor.stats())
+
 @app.route('/api/admin/dashboard', methods=['GET'])
+@cached_response(response_cache, demo_college)
 def admin_dashboard():
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
-    
-    # Get stats
-    cursor.execute("SELECT COUNT(*) FROM events")
-    total_events = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM students")
-    total_students = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM registrations")
-    total_registrations = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM attendance")
-    total_attendance = cursor.fetchone()[0]
-    
-    # Get recent events
-    cursor.execute("SELECT * FROM events ORDER BY id DESC LIMIT 5")
-    recent_events = cursor.fetchall()
-    
-    # Get top events
-    cursor.execute("""
-        SELECT e.title, COUNT(r.id) as registrations 
-        FROM events e 
-        LEFT JOIN registrations r ON e.id = r.event_id 
-        GROUP BY e.id 
-        ORDER BY registrations DESC 
-        LIMIT 5
-    """)
-    top_events = cursor.fetchall()
-    
-    conn.close()
-    
-    return jsonify({
-        'stats': {
-            'total_events': total_events,
-            'total_students': total_students,
-            'total_registrations': total_registrations,
-            'total_attendance': total_attendance
-        },
-        'recent_events': [{
-            'id': event[0],
-            'title': event[1],
-            'event_type': event[3],
-            'start_date': event[4],
-            'created_at': datetime.now().isoformat()
-        } for event in recent_events],
-        'top_events': [{'title': title, 'registrations': count} for title, count in top_events]
-    })
+    college_id = 1  # For demo
+    return jsonify(dashboard_cache.get_or_compute(
+        college_id, lambda: reports.admin_dashboard(get_db(), college_id)))
+
+STUDENT_REGISTRATIONS_SQL = queries.register('student_registrations', """
+    SELECT r.event_id, e.title, e.event_type, e.start_date, r.status, r.registered_at
+    FROM registrations r 
+    JOIN events e ON r.event_id = e.id 
+    WHERE r.student_id = ?
+""")
+STUDENT_ATTENDANCE_SQL = queries.register('student_attendance', """
+    SELECT a.event_id, e.title, a.checked_in_at
+    FROM attendance a 
+    JOIN events e ON a.event_id = e.id 
+    WHERE a.student_id = ?
+""")
+STUDENT_FEEDBACK_SQL = queries.register('student_feedback', """
+    SELECT f.event_id, e.title, f.rating, f.comment, f.submitted_at
+    FROM feedback f 
+    JOIN events e ON f.event_id = e.id 
+    WHERE f.student_id = ?
+""")
+
+def student_dashboard_payload(registrations, attendance, feedback):
+    return {
+        'registrations': [{
+            'event_id': reg[0],
+            'title': reg[1],
+            'event_type': reg[2],
+            'start_date': reg[3],
+            'status': reg[4],
+            'registered_at': reg[5]
+        } for reg in registrations],
+        'attendance': [{
+            'event_id': att[0],
+            'title': att[1],
+            'checked_in_at': att[2]
+        } for att in attendance],
+        'feedback': [{
+            'event_id': fb[0],
+            'title': fb[1],
+            'rating': fb[2],
+            'comment': fb[3],
+            'submitted_at': fb[4]
+        } for fb in feedback]
+    }
 
 @app.route('/api/student/dashboard', methods=['GET'])
+@cached_response(response_cache, demo_college)
 def student_dashboard():
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     student_id = 1  # For demo
     
     # Get registrations
-    cursor.execute("""
-        SELECT r.*, e.title, e.event_type, e.start_date 
-        FROM registrations r 
-        JOIN events e ON r.event_id = e.id 
-        WHERE r.student_id = ?
-    """, (student_id,))
+    cursor.execute(STUDENT_REGISTRATIONS_SQL, (student_id,))
     registrations = cursor.fetchall()
     
     # Get attendance
-    cursor.execute("""
-        SELECT a.*, e.title 
-        FROM attendance a 
-        JOIN events e ON a.event_id = e.id 
-        WHERE a.student_id = ?
-    """, (student_id,))
+    cursor.execute(STUDENT_ATTENDANCE_SQL, (student_id,))
     attendance = cursor.fetchall()
     
     # Get feedback
-    cursor.execute("""
-        SELECT f.*, e.title 
-        FROM feedback f 
-        JOIN events e ON f.event_id = e.id 
-        WHERE f.student_id = ?
-    """, (student_id,))
+    cursor.execute(STUDENT_FEEDBACK_SQL, (student_id,))
     feedback = cursor.fetchall()
     
-    conn.close()
-    
-    return jsonify({
-        'registrations': [{
-            'event_id': reg[2],
-            'title': reg[4],
-            'event_type': reg[5],
-            'start_date': reg[6],
-            'status': reg[4],
-            'registered_at': reg[3]
-        } for reg in registrations],
-        'attendance': [{
-            'event_id': att[2],
-            'title': att[4],
-            'checked_in_at': att[3]
-        } for att in attendance],
-        'feedback': [{
-            'event_id': fb[2],
-            'title': fb[4],
-            'rating': fb[3],
-            'comment': fb[4],
-            'submitted_at': fb[5]
-        } for fb in feedback]
-    })
+    return jsonify(student_dashboard_payload(registrations, attendance, feedback))
 
 @app.route('/api/reports/top-active-students', methods=['GET'])
 def top_active_students():
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
-    
     # Get top 3 most active students based on registrations
-    cursor.execute("""
-        SELECT s.id, s.name, s.email, s.student_id,
-               COUNT(r.id) as total_registrations,
-               COUNT(a.id) as total_attendance,
-               COUNT(f.id) as total_feedback
-        FROM students s
-        LEFT JOIN registrations r ON s.id = r.student_id
-        LEFT JOIN attendance a ON s.id = a.student_id
-        LEFT JOIN feedback f ON s.id = f.student_id
-        GROUP BY s.id, s.name, s.email, s.student_id
-        ORDER BY total_registrations DESC, total_attendance DESC
-        LIMIT 3
-    """)
-    
-    students = cursor.fetchall()
-    conn.close()
-    
-    return jsonify([{
-        'id': student[0],
-        'name': student[1],
-        'email': student[2],
-        'student_id': student[3],
-        'total_registrations': student[4],
-        'total_attendance': student[5],
-        'total_feedback': student[6],
-        'activity_score': student[4] + student[5] + student[6]
-    } for student in students])
+    return jsonify(reports.top_active_students(get_db(), limit=3))
 
 @app.route('/api/reports/events', methods=['GET'])
+@cached_response(response_cache, demo_college)
 def flexible_event_reports():
     event_type = request.args.get('event_type', 'all')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
-    
-    # Build query based on filters
-    query = """
-        SELECT e.*, 
-               COUNT(r.id) as registration_count,
-               COUNT(a.id) as attendance_count,
-               AVG(f.rating) as avg_rating
-        FROM events e
-        LEFT JOIN registrations r ON e.id = r.event_id
-        LEFT JOIN attendance a ON e.id = a.event_id
-        LEFT JOIN feedback f ON e.id = f.event_id
-    """
-    
-    conditions = []
-    params = []
-    
-    if event_type != 'all':
-        conditions.append("e.event_type = ?")
-        params.append(event_type)
-    
-    if start_date:
-        conditions.append("e.start_date >= ?")
-        params.append(start_date)
-    
-    if end_date:
-        conditions.append("e.end_date <= ?")
-        params.append(end_date)
-    
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-    
-    query += " GROUP BY e.id ORDER BY e.created_at DESC"
-    
-    cursor.execute(query, params)
-    events = cursor.fetchall()
-    conn.close()
+    return jsonify(reports.event_report(get_db(), event_type, start_date, end_date))
+
+@app.route('/api/reports/events/export', methods=['GET'])
+def export_event_reports():
+    fmt = parse_format(request.args.get('format'))
+    event_type = request.args.get('event_type', 'all')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
     
-    return jsonify([{
-        'id': event[0],
-        'title': event[1],
-        'description': event[2],
-        'event_type': event[3],
-        'start_date': event[4],
-        'end_date': event[5],
-        'location': event[6],
-        'max_participants': event[7],
-        'created_at': event[8],
-        'registration_count': event[9],
-        'attendance_count': event[10],
-        'avg_rating': round(event[11], 2) if event[11] else 0
-    } for event in events])
+    rows = reports.event_report_rows(get_db(), event_type, start_date, end_date)
+    return export_response(fmt, 'event-report', reports.EVENT_REPORT_HEADER, rows, 'Events')
+
+EVENT_REGISTRATIONS_SQL = queries.register('event_registrations', """
+    SELECT r.id, s.name, s.student_id, s.email, r.registered_at, r.status,
+           CASE WHEN a.id IS NOT NULL THEN 'present' ELSE 'absent' END as attendance_status
+    FROM registrations r
+    JOIN students s ON r.student_id = s.id
+    LEFT JOIN attendance a ON r.student_id = a.student_id AND r.event_id = a.event_id
+    WHERE r.event_id = ?
+    ORDER BY r.registered_at DESC
+""")
 
 @app.route('/api/events/<int:event_id>/registrations', methods=['GET'])
 def get_event_registrations(event_id):
-    conn = sqlite3.connect('campus_events.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT r.id, s.name, s.student_id, s.email, r.registered_at, r.status,
-               CASE WHEN a.id IS NOT NULL THEN 'present' ELSE 'absent' END as attendance_status
-        FROM registrations r
-        JOIN students s ON r.student_id = s.id
-        LEFT JOIN attendance a ON r.student_id = a.student_id AND r.event_id = a.event_id
-        WHERE r.event_id = ?
-        ORDER BY r.registered_at DESC
-    """, (event_id,))
+    cursor.execute(EVENT_REGISTRATIONS_SQL, (event_id,))
     
     registrations = cursor.fetchall()
-    conn.close()
     
     return jsonify([{
         'id': reg[0],
@@ -544,57 +857,118 @@ def get_event_registrations(event_id):
         'attendance_status': reg[6]
     } for reg in registrations])
 
+REGISTRATIONS_EXPORT_HEADER = ('Registration ID', 'Student Name', 'Student ID', 'Email',
+                               'Registered At', 'Status', 'Attendance')
+
+@app.route('/api/events/<int:event_id>/registrations/export', methods=['GET'])
+def export_event_registrations(event_id):
+    fmt = parse_format(request.args.get('format'))
+    
+    # The cursor is read as the response is sent
+    rows = get_db().execute(EVENT_REGISTRATIONS_SQL, (event_id,))
+    return export_response(fmt, f'event-{event_id}-registrations', REGISTRATIONS_EXPORT_HEADER,
+                           rows, 'Registrations')
+
+DELETE_ATTENDANCE_SQL = queries.register('delete_attendance', "DELETE FROM attendance WHERE student_id = ? AND event_id = ?")
+
 @app.route('/api/events/<int:event_id>/mark-attendance', methods=['POST'])
 def mark_attendance(event_id):
     data = request.get_json()
     student_id = data['student_id']
     action = data['action']  # 'present' or 'absent'
     
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
-    
     if action == 'present':
         try:
-            cursor.execute("INSERT INTO attendance (student_id, event_id) VALUES (?, ?)",
-                          (student_id, event_id))
-            conn.commit()
-            conn.close()
+            write("INSERT INTO attendance (student_id, event_id) VALUES (?, ?)",
+                  (student_id, event_id))
+            invalidate_caches(1)
+            live_updates.publish(1, 'checkins', event_id=event_id, checked_in=1)
             return jsonify({'message': 'Student marked as present'}), 201
         except sqlite3.IntegrityError:
-            conn.close()
             return jsonify({'message': 'Student already marked as present'}), 200
     elif action == 'absent':
-        cursor.execute("DELETE FROM attendance WHERE student_id = ? AND event_id = ?",
-                      (student_id, event_id))
-        conn.commit()
-        conn.close()
+        if write(DELETE_ATTENDANCE_SQL, (student_id, event_id)):
+            live_updates.publish(1, 'checkins', event_id=event_id, checked_in=-1)
+        invalidate_caches(1)
         return jsonify({'message': 'Student marked as absent'}), 200
     
-    conn.close()
     return jsonify({'error': 'Invalid action'}), 400
 
+# Served from student_stats, which triggers keep in step with attendance;
+# the (college_id, attendance_count) index yields rows already in rank order
+LEADERBOARD_SQL = queries.register('leaderboard', """
+    SELECT s.name, s.student_id, ss.attendance_count
+    FROM student_stats ss
+    JOIN students s ON s.id = ss.student_id
+    WHERE ss.college_id = ? AND ss.attendance_count > 0
+    ORDER BY ss.attendance_count DESC
+    LIMIT ?
+""")
+STUDENT_TALLY_SQL = queries.register('student_tally', """
+    SELECT s.college_id, COALESCE(ss.attendance_count, 0)
+    FROM students s
+    LEFT JOIN student_stats ss ON ss.student_id = s.id
+    WHERE s.id = ?
+""")
+STUDENTS_AHEAD_SQL = queries.register('students_ahead', """
+    SELECT COUNT(*) FROM student_stats
+    WHERE college_id = ? AND attendance_count > ?
+""")
+
+def leaderboard_payload(rows):
+    return [{
+        'name': name,
+        'student_id': student_id,
+        'attendance_count': count
+    } for name, student_id, count in rows]
+
 @app.route('/api/leaderboard', methods=['GET'])
+@cached_response(response_cache, demo_college)
 def get_leaderboard():
-    conn = sqlite3.connect('campus_events.db')
-    cursor = conn.cursor()
+    college_id = 1  # For demo
+    limit = min(request.args.get('limit', 10, type=int), 100)
     
-    cursor.execute("""
-        SELECT s.name, s.student_id, COUNT(a.id) as attendance_count
-        FROM students s
-        LEFT JOIN attendance a ON s.id = a.student_id
-        GROUP BY s.id
-        ORDER BY attendance_count DESC
-        LIMIT 10
-    """)
+    conn = get_db()
+    cursor = conn.cursor()
     
+    cursor.execute(LEADERBOARD_SQL, (college_id, limit))
     leaderboard = cursor.fetchall()
-    conn.close()
     
-    return jsonify([{
-        'name': name,
+    return jsonify(leaderboard_payload(leaderboard))
+
+LEADERBOARD_EXPORT_HEADER = ('Name', 'Student ID', 'Attendance')
+
+@app.route('/api/leaderboard/export', methods=['GET'])
+def export_leaderboard():
+    college_id = 1  # For demo
+    fmt = parse_format(request.args.get('format'))
+    
+    # LIMIT -1: the whole college, not just the top of the board
+    rows = get_db().execute(LEADERBOARD_SQL, (college_id, -1))
+    return export_response(fmt, 'leaderboard', LEADERBOARD_EXPORT_HEADER, rows, 'Leaderboard')
+
+@app.route('/api/leaderboard/me', methods=['GET'])
+def get_my_rank():
+    student_id = request.args.get('student_id', 1, type=int)  # Demo student by default
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    cursor.execute(STUDENT_TALLY_SQL, (student_id,))
+    student = cursor.fetchone()
+    if not student:
+        return jsonify({'error': 'Student not found'}), 404
+    
+    college_id, attendance_count = student
+    # Rank = 1 + students with strictly more check-ins (ties share a rank)
+    cursor.execute(STUDENTS_AHEAD_SQL, (college_id, attendance_count))
+    ahead = cursor.fetchone()[0]
+    
+    return jsonify({
         'student_id': student_id,
-        'attendance_count': count
-    } for name, student_id, count in leaderboard])
+        'attendance_count': attendance_count,
+        'rank': ahead + 1
+    })
 
 if __name__ == '__main__':
     init_db()
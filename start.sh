@@ -5,4 +5,5 @@ echo "Installing dependencies..."
 pip install -r requirements.txt
 echo ""
 echo "Starting the application..."
-python simple_backend_no_qr.py
\ No newline at end of file
+# SERVE_MODE=wsgi or asgi for production, see serve.py
+python serve.py "${SERVE_MODE:-dev}"
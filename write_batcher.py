@@ -0,0 +1,193 @@
+"""Group commit for the simple backend's single-row writes.
+
+SQLite has one writer at a time, so during a burst of registrations or
+check-ins each request committing on its own spends most of its time waiting
+for the write lock, and each commit appends and syncs the WAL separately.
+``WriteBatcher`` makes one thread the only writer. It drains a queue of
+pending statements and runs what has queued up while the previous group was
+committing, up to ``max_batch`` of them, in one transaction with one commit.
+``max_delay_ms`` additionally lingers for more writes after the first; that
+only pays off where each commit is an expensive fsync.
+
+Each statement runs under its own SAVEPOINT, so a unique-constraint failure
+is rolled back and raised to that request alone while the rest of the group
+commits. Callers block on a future that resolves, with the statement's
+rowcount or its error, once the group has committed.
+
+Batching is off unless ``WRITE_BATCHING=1``; ``write()`` then runs the
+statement on the request's pooled connection and commits it as before.
+"""
+import collections
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app, jsonify
+
+from backend.password_hasher import LatencyHistogram
+from db_pool import get_db
+
+WRITE_BATCHING = os.getenv('WRITE_BATCHING', '0') == '1'
+WRITE_BATCH_SIZE = int(os.getenv('WRITE_BATCH_SIZE', '64'))
+WRITE_BATCH_DELAY_MS = float(os.getenv('WRITE_BATCH_DELAY_MS', '0'))
+WRITE_TIMEOUT = float(os.getenv('WRITE_TIMEOUT', '10'))
+
+_STOP = object()
+
+
+class WriteBatcher:
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+    def __init__(self, connect, max_batch=WRITE_BATCH_SIZE, max_delay_ms=WRITE_BATCH_DELAY_MS,
+                 timeout=WRITE_TIMEOUT):
+        self._connect = connect
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Stats
+        self._batches = 0
+        self._writes = 0
+        self._errors = 0
+        self._failed_commits = 0
+        self._largest_batch = 0
+        self._batch_sizes = collections.Counter()
+        self.queue_wait = LatencyHistogram()
+        self.commit_latency = LatencyHistogram()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-batcher', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Commit what is queued, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def submit(self, sql, params=()):
+        """Queue one statement; the future resolves to its rowcount."""
+        self.start()
+        future = Future()
+        self._queue.put((sql, params, future, time.perf_counter()))
+        return future
+
+    def execute(self, sql, params=()):
+        """Run one statement in the next group commit and return its rowcount,
+        or raise its error (e.g. ``sqlite3.IntegrityError``)."""
+        return self.submit(sql, params).result(self.timeout)
+
+    def _run(self):
+        conn = self._connect()
+        # Transactions are managed here, with explicit BEGIN and SAVEPOINTs
+        conn.isolation_level = None
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(conn, batch)
+        conn.close()
+
+    def _commit(self, conn, batch):
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params, future, queued in batch:
+                self.queue_wait.observe((started - queued) * 1000)
+                conn.execute("SAVEPOINT write")
+                try:
+                    outcomes.append((future, conn.execute(sql, params).rowcount, None))
+                except sqlite3.Error as error:
+                    conn.execute("ROLLBACK TO write")
+                    outcomes.append((future, None, error))
+                conn.execute("RELEASE write")
+            conn.execute("COMMIT")
+        except Exception as error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            with self._lock:
+                self._failed_commits += 1
+            for _, _, future, _ in batch:
+                future.set_exception(error)
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.commit_latency.observe(elapsed_ms)
+        with self._lock:
+            self._batches += 1
+            self._writes += len(batch)
+            self._errors += sum(1 for _, _, error in outcomes if error is not None)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            bucket = next((size for size in self.BATCH_SIZE_BUCKETS if len(batch) <= size), 'inf')
+            self._batch_sizes[bucket] += 1
+
+        for future, rowcount, error in outcomes:
+            if error is None:
+                future.set_result(rowcount)
+            else:
+                future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': True,
+                'max_batch': self.max_batch,
+                'max_delay_ms': self.max_delay * 1000,
+                'queued': self._queue.qsize(),
+                'batches': self._batches,
+                'writes': self._writes,
+                'errors': self._errors,
+                'failed_commits': self._failed_commits,
+                'avg_batch': round(self._writes / self._batches, 2) if self._batches else 0,
+                'largest_batch': self._largest_batch,
+                'batch_sizes': {f'le_{size}': self._batch_sizes[size] for size in self.BATCH_SIZE_BUCKETS + ('inf',)},
+                'queue_wait': self.queue_wait.snapshot(),
+                'commit_latency': self.commit_latency.snapshot()
+            }
+
+
+def init_app(app, batcher):
+    """Register ``batcher`` (None when batching is off) and its stats route."""
+    app.extensions['write_batcher'] = batcher
+
+    @app.route('/api/system/write-batcher', methods=['GET'])
+    def write_batcher_stats():
+        return jsonify(batcher.stats() if batcher else {'enabled': False})
+
+
+def write(sql, params=()):
+    """Run one INSERT/UPDATE/DELETE, committed, and return its rowcount.
+
+    Goes through the app's write batcher when there is one, otherwise
+    through the request's connection.
+    """
+    batcher = current_app.extensions.get('write_batcher')
+    if batcher is not None:
+        return batcher.execute(sql, params)
+    conn = get_db()
+    cursor = conn.execute(sql, params)
+    conn.commit()
+    return cursor.rowcount